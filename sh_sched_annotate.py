@@ -0,0 +1,395 @@
+"""Tag badge and door-swipe logs with schedule context.
+
+Each event gets the schedule running that day (from the calendar), the
+segment it fell in ("Period 3", "Period 3 → Period 4", ...) and, when a
+roster is given, the room the student was expected to be in. Logs are
+CSV with a header row, or JSON Lines; the output keeps the input format
+with four fields added (see ANNOTATION_FIELDS).
+
+Large logs can be split into byte ranges that start and end on line
+boundaries and annotated on a process pool (annotate_file_parallel); the
+parts are written to temporary files and joined in order, so the output
+is identical to a single-process run.
+
+Logs are read and written CHUNK_LINES lines at a time, so memory stays
+flat however long the log is. Within a chunk every lookup is a table
+read: the day's schedule is cached per date string, the segment comes
+from the schedule's per-minute table and the expected room is one read
+of the roster matrix, so no event is bisected or parsed beyond slicing
+its timestamp.
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sh_sched_engine import Segment, DAY_SECONDS, NOT_IN_SESSION, MISSING_SEGMENT, PERIOD, PASSING, WAITING
+from sh_sched_instrument import profiled
+from sh_sched_roster import period_key
+
+ANNOTATION_FIELDS = ('schedule', 'segment', 'segment_kind', 'expected_room')
+
+# Input field names accepted for the event time and the person (compared lower-cased)
+TIMESTAMP_FIELDS = ('timestamp', 'time', 'datetime', 'event_time', 'swipe_time', 'ts')
+PERSON_FIELDS = ('student_id', 'student', 'badge_id', 'badge', 'card_id', 'person_id')
+
+# Lines read, annotated and written per step
+CHUNK_LINES = 20000
+
+# Distinct 'YYYY-MM-DDTHH:MM' prefixes remembered before the cache is cleared
+MINUTE_CACHE_SIZE = 100000
+
+# Smaller logs are not worth starting a process pool for
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+# Byte ranges per worker; more than one evens out uneven ranges
+RANGES_PER_WORKER = 4
+
+NO_SCHOOL = Segment(0, DAY_SECONDS, NOT_IN_SESSION, "No School")
+
+
+def log_format(path):
+    """'jsonl' for .jsonl/.ndjson files, otherwise 'csv'"""
+    return 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson') else 'csv'
+
+
+def _is_iso(value):
+    return isinstance(value, str) and len(value) >= 16 and value[10] in 'T ' and value[13] == ':'
+
+
+def split_timestamp(value):
+    """Return ('YYYY-MM-DD', seconds since midnight) for an event time, or None.
+
+    ISO text ('2026-03-04T10:41:05', '2026-03-04 10:41') is sliced
+    directly; anything else goes through datetime, and numbers are
+    taken as Unix timestamps in local time.
+    """
+    if _is_iso(value):
+        try:
+            seconds = int(value[11:13]) * 3600 + int(value[14:16]) * 60
+            if len(value) >= 19 and value[16] == ':':
+                seconds += int(value[17:19])
+            return value[:10], seconds
+        except ValueError:
+            return None
+    try:
+        if isinstance(value, (int, float)) or str(value).replace('.', '', 1).isdigit():
+            moment = datetime.fromtimestamp(float(value))
+        else:
+            moment = datetime.fromisoformat(str(value).strip())
+    except (ValueError, OverflowError, OSError):
+        return None
+    return moment.date().isoformat(), moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+class AnnotateReport:
+    """Counts and timing for one annotation run"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.unparsed = 0   # events whose line or timestamp could not be read
+        self.bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def format_text(self):
+        text = (f"Annotated {self.rows:,} events in {self.seconds:.1f} s "
+                f"({self.rows_per_second:,.0f} events/s, {self.bytes / (1024 * 1024) / max(self.seconds, 1e-9):.1f} MB/s)")
+        if self.unparsed:
+            text += f"\n{self.unparsed:,} events skipped (unreadable line or timestamp)"
+        return text
+
+
+class LogAnnotator:
+    """Annotates chunks of log lines; holds the per-day and per-student caches"""
+
+    def __init__(self, schedules, calendar, roster=None, fmt='csv'):
+        self.schedules = schedules
+        self.calendar = calendar
+        self.roster = roster
+        self.fmt = fmt
+        self.days = {}          # 'YYYY-MM-DD' -> (schedule key, minute table)
+        self.columns = {}       # Segment -> roster column of the period that counts, or None
+        self.minutes = {}       # 'YYYY-MM-DDTHH:MM' -> (schedule key, Segment)
+        self.time_column = None
+        self.person_column = None
+        self.rows = 0
+        self.unparsed = 0
+
+    def day(self, day_text):
+        """Return (schedule key, per-minute Segment table) for a date, cached per date"""
+        entry = self.days.get(day_text)
+        if entry is None:
+            try:
+                key = self.calendar.schedule_for(day_text)
+            except ValueError:
+                key = None
+            schedule = self.calendar.resolve(key, self.schedules) if key else None
+            if key is None:
+                entry = ('', (NO_SCHOOL,) * (DAY_SECONDS // 60))
+            elif schedule is not None:
+                entry = (key, schedule.minute_table())
+            else:
+                entry = (key, (MISSING_SEGMENT,) * (DAY_SECONDS // 60))
+            self.days[day_text] = entry
+        return entry
+
+    def context(self, timestamp, person):
+        """Return the ANNOTATION_FIELDS values for one event"""
+        # Events in the same minute share one lookup
+        cached = self.minutes.get(timestamp[:16]) if isinstance(timestamp, str) else None
+        if cached is None:
+            parts = split_timestamp(timestamp)
+            if parts is None:
+                self.unparsed += 1
+                return '', '', '', ''
+            key, table = self.day(parts[0])
+            cached = key, table[min(parts[1], DAY_SECONDS - 1) // 60]
+            if _is_iso(timestamp):
+                if len(self.minutes) >= MINUTE_CACHE_SIZE:
+                    self.minutes.clear()
+                self.minutes[timestamp[:16]] = cached
+        key, segment = cached
+        room = self.expected_room(person, segment) if self.roster is not None and person else ''
+        return key, segment.message, segment.kind, room
+
+    def expected_room(self, person, segment):
+        """The room of the student's section in this period (or the next one, between classes)"""
+        roster = self.roster
+        row = roster.rows.get(person)
+        if row is None:
+            return ''
+        if segment in self.columns:
+            column = self.columns[segment]
+        else:
+            period = segment.current if segment.kind == PERIOD else (
+                segment.next if segment.kind in (PASSING, WAITING) else None)
+            column = self.columns[segment] = roster.columns.get(period_key(period.name)) if period else None
+        if column is None:
+            return ''
+        section = roster.sections[roster.matrix[row * len(roster.periods) + column]]
+        return section.room if section else ''
+
+    def header(self, line):
+        """Read the CSV header line; returns the output header line"""
+        names = next(csv.reader([line]))
+        lowered = [name.strip().lower() for name in names]
+        self.time_column = next((lowered.index(name) for name in TIMESTAMP_FIELDS if name in lowered), None)
+        if self.time_column is None:
+            raise ValueError(f"Log has no timestamp column (expected one of: {', '.join(TIMESTAMP_FIELDS)})")
+        self.person_column = next((lowered.index(name) for name in PERSON_FIELDS if name in lowered), None)
+        out = io.StringIO()
+        csv.writer(out).writerow(names + list(ANNOTATION_FIELDS))
+        return out.getvalue()
+
+    def annotate_lines(self, lines):
+        """Annotate a list of complete lines; returns the output text for them"""
+        if self.fmt == 'jsonl':
+            return self.annotate_jsonl(lines)
+        out = io.StringIO()
+        writer = csv.writer(out)
+        time_column = self.time_column
+        person_column = self.person_column
+        context = self.context
+        rows = []
+        for row in csv.reader(lines):
+            if not row:
+                continue
+            timestamp = row[time_column] if time_column < len(row) else ''
+            person = row[person_column] if person_column is not None and person_column < len(row) else ''
+            row.extend(context(timestamp, person))
+            rows.append(row)
+        writer.writerows(rows)
+        self.rows += len(rows)
+        return out.getvalue()
+
+    def annotate_jsonl(self, lines):
+        output = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                self.unparsed += 1
+                continue
+            timestamp = next((event[name] for name in TIMESTAMP_FIELDS if name in event), '')
+            person = next((str(event[name]) for name in PERSON_FIELDS if name in event), '')
+            event.update(zip(ANNOTATION_FIELDS, self.context(timestamp, person)))
+            output.append(json.dumps(event, ensure_ascii=False))
+        self.rows += len(output)
+        return "\n".join(output) + "\n" if output else ''
+
+
+def read_chunks(f, length=None):
+    """Yield lists of up to CHUNK_LINES lines from a binary file, stopping after `length` bytes"""
+    remaining = length
+    chunk = []
+    for line in f:
+        chunk.append(line)
+        if remaining is not None:
+            remaining -= len(line)
+            if remaining <= 0:
+                break
+        if len(chunk) == CHUNK_LINES:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def split_ranges(path, start, parts):
+    """Split a file from byte `start` into up to `parts` (start, end) ranges on line boundaries"""
+    total = os.path.getsize(path)
+    offsets = [start]
+    with open(path, 'rb') as f:
+        for part in range(1, parts):
+            position = start + (total - start) * part // parts
+            if position <= offsets[-1]:
+                continue
+            # Back up one byte so a range already starting a line keeps that line
+            f.seek(position - 1)
+            f.readline()
+            if offsets[-1] < f.tell() < total:
+                offsets.append(f.tell())
+    offsets.append(total)
+    return [(offsets[i], offsets[i + 1]) for i in range(len(offsets) - 1) if offsets[i] < offsets[i + 1]]
+
+
+@profiled()
+def annotate_file(source, destination, schedules, calendar, roster=None, progress=None, cancel=None):
+    """Stream a log from source to destination, adding the schedule context to each event.
+
+    progress(done, total) is called after each chunk with byte counts; a
+    set cancel Event stops with InterruptedError. Returns an AnnotateReport.
+    """
+    report = AnnotateReport(source)
+    started = time.perf_counter()
+    total = os.path.getsize(source)
+    annotator = LogAnnotator(schedules, calendar, roster, log_format(source))
+    with open(source, 'rb') as f, open(destination, 'w', encoding='utf-8', newline='') as out:
+        if annotator.fmt == 'csv':
+            first = f.readline()
+            report.bytes += len(first)
+            out.write(annotator.header(first.decode('utf-8-sig')))
+        for chunk in read_chunks(f):
+            if cancel is not None and cancel.is_set():
+                raise InterruptedError("Annotation cancelled")
+            report.bytes += sum(map(len, chunk))
+            out.write(annotator.annotate_lines([line.decode('utf-8') for line in chunk]))
+            if progress is not None:
+                progress(report.bytes, total)
+    report.rows = annotator.rows
+    report.unparsed = annotator.unparsed
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+# The annotator of a pool worker process, set up once by _init_worker
+_worker = None
+
+
+def _init_worker(schedules, calendar, roster, fmt, header):
+    """Build the worker's annotator once; with fork the tables are inherited, not copied"""
+    global _worker
+    _worker = LogAnnotator(schedules, calendar, roster, fmt)
+    if header is not None:
+        _worker.header(header)
+
+
+def _annotate_range(source, start, end, part_path):
+    """Annotate one byte range of the log into part_path; returns (rows, unparsed)"""
+    rows, unparsed = _worker.rows, _worker.unparsed
+    with open(source, 'rb') as f, open(part_path, 'w', encoding='utf-8', newline='') as out:
+        f.seek(start)
+        for chunk in read_chunks(f, end - start):
+            out.write(_worker.annotate_lines([line.decode('utf-8') for line in chunk]))
+    return _worker.rows - rows, _worker.unparsed - unparsed
+
+
+@profiled()
+def annotate_file_parallel(source, destination, schedules, calendar, roster=None, workers=None,
+                           progress=None, cancel=None):
+    """Like annotate_file, but annotates byte ranges of the log on a process pool.
+
+    workers defaults to the number of CPUs. Logs under PARALLEL_MIN_BYTES,
+    or a single worker, fall back to annotate_file. The schedules, calendar
+    and roster reach each worker once, when the worker starts (a plain dict
+    of the schedules, since the read-only mapping can't be pickled).
+    """
+    workers = workers or os.cpu_count() or 1
+    total = os.path.getsize(source)
+    if workers == 1 or total < PARALLEL_MIN_BYTES:
+        return annotate_file(source, destination, schedules, calendar, roster, progress, cancel)
+    report = AnnotateReport(source)
+    started = time.perf_counter()
+    fmt = log_format(source)
+    header = None
+    with open(source, 'rb') as f:
+        if fmt == 'csv':
+            first = f.readline()
+            header = first.decode('utf-8-sig')
+            # Check the columns here, so a bad log fails before any worker starts
+            header_out = LogAnnotator(schedules, calendar, roster, fmt).header(header)
+        data_start = f.tell()
+    ranges = split_ranges(source, data_start, workers * RANGES_PER_WORKER)
+    part_dir = tempfile.mkdtemp(prefix='sh-sched-annotate-', dir=os.path.dirname(os.path.abspath(destination)))
+    try:
+        parts = [os.path.join(part_dir, f"part{number:05d}") for number in range(len(ranges))]
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(dict(schedules), calendar, roster, fmt, header)) as pool, \
+                open(destination, 'w', encoding='utf-8', newline='') as out:
+            if header is not None:
+                out.write(header_out)
+            results = pool.map(_annotate_range, [source] * len(ranges), [start for start, _ in ranges],
+                               [end for _, end in ranges], parts)
+            # map() yields in range order, so each part is appended as soon as it and all before it are done
+            for (start, end), part_path, (rows, unparsed) in zip(ranges, parts, results):
+                with open(part_path, 'r', encoding='utf-8', newline='') as part:
+                    shutil.copyfileobj(part, out)
+                os.remove(part_path)
+                report.rows += rows
+                report.unparsed += unparsed
+                report.bytes += end - start
+                if progress is not None:
+                    progress(report.bytes + data_start, total)
+                if cancel is not None and cancel.is_set():
+                    pool.shutdown(cancel_futures=True)
+                    raise InterruptedError("Annotation cancelled")
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+    report.bytes += data_start
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main():
+    """Annotate a badge/door log (CSV or JSON Lines) with schedule context"""
+    import argparse
+    from sh_sched_engine import load_schedules
+    from sh_sched_calendar import CALENDAR_FILE, load_calendar
+    from sh_sched_roster import ROSTER_FILE, load_roster
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('source')
+    parser.add_argument('destination')
+    parser.add_argument('--calendar', default=CALENDAR_FILE)
+    parser.add_argument('--roster', help=f'add expected rooms from this roster (e.g. {ROSTER_FILE})')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    args = parser.parse_args()
+    roster = load_roster(args.roster) if args.roster else None
+    report = annotate_file_parallel(args.source, args.destination, load_schedules(), load_calendar(args.calendar),
+                                    roster, args.workers)
+    print(report.format_text())
+
+
+if __name__ == '__main__':
+    main()
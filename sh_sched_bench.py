@@ -0,0 +1,339 @@
+"""Benchmarks for the shared schedule engine.
+
+Run with: python sh_sched_bench.py <benchmark> [options]
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sh_sched_engine import build_schedules, format_hhmm, load_schedules
+from sh_sched_roster import RosterBuilder, import_sis_csv
+from sh_sched_search import build_name_index
+from sh_sched_occupancy import room_occupancy
+import sh_sched_annotate
+from sh_sched_annotate import annotate_file_parallel
+from sh_sched_calendar import Calendar
+from sh_sched_events import build_event_day, tardies, hallway_sightings, period_intervals
+from sh_sched_timeline import build_timeline, connect_timeline, happening_at, sessions
+from sh_sched_instrument import resident_memory_bytes
+
+
+def make_district(schools, schedules_per_school, periods_per_schedule, seed=1):
+    """Generate schedules.json-style text for a synthetic district"""
+    rng = random.Random(seed)
+    district = {}
+    for school in range(schools):
+        school_data = {}
+        for number in range(schedules_per_school):
+            start = rng.choice((7, 8, 9)) * 3600 + rng.choice((0, 15, 20, 25, 30)) * 60
+            periods = []
+            for period in range(periods_per_schedule):
+                length = rng.choice((38, 40, 42, 44)) * 60
+                name = period + 1 if period % 5 else rng.choice(('Homeroom', 'Extra Help', 'Lunch'))
+                periods.append({'name': name, 'start': format_hhmm(start), 'end': format_hhmm(start + length)})
+                start += length + 4 * 60
+            school_data[f'schedule_{number}'] = {'periods': periods}
+        district[f'school_{school}'] = school_data
+    return json.dumps(district)
+
+
+def measure(func):
+    """Return (result, bytes still allocated by func's result)"""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def bench_memory(args):
+    text = make_district(args.schools, args.schedules, args.periods)
+    total = args.schools * args.schedules
+
+    raw, raw_size = measure(lambda: json.loads(text))
+    _, compact_size = measure(lambda: {name: build_schedules(data) for name, data in raw.items()})
+
+    print(f"{total} schedules x {args.periods} periods")
+    print(f"  plain dicts : {raw_size / total:10.1f} bytes/schedule")
+    print(f"  compact     : {compact_size / total:10.1f} bytes/schedule")
+    print(f"  saving      : {100 * (1 - compact_size / raw_size):9.1f}%")
+
+
+def make_names(count, seed=1):
+    """Generate 'Last, First' names from syllables, so prefixes are shared like real names"""
+    rng = random.Random(seed)
+    onsets = ('b', 'br', 'c', 'ch', 'd', 'f', 'g', 'h', 'j', 'k', 'l', 'm', 'n', 'p', 'r', 's', 'sh', 't', 'v', 'w')
+    vowels = ('a', 'e', 'i', 'o', 'u', 'ay', 'ee', 'ou')
+    codas = ('', 'n', 'r', 's', 'th', 'son', 'ley', 'man', 'ton', 'er')
+
+    def word(syllables):
+        return ''.join(rng.choice(onsets) + rng.choice(vowels) for _ in range(syllables)) + rng.choice(codas)
+
+    firsts = [word(rng.choice((1, 2))).title() for _ in range(2000)]
+    lasts = [word(rng.choice((1, 2, 3))).title() for _ in range(20000)]
+    return [f"{rng.choice(lasts)}, {rng.choice(firsts)}" for _ in range(count)]
+
+
+def make_roster(students, periods, rooms, seed=1, names=None):
+    """Build a synthetic roster: every student has a section in every period"""
+    rng = random.Random(seed)
+    builder = RosterBuilder()
+    section_ids = []
+    for period in range(1, periods + 1):
+        ids = []
+        for room in range(rooms):
+            section_id = f"S{period}-{room}"
+            builder.add_section(section_id, period, f"{100 + room}", f"Course {room % 40}", f"Teacher {room}")
+            ids.append(section_id)
+        section_ids.append(ids)
+    for student in range(students):
+        student_id = f"{100000 + student}"
+        builder.add_student(student_id, names[student] if names else f"Student {student}")
+        for ids in section_ids:
+            builder.assign(student_id, rng.choice(ids))
+    return builder.build()
+
+
+def bench_roster(args):
+    roster, size = measure(lambda: make_roster(args.students, args.periods, args.rooms))
+    schedule = load_schedules()['regular_schedule']
+    segments = [s for s in schedule.segments if s.current]
+    rng = random.Random(2)
+    queries = [(f"{100000 + rng.randrange(args.students)}", rng.choice(segments)) for _ in range(args.lookups)]
+
+    start = time.perf_counter()
+    for student, segment in queries:
+        roster.where(student, segment)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.students} students x {args.periods} periods, {args.rooms} rooms per period")
+    print(f"  roster size : {size / (1024 * 1024):10.1f} MB ({size / args.students:.0f} bytes/student)")
+    print(f"  matrix      : {roster.matrix.itemsize * len(roster.matrix) / (1024 * 1024):10.1f} MB")
+    print(f"  lookup      : {elapsed / args.lookups * 1e6:10.2f} us/lookup")
+
+
+def write_sis_csv(path, rows, periods=9, rooms=120, bad_every=10000, seed=1):
+    """Write a synthetic SIS enrollment export with one row per student/section"""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Student Number', 'Last Name', 'First Name', 'Section', 'Period',
+                         'Room', 'Course Code', 'Teacher'])
+        for i in range(rows):
+            student, period = divmod(i, periods)
+            room = rng.randrange(rooms)
+            if bad_every and i % bad_every == bad_every - 1:
+                writer.writerow([100000 + student, 'Broken'])
+                continue
+            writer.writerow([100000 + student, f"Last{student}", f"First{student}", f"S{period + 1}-{room}",
+                             period + 1, 100 + room, f"C{room % 40:03d}", f"Teacher {room}"])
+
+
+def bench_import(args):
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        write_sis_csv(path, args.rows)
+        # tracemalloc would dominate the timing; report the process size instead
+        roster, report = import_sis_csv(path)
+        print(f"{os.path.getsize(path) / (1024 * 1024):.1f} MB CSV, {args.rows} rows -> {roster}")
+        print(report.format_text())
+        print(f"  resident memory after import: {resident_memory_bytes() / (1024 * 1024):.1f} MB")
+    finally:
+        os.remove(path)
+
+
+def bench_search(args):
+    roster = make_roster(args.students, 9, 120, names=make_names(args.students))
+    start = time.perf_counter()
+    index = build_name_index(roster)
+    build_seconds = time.perf_counter() - start
+    # Every prefix of sampled names, as typed one keystroke at a time
+    rng = random.Random(3)
+    queries = []
+    for name in rng.sample(roster.names, args.names):
+        typed = name.replace(',', '')
+        queries += [typed[:length] for length in range(1, len(typed) + 1)]
+
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query)
+        times.append(time.perf_counter() - start)
+    times.sort()
+
+    print(f"{len(index)} names, {len(index.words)} words indexed in {build_seconds:.2f} s")
+    print(f"  {len(queries)} keystroke queries")
+    print(f"  median      : {times[len(times) // 2] * 1e6:10.1f} us")
+    print(f"  99th pct    : {times[int(len(times) * 0.99)] * 1e6:10.1f} us")
+    print(f"  worst       : {times[-1] * 1e6:10.1f} us")
+
+
+def bench_occupancy(args):
+    roster = make_roster(args.students, args.periods, args.rooms)
+    start = time.perf_counter()
+    roster.enrollment()
+    count_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        occupancy = room_occupancy(roster)
+    elapsed = (time.perf_counter() - start) / args.repeat
+    total = sum(occupancy.counts) + sum(occupancy.unassigned)
+
+    print(f"{args.students} students x {args.periods} periods, {len(occupancy.rooms)} rooms")
+    print(f"  enrollment  : {count_seconds * 1000:10.2f} ms (once per roster)")
+    print(f"  full day    : {elapsed * 1000:10.2f} ms ({total} student-periods)")
+
+
+def write_badge_log(path, events, students, days=20, seed=1):
+    """Write a synthetic door log: events spread over school days from 06:30 to 16:00"""
+    rng = random.Random(seed)
+    dates = [f"2026-03-{day:02d}" for day in range(2, 32) if (day - 2) % 7 < 5][:days]
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'badge_id', 'door'])
+        for i in range(events):
+            seconds = rng.randrange(6 * 3600 + 1800, 16 * 3600)
+            writer.writerow([f"{dates[i * len(dates) // events]}T{format_hhmm(seconds)}:{seconds % 60:02d}",
+                             100000 + rng.randrange(students), f"D{rng.randrange(200)}"])
+
+
+def bench_annotate(args):
+    roster = make_roster(args.students, 9, 120)
+    fd, source = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    destination = source + '.out'
+    # Use the pool even for a benchmark-sized log
+    sh_sched_annotate.PARALLEL_MIN_BYTES = 0
+    try:
+        write_badge_log(source, args.events, args.students)
+        print(f"{args.events} events, {args.students} students, {os.cpu_count()} CPUs")
+        baseline = None
+        for workers in args.workers or sorted({1, os.cpu_count() or 1}):
+            report = annotate_file_parallel(source, destination, load_schedules(), Calendar(), roster, workers)
+            baseline = baseline or report.seconds
+            print(f"  {workers:2d} worker(s): {report.rows_per_second:12,.0f} events/s "
+                  f"({baseline / report.seconds:.2f}x)")
+        print(f"  resident memory after run: {resident_memory_bytes() / (1024 * 1024):.1f} MB")
+    finally:
+        os.remove(source)
+        if os.path.exists(destination):
+            os.remove(destination)
+
+
+def make_event_day(roster, schedule, late_every=20, hallway_every=15, seed=1):
+    """Synthetic swipes: each student enters their room around every bell, some late, some in the hall"""
+    rng = random.Random(seed)
+    events = []
+    for student in roster.students:
+        for start, end, period in period_intervals(schedule):
+            section = roster.section(student, period.name)
+            if section is None:
+                continue
+            late = rng.randrange(240, 900) if rng.randrange(late_every) == 0 else rng.randrange(-180, 60)
+            events.append((student, start + late, section.room))
+            if rng.randrange(hallway_every) == 0:
+                events.append((student, rng.randrange(start + 600, end), f"Hall {rng.randrange(12)}"))
+    return build_event_day(events)
+
+
+def bench_events(args):
+    schedule = load_schedules()['regular_schedule']
+    roster = make_roster(args.students, len(period_intervals(schedule)), args.rooms)
+    event_day = make_event_day(roster, schedule)
+    print(f"{args.students} students, {len(event_day)} events in one day")
+    for name, query in (('tardy', lambda: tardies(event_day, schedule, roster)),
+                        ('tardy (any room)', lambda: tardies(event_day, schedule)),
+                        ('hallway', lambda: hallway_sightings(event_day, schedule))):
+        start = time.perf_counter()
+        findings = query()
+        print(f"  {name:<17}: {(time.perf_counter() - start) * 1000:8.1f} ms, {len(findings)} results")
+
+
+def bench_timeline(args):
+    district = {school: build_schedules(data)
+                for school, data in json.loads(make_district(args.schools, 3, args.periods)).items()}
+    first = date(2026, 9, 1)
+    last = first + timedelta(days=364)
+    calendar = Calendar('schedule_0', first_day=first, last_day=last,
+                        days={first + timedelta(days=day): 'schedule_1' for day in range(3, 365, 30)})
+    with tempfile.TemporaryDirectory() as folder:
+        conn = connect_timeline(os.path.join(folder, 'timeline.db'))
+        print(f"{args.schools} schools, {first} to {last}")
+        print(f"  full build        : {build_timeline(conn, calendar, district, first, last).format_text()}")
+        for day in range(10, 365, 45):
+            calendar.set_day(first + timedelta(days=day), 'schedule_2')
+        print(f"  8 days changed    : {build_timeline(conn, calendar, district, first, last).format_text()}")
+        print(f"  nothing changed   : {build_timeline(conn, calendar, district, first, last).format_text()}")
+        for name, query in (('at 2026-11-04 10:41', lambda: happening_at(conn, '2026-11-04 10:41')),
+                            ('Extra Help in March', lambda: sessions(conn, 'Extra Help', '2027-03-01', '2027-03-31'))):
+            start = time.perf_counter()
+            rows = query()
+            print(f"  {name:<18}: {(time.perf_counter() - start) * 1000:8.2f} ms, {len(rows)} rows")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    memory = commands.add_parser('memory', help='Memory per schedule: plain dicts vs compact objects')
+    memory.add_argument('--schools', type=int, default=50)
+    memory.add_argument('--schedules', type=int, default=20)
+    memory.add_argument('--periods', type=int, default=12)
+    memory.set_defaults(func=bench_memory)
+
+    roster = commands.add_parser('roster', help='Roster index size and "where is student X" lookup time')
+    roster.add_argument('--students', type=int, default=50000)
+    roster.add_argument('--periods', type=int, default=9)
+    roster.add_argument('--rooms', type=int, default=120)
+    roster.add_argument('--lookups', type=int, default=200000)
+    roster.set_defaults(func=bench_roster)
+
+    sis = commands.add_parser('import', help='Streaming SIS CSV roster import throughput')
+    sis.add_argument('--rows', type=int, default=1000000)
+    sis.set_defaults(func=bench_import)
+
+    search = commands.add_parser('search', help='Name index build time and search-as-you-type latency')
+    search.add_argument('--students', type=int, default=50000)
+    search.add_argument('--names', type=int, default=500, help='names to type, one keystroke at a time')
+    search.set_defaults(func=bench_search)
+
+    occupancy = commands.add_parser('occupancy', help='Students per room per period for a full day')
+    occupancy.add_argument('--students', type=int, default=50000)
+    occupancy.add_argument('--periods', type=int, default=9)
+    occupancy.add_argument('--rooms', type=int, default=120)
+    occupancy.add_argument('--repeat', type=int, default=20)
+    occupancy.set_defaults(func=bench_occupancy)
+
+    annotate = commands.add_parser('annotate', help='Streaming badge-log annotation throughput')
+    annotate.add_argument('--events', type=int, default=1000000)
+    annotate.add_argument('--students', type=int, default=5000)
+    annotate.add_argument('--workers', type=int, nargs='+', help='worker counts to try (default: 1 and one per CPU)')
+    annotate.set_defaults(func=bench_annotate)
+
+    events = commands.add_parser('events', help='Tardy and hallway queries over one day of events')
+    events.add_argument('--students', type=int, default=5000)
+    events.add_argument('--rooms', type=int, default=150)
+    events.set_defaults(func=bench_events)
+
+    timeline = commands.add_parser('timeline', help='Materialize a school year: full and incremental builds')
+    timeline.add_argument('--schools', type=int, default=50)
+    timeline.add_argument('--periods', type=int, default=12)
+    timeline.set_defaults(func=bench_timeline)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""School calendar: which schedule runs on a given date.
+
+calendar.json lists the school year and the days that differ from the
+usual one; every other weekday in the year runs the default schedule:
+
+    {"default": "regular_schedule",
+     "school_days": [0, 1, 2, 3, 4],
+     "first_day": "2026-09-02", "last_day": "2027-06-24",
+     "days": {"2026-11-26": null, "2027-01-15": "two_hour_delay"}}
+
+school_days are weekday numbers (Monday is 0). A null day means no
+school. Without a calendar.json every weekday runs the default schedule.
+Dates are kept as ordinals, so a lookup is one dict get. An optional
+"timezone" ("America/Chicago") says which zone "today" is in for the
+command-line tools; by default it is this computer's.
+
+A day can also name an entry of "overrides", a base schedule with a few
+changes (see sh_sched_overrides), or of "rotations", whose days are
+given letters and keys like "ab:A" (see sh_sched_rotation); resolve()
+and schedule_on() turn those into Schedules.
+"""
+import json
+import os
+import sys
+from datetime import date
+
+from sh_sched_instrument import metrics
+from sh_sched_overrides import Override, override_schedule
+from sh_sched_rotation import Rotation, rotation_table, split_day_key
+
+CALENDAR_FILE = 'calendar.json'
+DEFAULT_SCHEDULE = 'regular_schedule'
+WEEKDAYS = (0, 1, 2, 3, 4)
+
+
+def parse_date(value):
+    """Accept a date or an ISO 'YYYY-MM-DD' string; return a date"""
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value).strip()[:10])
+
+
+class Calendar:
+    """Maps dates to schedule keys (None: no school)"""
+
+    def __init__(self, default=DEFAULT_SCHEDULE, school_days=WEEKDAYS, first_day=None, last_day=None, days=None,
+                 overrides=None, rotations=None, timezone=''):
+        self.default = sys.intern(default)
+        self.school_days = frozenset(school_days)
+        self.first_day = parse_date(first_day) if first_day else None
+        self.last_day = parse_date(last_day) if last_day else None
+        # ordinal -> schedule key or None
+        self.days = {parse_date(day).toordinal(): sys.intern(key) if key else None
+                     for day, key in (days or {}).items()}
+        self.overrides = {}
+        for key, data in (overrides or {}).items():
+            self.add_override(key, data.get('base', self.default), data.get('changes', ()))
+        self.rotations = {}
+        for key, data in (rotations or {}).items():
+            self.add_rotation(key, data.get('template', ''), data.get('letters', {}), data.get('cycle'))
+        self.day_keys = None    # ordinal -> 'rotation:letter', filled on first use
+        self.timezone = timezone or ''
+
+    def __repr__(self):
+        return f"Calendar({self.default!r}, {len(self.days)} special days)"
+
+    def schedule_for(self, day):
+        """Return the schedule key running on `day` (a date, ISO string or ordinal), or None"""
+        ordinal = day if isinstance(day, int) else parse_date(day).toordinal()
+        key = self._planned(ordinal)
+        if key in self.rotations:
+            return self._rotation_day(ordinal, key)
+        return key
+
+    def _planned(self, ordinal):
+        """The key for a day before rotation letters are assigned"""
+        if ordinal in self.days:
+            return self.days[ordinal]
+        if self.first_day and ordinal < self.first_day.toordinal():
+            return None
+        if self.last_day and ordinal > self.last_day.toordinal():
+            return None
+        # date.weekday() without building a date: ordinal 1 (0001-01-01) was a Monday
+        if (ordinal - 1) % 7 not in self.school_days:
+            return None
+        return self.default
+
+    def _rotation_day(self, ordinal, key):
+        if self.day_keys is None:
+            self.day_keys = self._assign_letters()
+        day_key = self.day_keys.get(ordinal)
+        if day_key is None:
+            # Outside the school year: count weekdays instead of school days
+            rotation = self.rotations[key]
+            full_weeks, rest = divmod(ordinal - 1, 7)
+            count = full_weeks * len(self.school_days) + sum(1 for weekday in range(rest) if weekday in self.school_days)
+            day_key = rotation.day_key(rotation.cycle[count % len(rotation.cycle)])
+        return day_key
+
+    def _assign_letters(self):
+        """Give every rotation day of the school year the next letter of its cycle"""
+        day_keys = {}
+        if not self.first_day or not self.last_day:
+            return day_keys
+        positions = {}
+        for ordinal in range(self.first_day.toordinal(), self.last_day.toordinal() + 1):
+            key = self._planned(ordinal)
+            if key in self.rotations:
+                rotation = self.rotations[key]
+                position = positions.get(key, 0)
+                day_keys[ordinal] = rotation.day_key(rotation.cycle[position % len(rotation.cycle)])
+                positions[key] = position + 1
+            elif key:
+                # A pinned letter restarts the cycle from that letter
+                key, letter = split_day_key(key)
+                if key in self.rotations and letter in self.rotations[key].cycle:
+                    positions[key] = self.rotations[key].cycle.index(letter) + 1
+        return day_keys
+
+    @property
+    def clock(self):
+        """The SchoolClock for this calendar's zone; raises ValueError for an unknown zone"""
+        from sh_sched_clock import get_clock
+        return get_clock(self.timezone)
+
+    def today(self):
+        """The current date in this calendar's zone"""
+        return self.clock.wall()[0]
+
+    def schedule_on(self, day, schedules):
+        """Return (key, Schedule) running on `day`; the Schedule is None on days off
+        or when `schedules` has no such key. Overrides are compiled here on first use.
+        """
+        key = self.schedule_for(day)
+        return key, self.resolve(key, schedules) if key else None
+
+    def resolve(self, key, schedules):
+        """Return the Schedule for a key from `schedules` or this calendar's overrides"""
+        override = self.overrides.get(key)
+        if override is not None:
+            return override_schedule(override, schedules)
+        table = self.rotation_table(key, schedules)
+        if table is not None:
+            return table.schedule
+        return schedules.get(key)
+
+    def rotation_table(self, key, schedules):
+        """The RotationTable for a day key like 'ab:A', or None if it is not a rotation day"""
+        rotation, letter = split_day_key(key)
+        rotation = self.rotations.get(rotation)
+        if rotation is None or letter is None:
+            return None
+        return rotation_table(rotation, letter, schedules)
+
+    def block_for(self, day, period, schedules):
+        """Which block meets in `period` on `day`: the period itself unless a rotation runs"""
+        table = self.rotation_table(self.schedule_for(day) or '', schedules)
+        if table is None:
+            return str(period)
+        return table.blocks.get(str(period))
+
+    def add_override(self, key, base, changes):
+        """Define (or replace) an override that days can name like a schedule"""
+        self.overrides[sys.intern(key)] = Override(sys.intern(key), base, changes)
+
+    def add_rotation(self, key, template, letters, cycle=None):
+        """Define (or replace) a rotation that days can name like a schedule"""
+        self.rotations[sys.intern(key)] = Rotation(sys.intern(key), template, letters, cycle)
+        self.day_keys = None
+
+    def set_day(self, day, key):
+        """Run schedule `key` on `day` (None: no school)"""
+        self.days[parse_date(day).toordinal()] = sys.intern(key) if key else None
+        self.day_keys = None
+
+    def to_dict(self):
+        data = {'default': self.default, 'school_days': sorted(self.school_days),
+                'days': {date.fromordinal(ordinal).isoformat(): key for ordinal, key in sorted(self.days.items())}}
+        if self.first_day:
+            data['first_day'] = self.first_day.isoformat()
+        if self.last_day:
+            data['last_day'] = self.last_day.isoformat()
+        if self.overrides:
+            data['overrides'] = {key: override.to_dict() for key, override in sorted(self.overrides.items())}
+        if self.rotations:
+            data['rotations'] = {key: rotation.to_dict() for key, rotation in sorted(self.rotations.items())}
+        if self.timezone:
+            data['timezone'] = self.timezone
+        return data
+
+
+def calendar_from_dict(data):
+    return Calendar(data.get('default', DEFAULT_SCHEDULE), data.get('school_days', WEEKDAYS),
+                    data.get('first_day'), data.get('last_day'), data.get('days', {}), data.get('overrides'),
+                    data.get('rotations'), data.get('timezone', ''))
+
+
+def _database(path):
+    """Return the SQLite database standing in for `path`, or None for JSON"""
+    if path.endswith(('.db', '.sqlite', '.sqlite3')) or os.environ.get('SH_SCHED_DB'):
+        import sh_sched_store
+        return sh_sched_store.resolve(path, CALENDAR_FILE)
+    return None
+
+
+def load_calendar(path=CALENDAR_FILE):
+    """Load calendar.json; a missing file gives the weekday default calendar"""
+    database = _database(path)
+    if database:
+        import sh_sched_store
+        data = sh_sched_store.load_calendar(database)
+        return calendar_from_dict(data) if data is not None else Calendar()
+    try:
+        with open(path, 'r') as f:
+            return calendar_from_dict(json.load(f))
+    except FileNotFoundError:
+        return Calendar()
+
+
+def save_calendar(calendar, path=CALENDAR_FILE):
+    database = _database(path)
+    if database:
+        import sh_sched_store
+        sh_sched_store.save_calendar(calendar.to_dict(), database)
+        return
+    text = json.dumps(calendar.to_dict(), indent=4)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+    metrics.record_write(len(text.encode('utf-8')))
+
+
+def main():
+    """Show which schedule runs on each date given (default: today)"""
+    import argparse
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('dates', nargs='*', help='YYYY-MM-DD')
+    parser.add_argument('--calendar', default=CALENDAR_FILE)
+    parser.add_argument('--periods', action='store_true', help='also list the periods (overrides applied)')
+    args = parser.parse_args()
+    calendar = load_calendar(args.calendar)
+    schedules = None
+    if args.periods:
+        from sh_sched_engine import load_schedules
+        schedules = load_schedules()
+    for day in args.dates or [calendar.today()]:
+        day = parse_date(day)
+        key = calendar.schedule_for(day)
+        override = calendar.overrides.get(key)
+        note = f" (override of {override.base})" if override else ''
+        print(f"{day.isoformat()} {day.strftime('%a')}  {key or 'No school'}{note}")
+        schedule = calendar.resolve(key, schedules) if schedules is not None and key else None
+        for period in schedule.periods if schedule else ():
+            print(f"    {period.start}-{period.end}  {period.display_name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""Zone-aware wall clock for the trackers, the calendar and the tools.
+
+Schedules hold wall-clock times ("08:13"), so the only thing a zone
+changes is how an instant (time.time()) maps to a date and a number of
+seconds since local midnight. SchoolClock precomputes, once per year,
+the UTC instants at which the zone's offset changes (DST starts and
+ends); turning an instant into (date, seconds) is then a bisect over a
+handful of entries plus integer arithmetic, and the segment lookup that
+follows is still schedule.minute_table()[seconds // 60], DST days
+included. On the spring-forward day the skipped hour simply never comes
+up; on the fall-back day the repeated hour maps to the same segments
+twice.
+
+Clocks are shared per zone name (get_clock), and schedules are shared per
+file by load_schedules, so buildings in different zones (an online
+academy) use the same compiled schedules, each through its own clock.
+
+JumpDetector notices the wall clock jumping between wakeups (the laptop
+slept, the clock was set by hand, NTP stepped it) so the trackers can
+refresh and re-aim their timers at once instead of up to a minute late.
+"""
+import calendar as _calendar
+import time
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sh_sched_engine import DAY_SECONDS
+from sh_sched_instrument import metrics
+
+# date.toordinal() of 1970-01-01
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# No zone is further than this from UTC
+MAX_OFFSET = 14 * 3600
+
+# Milliseconds between jump checks while a display is shown, and while it is hidden
+# (two clock reads each); the trackers also check on every timer wakeup
+JUMP_CHECK_MS = 5000
+JUMP_IDLE_CHECK_MS = 60000
+
+# Seconds the wall clock may disagree with the monotonic clock before it counts as a jump
+JUMP_TOLERANCE = 2.0
+
+# Clocks by zone name ('' is the computer's own zone)
+_clocks = {}
+
+
+class SchoolClock:
+    """Wall-clock time in one zone ('' for the computer's local zone)"""
+
+    def __init__(self, name=''):
+        self.name = name
+        if name:
+            try:
+                self.zone = ZoneInfo(name)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise ValueError(f"Unknown time zone {name!r}") from None
+        else:
+            self.zone = None
+        self.years = {}     # year -> (array of UTC instants, array of UTC offsets from each instant on)
+
+    def __repr__(self):
+        return f"SchoolClock({self.name or 'local'!r})"
+
+    def utcoffset(self, instant):
+        """The zone's UTC offset in seconds at an instant (slow path; used to build the tables)"""
+        if self.zone is None:
+            return time.localtime(instant).tm_gmtoff
+        return int(datetime.fromtimestamp(instant, self.zone).utcoffset().total_seconds())
+
+    def year_table(self, year):
+        """(instants, offsets) for a UTC year: offsets[i] applies from instants[i] on"""
+        table = self.years.get(year)
+        if table is None:
+            start = _calendar.timegm((year, 1, 1, 0, 0, 0))
+            end = _calendar.timegm((year + 1, 1, 1, 0, 0, 0))
+            instants = array('q', [start])
+            offsets = array('l', [self.utcoffset(start)])
+            # Offsets change at most a few times a year: test each day, then
+            # narrow a change down to the second
+            for day_start in range(start, end, DAY_SECONDS):
+                day_end = min(day_start + DAY_SECONDS, end)
+                if self.utcoffset(day_end - 1) == offsets[-1]:
+                    continue
+                low, high = day_start, day_end - 1
+                while low < high:
+                    middle = (low + high) // 2
+                    if self.utcoffset(middle) == offsets[-1]:
+                        low = middle + 1
+                    else:
+                        high = middle
+                instants.append(low)
+                offsets.append(self.utcoffset(low))
+            table = self.years[year] = (instants, offsets)
+        return table
+
+    def transitions(self, year):
+        """The offset changes in a year as [(UTC datetime, seconds before, seconds after)]"""
+        instants, offsets = self.year_table(year)
+        return [(datetime.fromtimestamp(instants[i], timezone.utc), offsets[i - 1], offsets[i])
+                for i in range(1, len(instants))]
+
+    def offset_at(self, instant):
+        instants, offsets = self.year_table(time.gmtime(instant).tm_year)
+        return offsets[bisect_right(instants, instant) - 1]
+
+    def wall(self, instant=None):
+        """Return (date, seconds since local midnight) at an instant (default: now)"""
+        if instant is None:
+            instant = time.time()
+        days, seconds = divmod(instant + self.offset_at(instant), DAY_SECONDS)
+        return date.fromordinal(EPOCH_ORDINAL + int(days)), seconds
+
+    def instant(self, day, seconds):
+        """The instant a local wall time happens (the first one, if the hour repeats).
+
+        A time skipped by spring-forward is read with the old offset, so
+        02:30 on that day is 03:30 with the new one.
+        """
+        local = (day.toordinal() - EPOCH_ORDINAL) * DAY_SECONDS + seconds
+        # UTC offsets are within 14 hours, so the instant lies between these
+        before = self.offset_at(local - MAX_OFFSET)
+        after = self.offset_at(local + MAX_OFFSET)
+        candidates = [instant for instant in (local - before, local - after)
+                      if instant + self.offset_at(instant) == local]
+        return min(candidates) if candidates else local - before
+
+    def until(self, day, seconds, instant=None):
+        """Real seconds from an instant (default: now) until a local wall time"""
+        return self.instant(day, seconds) - (time.time() if instant is None else instant)
+
+    def now(self):
+        """The current time as an aware datetime in this zone"""
+        if self.zone is None:
+            return datetime.now().astimezone()
+        return datetime.now(self.zone)
+
+    def segment(self, schedule, instant=None):
+        """The Segment of `schedule` in effect at an instant (default: now)"""
+        seconds = self.wall(instant)[1]
+        return schedule.minute_table()[int(seconds) // 60]
+
+
+class JumpDetector:
+    """Compares the wall and monotonic clocks at each check to spot a jump.
+
+    Both clocks advance together unless the wall clock is set or the
+    machine sleeps. Where the monotonic clock stops during sleep (Linux,
+    macOS) a sleep shows up as the wall clock running ahead; where it keeps
+    counting (Windows) a timer due during the sleep fires late. Either is
+    a jump. Checks can come from any timer at any interval: a timer passes
+    the deadline() it was aimed at so its own lateness is judged.
+    """
+
+    def __init__(self, tolerance=JUMP_TOLERANCE):
+        self.tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        self.wall = time.time()
+        self.monotonic = time.monotonic()
+
+    def deadline(self, delay_ms):
+        """The monotonic time a timer started now for `delay_ms` is due"""
+        return time.monotonic() + delay_ms / 1000
+
+    def check(self, due=None):
+        """Seconds the clock jumped since the last check (0.0 if it did not)
+
+        `due` is the deadline() of the timer that is checking, if any.
+        """
+        wall, monotonic = time.time(), time.monotonic()
+        drift = (wall - self.wall) - (monotonic - self.monotonic)
+        self.wall, self.monotonic = wall, monotonic
+        if abs(drift) > self.tolerance:
+            jump = drift
+        elif due is not None and monotonic - due > self.tolerance:
+            jump = monotonic - due
+        else:
+            return 0.0
+        metrics.inc('clock_jumps')
+        metrics.inc('clock_jump_seconds', int(abs(jump)))
+        return jump
+
+
+def get_clock(name=''):
+    """The shared SchoolClock for a zone name; raises ValueError for an unknown zone"""
+    clock = _clocks.get(name)
+    if clock is None:
+        clock = _clocks[name] = SchoolClock(name)
+    return clock
+
+
+def main():
+    """Show the local date and time, and the year's DST changes, for time zones"""
+    import argparse
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('zones', nargs='*', help="e.g. America/New_York (default: this computer's zone)")
+    parser.add_argument('--year', type=int, default=date.today().year)
+    args = parser.parse_args()
+    for name in args.zones or ['']:
+        clock = get_clock(name)
+        day, seconds = clock.wall()
+        seconds = int(seconds)
+        print(f"{name or 'local'}: {day.isoformat()} {seconds // 3600:02d}:{seconds // 60 % 60:02d}")
+        for when, before, after in clock.transitions(args.year):
+            print(f"    {when:%Y-%m-%d %H:%M} UTC  UTC{before / 3600:+g} -> UTC{after / 3600:+g}")
+
+
+if __name__ == '__main__':
+    main()
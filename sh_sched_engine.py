@@ -0,0 +1,583 @@
+"""Shared schedule data model for the Qt and Tk schedule trackers.
+
+Schedules are read from schedules.json once and turned into compact,
+read-only Period and Schedule objects. Every window that loads the same
+file gets the same objects back, so nothing is duplicated per view.
+
+Each Schedule is also compiled into an ordered run of Segments covering
+the whole day. A segment carries its status message already formatted
+(and interned), so a lookup is one bisect and returns a shared object.
+
+A schedule can also have tracks (lunch waves, grade bands): extra
+periods that run alongside the main list for some students only. Each
+track gets its own compiled view, and a TrackIndex answers "which tracks
+are in a period at T" for all of them at once.
+"""
+import heapq
+import json
+import os
+import sys
+from array import array
+from bisect import bisect_right
+from collections import deque
+from itertools import islice
+from types import MappingProxyType
+
+from sh_sched_instrument import profiled, metrics
+
+# Default schedule file layout
+SCHEDULES_FILE = 'schedules.json'
+SCHOOL_KEY = 'southampton_high_school'
+SCHEDULE_KEYS = ('regular_schedule', 'two_hour_delay', 'homeroom_schedule')
+
+# Marker used in the start/end columns for a missing time
+NO_TIME = -1
+
+# Fixed day boundaries used by the status messages
+DAY_SECONDS = 24 * 3600
+WARNING_BELL = 7 * 3600 + 25 * 60   # 07:25, end of "Before School"
+AFTER_SCHOOL = 14 * 3600 + 30 * 60  # 14:30, start of "After School"
+
+# Segment kinds
+BEFORE_SCHOOL = 'before_school'
+WAITING = 'waiting'          # between the warning bell and Period 1
+PERIOD = 'period'
+PASSING = 'passing'          # between two periods
+AFTER_SCHOOL_KIND = 'after_school'
+NOT_IN_SESSION = 'not_in_session'
+NO_SCHEDULE = 'no_schedule'
+
+# Default length of the "Coming Up" lookahead
+UPCOMING_COUNT = 4
+
+# Loaded schedule sets, keyed by (absolute path, school, file mtime)
+_loaded = {}
+
+
+def parse_hhmm(value):
+    """Convert an 'HH:MM' string to seconds since midnight (NO_TIME if empty)"""
+    if not value:
+        return NO_TIME
+    hours, minutes = str(value).split(':')
+    return int(hours) * 3600 + int(minutes) * 60
+
+
+def format_hhmm(seconds):
+    """Convert seconds since midnight back to an 'HH:MM' string"""
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+def _intern(value):
+    return sys.intern(str(value)) if value not in (None, '') else None
+
+
+class Period:
+    """A single named period; names and times are interned strings"""
+    __slots__ = ('name', 'start', 'end')
+
+    def __init__(self, name, start, end):
+        object.__setattr__(self, 'name', _intern(name) or '')
+        object.__setattr__(self, 'start', _intern(start))
+        object.__setattr__(self, 'end', _intern(end))
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} objects are read-only")
+
+    def __repr__(self):
+        return f"Period({self.name!r}, {self.start!r}, {self.end!r})"
+
+    def __reduce__(self):
+        # Read-only, so pickle rebuilds it through __init__ (for worker processes)
+        return Period, (self.name, self.start, self.end)
+
+    @property
+    def display_name(self):
+        """Numbered periods display as 'Period N', named ones as-is"""
+        return f"Period {self.name}" if self.name.isdigit() else self.name
+
+    def to_dict(self):
+        return {'name': self.name, 'start': self.start, 'end': self.end}
+
+
+class Segment:
+    """A stretch of the day with one status message, [start, end) in seconds"""
+    __slots__ = ('start', 'end', 'kind', 'message', 'current', 'next')
+
+    def __init__(self, start, end, kind, message, current=None, next=None):
+        object.__setattr__(self, 'start', start)
+        object.__setattr__(self, 'end', end)
+        object.__setattr__(self, 'kind', kind)
+        object.__setattr__(self, 'message', sys.intern(message))
+        object.__setattr__(self, 'current', current)
+        object.__setattr__(self, 'next', next)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} objects are read-only")
+
+    def __repr__(self):
+        return f"Segment({format_hhmm(self.start)}-{format_hhmm(self.end)}, {self.kind}, {self.message!r})"
+
+    def __str__(self):
+        return self.message
+
+    def __reduce__(self):
+        return Segment, (self.start, self.end, self.kind, self.message, self.current, self.next)
+
+
+def _classify(periods, starts, ends, now):
+    """Return (kind, message, current, next) for a time of day, to the minute.
+
+    Period ends are inclusive: a period ending at 08:10 lasts until 08:11.
+    Only used while compiling segments; lookups never call it.
+    """
+    if now < WARNING_BELL:
+        return BEFORE_SCHOOL, "Before School", None, None
+    first = next((i for i, period in enumerate(periods) if period.name == '1'), -1)
+    if first >= 0 and starts[first] != NO_TIME and now < starts[first]:
+        return WAITING, f"Period 1 starts at {periods[first].start}", None, periods[first]
+    if now >= AFTER_SCHOOL:
+        return AFTER_SCHOOL_KIND, "After School", None, None
+    for i, period in enumerate(periods):
+        if starts[i] != NO_TIME and ends[i] != NO_TIME and starts[i] <= now < ends[i] + 60:
+            following = periods[i + 1] if i + 1 < len(periods) else None
+            return PERIOD, period.display_name, period, following
+    for i in range(len(periods) - 1):
+        if ends[i] != NO_TIME and starts[i + 1] != NO_TIME and ends[i] + 60 <= now < starts[i + 1]:
+            return (PASSING, f"{periods[i].display_name} → {periods[i + 1].display_name}",
+                    periods[i], periods[i + 1])
+    return NOT_IN_SESSION, "Not in Session", None, None
+
+
+def compile_segments(periods, starts, ends):
+    """Split the day into Segments wherever the status message changes"""
+    cuts = {0, WARNING_BELL, AFTER_SCHOOL}
+    for start, end in zip(starts, ends):
+        if start != NO_TIME:
+            cuts.add(start)
+        if end != NO_TIME:
+            cuts.add(end + 60)
+    cuts = sorted(t for t in cuts if 0 <= t < DAY_SECONDS)
+    segments = []
+    for i, start in enumerate(cuts):
+        state = _classify(periods, starts, ends, start)
+        if segments and (segments[-1].kind, segments[-1].message) == state[:2]:
+            # Same message as the previous cut: extend it instead
+            last = segments.pop()
+            start = last.start
+        end = cuts[i + 1] if i + 1 < len(cuts) else DAY_SECONDS
+        segments.append(Segment(start, end, *state))
+    return tuple(segments)
+
+
+class TrackIndex:
+    """Every track's periods merged into one interval index.
+
+    boundaries holds each start and end (end + 60 s: ends are inclusive)
+    of every track period, sorted; active[i] is the (track, Period) pairs
+    in effect from boundaries[i] to the next boundary, built by one sweep.
+    A lookup is one bisect plus the k active pairs.
+    """
+    __slots__ = ('boundaries', 'active')
+
+    def __init__(self, tracks):
+        events = []
+        for track, periods in tracks.items():
+            for period in periods:
+                start, end = parse_hhmm(period.start), parse_hhmm(period.end)
+                if start != NO_TIME and end != NO_TIME:
+                    events.append((start, 1, track, period))
+                    events.append((end + 60, 0, track, period))
+        events.sort(key=lambda event: (event[0], event[1]))
+        boundaries = array('l', [0])
+        active = [()]
+        current = {}
+        for index, (seconds, starting, track, period) in enumerate(events):
+            if starting:
+                current[(track, id(period))] = (track, period)
+            else:
+                current.pop((track, id(period)), None)
+            # Close the slot once every event at this time is applied
+            if index + 1 == len(events) or events[index + 1][0] != seconds:
+                pairs = tuple(sorted(current.values(), key=lambda pair: pair[0]))
+                if boundaries[-1] == seconds:
+                    active[-1] = pairs
+                else:
+                    boundaries.append(seconds)
+                    active.append(pairs)
+        object.__setattr__(self, 'boundaries', boundaries)
+        object.__setattr__(self, 'active', tuple(active))
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} objects are read-only")
+
+    def at(self, seconds):
+        """Return the (track, Period) pairs in effect at `seconds`, sorted by track"""
+        return self.active[bisect_right(self.boundaries, seconds) - 1]
+
+
+def merge_track(periods, track_periods):
+    """A track's day: its own periods plus every main period they don't overlap"""
+    spans = [(parse_hhmm(p.start), parse_hhmm(p.end)) for p in track_periods]
+    kept = [p for p in periods
+            if not any(start <= parse_hhmm(p.end) and parse_hhmm(p.start) <= end for start, end in spans)]
+    return sorted(kept + list(track_periods), key=lambda p: parse_hhmm(p.start))
+
+
+# Shared by every schedule without tracks
+NO_TRACKS = MappingProxyType({})
+
+# Returned for a schedule key that is not in the file
+MISSING_SEGMENT = Segment(0, DAY_SECONDS, NO_SCHEDULE, "No schedule defined")
+
+
+class Schedule:
+    """An ordered list of periods plus array-backed start/end columns.
+
+    starts[i] and ends[i] hold the seconds since midnight for periods[i]
+    (NO_TIME when the time is missing) so lookups never parse strings.
+    segments covers the whole day; segment_starts[i] is segments[i].start.
+    Both are compiled on the first lookup, so schedules that are loaded but
+    never looked up (other schools in the file) stay small.
+    """
+    __slots__ = ('key', 'periods', 'starts', 'ends', 'compiled', 'by_minute',
+                 'tracks', 'track_index', 'track_views')
+
+    def __init__(self, key, periods, tracks=None):
+        periods = tuple(periods)
+        starts = array('l', (parse_hhmm(p.start) for p in periods))
+        ends = array('l', (parse_hhmm(p.end) for p in periods))
+        object.__setattr__(self, 'key', sys.intern(key))
+        object.__setattr__(self, 'periods', periods)
+        object.__setattr__(self, 'starts', starts)
+        object.__setattr__(self, 'ends', ends)
+        object.__setattr__(self, 'compiled', None)
+        object.__setattr__(self, 'by_minute', None)
+        if tracks:
+            tracks = MappingProxyType({sys.intern(str(name)): tuple(track) for name, track in tracks.items()})
+        object.__setattr__(self, 'tracks', tracks or NO_TRACKS)
+        object.__setattr__(self, 'track_index', None)
+        object.__setattr__(self, 'track_views', None)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} objects are read-only")
+
+    def __repr__(self):
+        return f"Schedule({self.key!r}, {len(self.periods)} periods)"
+
+    def __reduce__(self):
+        # Segments are recompiled on the other side rather than pickled
+        return Schedule, (self.key, self.periods, dict(self.tracks))
+
+    def __len__(self):
+        return len(self.periods)
+
+    def find(self, name):
+        """Return the index of the period with the given name, or -1"""
+        name = str(name)
+        for i, period in enumerate(self.periods):
+            if period.name == name:
+                return i
+        return -1
+
+    def compile(self):
+        """Return (segments, segment_starts), compiled on first use"""
+        compiled = self.compiled
+        if compiled is None:
+            segments = compile_segments(self.periods, self.starts, self.ends)
+            compiled = (segments, array('l', (seg.start for seg in segments)))
+            object.__setattr__(self, 'compiled', compiled)
+        return compiled
+
+    @property
+    def segments(self):
+        return self.compile()[0]
+
+    @property
+    def segment_starts(self):
+        return self.compile()[1]
+
+    def segment_at(self, seconds):
+        """Return the Segment in effect at `seconds` since midnight"""
+        segments, segment_starts = self.compile()
+        index = bisect_right(segment_starts, seconds) - 1
+        return segments[min(max(index, 0), len(segments) - 1)]
+
+    def minute_table(self):
+        """Return the Segment for each minute of the day (1440 entries), built on first use
+
+        Segments always start on a whole minute, so table[seconds // 60] is
+        the same as segment_at(seconds) without the bisect; batch lookups
+        use it.
+        """
+        if self.by_minute is None:
+            object.__setattr__(self, 'by_minute',
+                               tuple(self.segment_at(minute * 60) for minute in range(DAY_SECONDS // 60)))
+        return self.by_minute
+
+    def active_tracks(self, seconds):
+        """Return the (track, Period) pairs in effect at `seconds`; the index is built on first use"""
+        if self.track_index is None:
+            object.__setattr__(self, 'track_index', TrackIndex(self.tracks))
+        return self.track_index.at(seconds)
+
+    def track_schedule(self, track):
+        """This schedule as seen by one track, compiled on first use (itself for other tracks)"""
+        if track not in self.tracks:
+            return self
+        if self.track_views is None:
+            object.__setattr__(self, 'track_views', {})
+        view = self.track_views.get(track)
+        if view is None:
+            view = self.track_views[track] = Schedule(self.key, merge_track(self.periods, self.tracks[track]))
+        return view
+
+    def boundaries(self):
+        """Return every time of day at which this schedule's message changes"""
+        return self.segment_starts[1:]
+
+    def to_dict(self):
+        data = {'periods': [p.to_dict() for p in self.periods]}
+        if self.tracks:
+            data['tracks'] = {name: [p.to_dict() for p in track] for name, track in self.tracks.items()}
+        return data
+
+
+def next_boundary(schedules, seconds):
+    """Return the first time of day after `seconds` at which any schedule can change
+
+    Midnight (DAY_SECONDS) is returned when nothing else is left today.
+    """
+    best = DAY_SECONDS
+    for schedule in schedules.values():
+        starts = schedule.segment_starts
+        index = bisect_right(starts, seconds)
+        if index < len(starts) and starts[index] < best:
+            best = starts[index]
+    return best
+
+
+def segment_of(schedules, key, seconds):
+    """Return the Segment for schedule `key` at `seconds` (MISSING_SEGMENT if it is not defined)"""
+    metrics.inc('engine_lookups')
+    schedule = schedules.get(key)
+    if schedule is None:
+        return MISSING_SEGMENT
+    return schedule.segment_at(seconds)
+
+
+def _transitions(order, key, schedule, seconds):
+    index = bisect_right(schedule.segment_starts, seconds)
+    for segment in schedule.segments[index:]:
+        yield segment.start, order, key, segment
+
+
+def iter_transitions(schedules, seconds, keys=None):
+    """Yield (time, schedule key, Segment) for each transition after `seconds` today, in time order
+
+    A k-way merge over the compiled segment lists: each schedule is read
+    lazily, so taking the next few items costs O(k log k) per item.
+    Transitions at the same time come out in `keys` order.
+    """
+    streams = [_transitions(order, key, schedules[key], seconds)
+               for order, key in enumerate(keys or schedules) if key in schedules]
+    for start, _, key, segment in heapq.merge(*streams):
+        yield start, key, segment
+
+
+def upcoming_transitions(schedules, seconds, count=UPCOMING_COUNT, keys=None):
+    """Return the next `count` transitions across `schedules` (see iter_transitions)"""
+    return list(islice(iter_transitions(schedules, seconds, keys), count))
+
+
+def format_countdown(seconds):
+    """Format a wait as 'now', 'in 5 min' or 'in 1 h 05 min' (rounded up to the minute)"""
+    minutes = -(-int(seconds) // 60)
+    if minutes <= 0:
+        return "now"
+    if minutes < 60:
+        return f"in {minutes} min"
+    return f"in {minutes // 60} h {minutes % 60:02d} min"
+
+
+def schedule_title(key):
+    """A heading for a schedule key: 'two_hour_delay' -> 'Two Hour Delay'"""
+    return key.replace('_', ' ').title()
+
+
+class Lookahead:
+    """A window of the next `count` transitions that slides as time passes.
+
+    advance() pops transitions that have passed off the head and appends
+    the same number from the merged stream, so a display can move rows
+    instead of rebuilding its list. It starts over when the schedules
+    change or the clock goes backwards (test mode, a new day).
+    """
+
+    def __init__(self, count=UPCOMING_COUNT, keys=None):
+        self.count = count
+        self.keys = keys
+        self.items = deque()
+        self.stream = iter(())
+        self.schedules = None
+        self.seconds = None
+
+    def reset(self, schedules, seconds):
+        self.schedules = schedules
+        self.seconds = seconds
+        self.stream = iter_transitions(schedules, seconds, self.keys)
+        self.items = deque(islice(self.stream, self.count))
+
+    def invalidate(self):
+        """Rebuild on the next advance(), e.g. after the clock jumped"""
+        self.seconds = None
+
+    def advance(self, schedules, seconds):
+        """Move the window to `seconds`; returns how many items were popped, or None if rebuilt"""
+        if schedules is not self.schedules or self.seconds is None or seconds < self.seconds:
+            self.reset(schedules, seconds)
+            return None
+        self.seconds = seconds
+        popped = 0
+        while self.items and self.items[0][0] <= seconds:
+            self.items.popleft()
+            popped += 1
+            item = next(self.stream, None)
+            if item is not None:
+                self.items.append(item)
+        return popped
+
+
+def build_schedule(key, data):
+    """Build a Schedule from its JSON form ({'periods': [...]} or a bare list)"""
+    tracks = {}
+    if isinstance(data, dict):
+        tracks = {name: [Period(p.get('name', ''), p.get('start'), p.get('end')) for p in track or []]
+                  for name, track in (data.get('tracks') or {}).items()}
+        data = data.get('periods', [])
+    return Schedule(key, (Period(p.get('name', ''), p.get('start'), p.get('end')) for p in data or []), tracks)
+
+
+def build_schedules(data):
+    """Build a read-only mapping of Schedules from a school's JSON data"""
+    return MappingProxyType({key: build_schedule(key, value) for key, value in data.items()})
+
+
+def track_names(schedules):
+    """Every track name used by any of the schedules, sorted"""
+    return sorted({name for schedule in schedules.values() for name in schedule.tracks})
+
+
+# (id of a schedules mapping, track) -> (that mapping, its track view)
+_track_views = {}
+
+
+def track_view(schedules, track):
+    """The schedules as one track sees them, as a read-only mapping.
+
+    Returns `schedules` itself when no track is chosen. The same view
+    object comes back for the same mapping, so displays can compare by
+    identity (as Lookahead does).
+    """
+    if not track:
+        return schedules
+    cached = _track_views.get((id(schedules), track))
+    if cached is not None and cached[0] is schedules:
+        return cached[1]
+    view = MappingProxyType({key: schedule.track_schedule(track) for key, schedule in schedules.items()})
+    if len(_track_views) >= 8:
+        _track_views.clear()
+    _track_views[(id(schedules), track)] = (schedules, view)
+    return view
+
+
+def schedules_to_dict(schedules):
+    """Convert Schedules back to the plain JSON form used by the editors"""
+    return {key: schedule.to_dict() for key, schedule in schedules.items()}
+
+
+def _database(path):
+    """Return the SQLite database standing in for `path`, or None for JSON"""
+    if path.endswith(('.db', '.sqlite', '.sqlite3')) or os.environ.get('SH_SCHED_DB'):
+        import sh_sched_store
+        return sh_sched_store.resolve(path, SCHEDULES_FILE)
+    return None
+
+
+@profiled()
+def load_schedules(path=SCHEDULES_FILE, school=SCHOOL_KEY):
+    """Load a school's schedules, reusing the objects already built for this file.
+
+    A database path (or SH_SCHED_DB, see sh_sched_store) is read instead
+    of the JSON file; the cache then follows the database's revision.
+    """
+    database = _database(path)
+    full_path = os.path.abspath(database or path)
+    if database:
+        import sh_sched_store
+        cache_key = (full_path, school, sh_sched_store.schedules_revision(full_path))
+    else:
+        cache_key = (full_path, school, os.stat(full_path).st_mtime_ns)
+    schedules = _loaded.get(cache_key)
+    if schedules is None:
+        if database:
+            revision, school_data = sh_sched_store.load_schedules(full_path, school)
+            cache_key = cache_key[:2] + (revision,)
+        else:
+            with open(full_path, 'r') as f:
+                school_data = json.load(f).get(school, {})
+        schedules = build_schedules(school_data)
+        metrics.inc('schedule_reloads')
+        # Only the newest version of each file is worth keeping
+        for key in [k for k in _loaded if k[:2] == cache_key[:2]]:
+            del _loaded[key]
+        _loaded[cache_key] = schedules
+    return schedules
+
+
+@profiled()
+def save_schedules(schedules, path=SCHEDULES_FILE, school=SCHOOL_KEY):
+    """Write schedules back to disk, keeping any other schools in the file"""
+    database = _database(path)
+    if database:
+        # Only the given schedules are replaced, in one transaction
+        import sh_sched_store
+        sh_sched_store.save_schedules({key: schedule.to_dict() if isinstance(schedule, Schedule) else schedule
+                                       for key, schedule in schedules.items()}, database, school)
+        return
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        data = {}
+    school_data = data.setdefault(school, {})
+    for key, schedule in schedules.items():
+        school_data[key] = schedule.to_dict() if isinstance(schedule, Schedule) else schedule
+    text = json.dumps(data, indent=4)
+    with open(path, 'w') as f:
+        f.write(text)
+    metrics.record_write(len(text.encode('utf-8')))
+
+
+def main():
+    """Print each schedule's status at a time of day (default: now)"""
+    import argparse
+    from datetime import datetime
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('time', nargs='?', help='HH:MM (default: now)')
+    parser.add_argument('--file', default=SCHEDULES_FILE)
+    parser.add_argument('--school', default=SCHOOL_KEY)
+    parser.add_argument('--upcoming', type=int, default=0, metavar='N',
+                        help='also list the next N transitions')
+    args = parser.parse_args()
+    seconds = parse_hhmm(args.time or datetime.now().strftime("%H:%M"))
+    schedules = load_schedules(args.file, args.school)
+    for key, schedule in schedules.items():
+        print(f"{key:<20}{schedule.segment_at(seconds).message}")
+    if args.upcoming:
+        print()
+        for start, key, segment in upcoming_transitions(schedules, seconds, args.upcoming):
+            print(f"{format_hhmm(start)}  {key:<20}{segment.message}  ({format_countdown(start - seconds)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""Tardy and hallway queries over one day of badge/door events.
+
+A day's events are held per student, sorted by time, in one flat array
+(EventDay): student i's events are times[offsets[i]:offsets[i + 1]].
+The day's periods are sorted too, so each query is a merge of two
+sorted lists per student, walking both once, instead of testing every
+event against every period:
+
+- tardies(): the first swipe into the expected room (or any room when
+  there is no roster) after the previous period ended, compared with
+  the period start plus a grace time;
+- hallway_sightings(): hallway sensor events that fall inside a period.
+
+Events are read with the same field names as sh_sched_annotate.
+"""
+import csv
+import json
+import sys
+from array import array
+
+from sh_sched_engine import PERIOD, format_hhmm
+from sh_sched_instrument import profiled
+from sh_sched_annotate import TIMESTAMP_FIELDS, PERSON_FIELDS, log_format, split_timestamp
+from sh_sched_roster import period_key
+
+LOCATION_FIELDS = ('door', 'room', 'location', 'reader', 'sensor')
+
+# Locations starting with one of these (lower-cased) are hallway sensors
+HALLWAY_PREFIXES = ('hall',)
+
+# Minutes after the bell before an arrival counts as tardy
+DEFAULT_GRACE = 3
+
+TARDY = 'tardy'
+NOT_SEEN = 'not_seen'
+HALLWAY = 'hallway'
+
+
+def is_hallway(location, prefixes=HALLWAY_PREFIXES):
+    return location.lower().startswith(prefixes)
+
+
+class Finding:
+    """One query result; minutes is how late (tardy) or 0"""
+    __slots__ = ('kind', 'student', 'period', 'time', 'location', 'minutes')
+
+    def __init__(self, kind, student, period, time, location='', minutes=0):
+        self.kind = kind
+        self.student = student
+        self.period = period
+        self.time = time
+        self.location = location
+        self.minutes = minutes
+
+    def __repr__(self):
+        return f"Finding({self.kind!r}, {self.student!r}, {self.period.display_name!r}, {self.time})"
+
+    def format_text(self):
+        when = f"{format_hhmm(self.time)}:{self.time % 60:02d}" if self.time >= 0 else "--:--"
+        text = f"{self.student:<12}{self.period.display_name:<16}{when:<10}{self.location}"
+        if self.kind == TARDY:
+            text += f"  ({self.minutes} min late)"
+        elif self.kind == NOT_SEEN:
+            text += "  (not seen)"
+        return text
+
+
+class EventDay:
+    """One day's events, grouped by student and sorted by time within each student"""
+
+    def __init__(self, students, offsets, times, locations):
+        self.students = students      # student ids, sorted
+        self.offsets = offsets        # array: events of students[i] are [offsets[i], offsets[i + 1])
+        self.times = times            # array: seconds since midnight
+        self.locations = locations    # interned location names, parallel to times
+
+    def __len__(self):
+        return len(self.times)
+
+    def __repr__(self):
+        return f"EventDay({len(self.students)} students, {len(self.times)} events)"
+
+    def events(self, index):
+        """Return (times, locations, start, end) for the student at `index`"""
+        return self.times, self.locations, self.offsets[index], self.offsets[index + 1]
+
+
+def build_event_day(events):
+    """Build an EventDay from (student, seconds, location) tuples in any order"""
+    events = sorted(events)
+    students = []
+    offsets = array('l')
+    times = array('l')
+    locations = []
+    previous = None
+    for student, seconds, location in events:
+        if student != previous:
+            students.append(student)
+            offsets.append(len(times))
+            previous = student
+        times.append(seconds)
+        locations.append(location)
+    offsets.append(len(times))
+    return EventDay(tuple(students), offsets, times, locations)
+
+
+@profiled()
+def load_event_day(path, day):
+    """Read the events of one date ('YYYY-MM-DD') from a CSV or JSON Lines log"""
+    events = []
+    intern = sys.intern
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if log_format(path) == 'jsonl':
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        for record in records:
+            record = {str(key).strip().lower(): value for key, value in record.items()}
+            timestamp = next((record[name] for name in TIMESTAMP_FIELDS if name in record), '')
+            # Cheap date check before parsing the time
+            if isinstance(timestamp, str) and timestamp[:10] != day and timestamp[10:11] in ('T', ' '):
+                continue
+            parts = split_timestamp(timestamp)
+            if parts is None or parts[0] != day:
+                continue
+            student = next((str(record[name]) for name in PERSON_FIELDS if record.get(name) not in (None, '')), None)
+            if student is None:
+                continue
+            location = next((str(record[name]) for name in LOCATION_FIELDS if name in record), '')
+            events.append((intern(student), parts[1], intern(location)))
+    return build_event_day(events)
+
+
+def period_intervals(schedule):
+    """Return the schedule's periods as [(start, end, Period)], sorted by start"""
+    return [(segment.start, segment.end, segment.current) for segment in schedule.segments
+            if segment.kind == PERIOD]
+
+
+@profiled()
+def tardies(event_day, schedule, roster=None, grace=DEFAULT_GRACE, include_not_seen=False):
+    """Students whose first swipe into class came more than `grace` minutes after the bell.
+
+    The arrival window of a period opens at the previous period's end
+    bell, so swiping in during passing time is on time. With a roster only the
+    student's own room counts; without one, any location that is not a
+    hallway. include_not_seen adds periods with no arrival at all (only
+    for students with a section that period when a roster is given).
+    Only students with at least one event that day are considered.
+    """
+    periods = period_intervals(schedule)
+    # Segment ends are a minute past the end bell (period ends are inclusive)
+    opens = [0] + [end - 60 for _, end, _ in periods[:-1]]
+    columns = [roster.columns.get(period_key(period.name)) for _, _, period in periods] if roster is not None else None
+    grace_seconds = grace * 60
+    findings = []
+    for index, student in enumerate(event_day.students):
+        times, locations, position, end = event_day.events(index)
+        row = roster.rows.get(student) if roster is not None else None
+        if roster is not None and row is None:
+            continue
+        for number, (start, stop, period) in enumerate(periods):
+            expected = None
+            if roster is not None:
+                column = columns[number]
+                section = roster.sections[roster.matrix[row * len(roster.periods) + column]] if column is not None else None
+                if section is None:
+                    continue
+                expected = section.room
+            # Merge step: skip this student's events before the window opens
+            while position < end and times[position] < opens[number]:
+                position += 1
+            scan = position
+            arrival = -1
+            while scan < end and times[scan] < stop:
+                location = locations[scan]
+                if expected is None:
+                    arrived = not is_hallway(location)
+                else:
+                    arrived = location == expected
+                if arrived:
+                    arrival = scan
+                    break
+                scan += 1
+            if arrival < 0:
+                if include_not_seen:
+                    findings.append(Finding(NOT_SEEN, student, period, -1, expected or ''))
+                continue
+            late = times[arrival] - start
+            if late > grace_seconds:
+                findings.append(Finding(TARDY, student, period, times[arrival], locations[arrival], late // 60))
+    return findings
+
+
+@profiled()
+def hallway_sightings(event_day, schedule, prefixes=HALLWAY_PREFIXES):
+    """Hallway sensor events that happened while a period was in session"""
+    periods = period_intervals(schedule)
+    findings = []
+    for index, student in enumerate(event_day.students):
+        times, locations, position, end = event_day.events(index)
+        number = 0
+        # Both lists are sorted: advance whichever is behind
+        while position < end and number < len(periods):
+            start, stop, period = periods[number]
+            seconds = times[position]
+            if seconds >= stop:
+                number += 1
+            elif seconds < start:
+                position += 1
+            else:
+                if is_hallway(locations[position], prefixes):
+                    findings.append(Finding(HALLWAY, student, period, seconds, locations[position]))
+                position += 1
+    return findings
+
+
+def main():
+    """Report tardies or hallway sightings for one day of a badge/door log"""
+    import argparse
+    import time
+    from datetime import date
+    from sh_sched_engine import load_schedules
+    from sh_sched_calendar import CALENDAR_FILE, load_calendar
+    from sh_sched_roster import load_roster
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('query', choices=('tardy', 'hallway'))
+    parser.add_argument('log')
+    parser.add_argument('--date', default=date.today().isoformat(), help='YYYY-MM-DD (default: today)')
+    parser.add_argument('--grace', type=int, default=DEFAULT_GRACE, help='minutes (tardy)')
+    parser.add_argument('--roster', help='only count swipes into each student\'s own room (tardy)')
+    parser.add_argument('--not-seen', action='store_true', help='also list periods with no arrival (tardy)')
+    parser.add_argument('--calendar', default=CALENDAR_FILE)
+    args = parser.parse_args()
+    key, schedule = load_calendar(args.calendar).schedule_on(args.date, load_schedules())
+    if schedule is None:
+        print(f"No schedule runs on {args.date}")
+        return
+    event_day = load_event_day(args.log, args.date)
+    started = time.perf_counter()
+    if args.query == 'tardy':
+        roster = load_roster(args.roster) if args.roster else None
+        findings = tardies(event_day, schedule, roster, args.grace, args.not_seen)
+    else:
+        findings = hallway_sightings(event_day, schedule)
+    elapsed = time.perf_counter() - started
+    for finding in findings:
+        print(finding.format_text())
+    print(f"{len(findings)} results from {len(event_day)} events ({key}) in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""One running tracker per user; later launches forward their arguments to it.
+
+The first tracker to start takes an OS lock on instance.lock next to
+settings.json and listens on a localhost socket whose port it writes to
+instance.json. A later launch finds the lock taken, sends its commands
+to that port and exits:
+
+    python sh_sched_tracker_qt6.py              # shows the running tracker's window
+    python sh_sched_tracker_qt6.py --reload     # ... and has it re-read the schedules
+    python sh_sched_tracker_tk.py --test-mode   # ... or enter test mode (password asked there)
+
+This module only uses the standard library, and the trackers call
+claim() before importing Qt, Tk or PIL, so a second launch is done in
+milliseconds. The lock belongs to the process: a tracker that crashes
+never blocks the next launch. Commands wait in the socket until the
+running tracker's event loop reads them with poll().
+"""
+import argparse
+import atexit
+import json
+import os
+import socket
+import sys
+import time
+
+from sh_sched_instrument import metrics
+from sh_sched_settings import settings_path
+
+LOCK_FILE = 'instance.lock'
+INFO_FILE = 'instance.json'
+
+# Commands a launch can send to the running tracker
+COMMANDS = ('show', 'test_mode', 'reload')
+
+# Seconds a second launch keeps trying to reach the running tracker (it may be starting)
+FORWARD_TIMEOUT = 2.0
+
+# Milliseconds between command checks where the event loop can't watch the socket
+# (Tk on Windows or with threaded Tcl): while the window is shown, and while it is hidden
+INSTANCE_POLL_MS = 250
+INSTANCE_IDLE_POLL_MS = 2000
+
+# Longest command message read from a launch
+MAX_MESSAGE = 4096
+
+# (guard, commands) once claim() has run
+_claimed = None
+
+
+def _lock(lock_file):
+    """Lock a file without waiting; raises OSError if another process holds it"""
+    lock_file.seek(0)
+    if sys.platform == 'win32':
+        import msvcrt
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+class InstanceGuard:
+    """The lock and command socket shared by every tracker of one settings file"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.dirname(settings_path())
+        self.lock_path = os.path.join(self.directory, LOCK_FILE)
+        self.info_path = os.path.join(self.directory, INFO_FILE)
+        self.lock_file = None
+        self.server = None
+
+    def acquire(self):
+        """Take the lock and start listening; False if another tracker holds it"""
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(self.lock_path, 'a+b')
+        try:
+            _lock(lock_file)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(8)
+        self.server.setblocking(False)
+        temp_path = self.info_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'port': self.server.getsockname()[1], 'pid': os.getpid()}, f)
+        os.replace(temp_path, self.info_path)
+        return True
+
+    def release(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+            try:
+                os.remove(self.info_path)
+            except OSError:
+                pass
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def fileno(self):
+        """The listening socket, readable when a launch has sent commands"""
+        return self.server.fileno()
+
+    def forward(self, commands, timeout=FORWARD_TIMEOUT):
+        """Send commands to the running tracker; False if it could not be reached"""
+        message = (json.dumps({'commands': list(commands)}) + '\n').encode('utf-8')
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with open(self.info_path) as f:
+                    port = json.load(f)['port']
+                with socket.create_connection(('127.0.0.1', port), timeout=timeout) as conn:
+                    conn.sendall(message)
+                return True
+            except (OSError, ValueError, KeyError, TypeError):
+                # The running tracker may not have written its port yet
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+
+    def poll(self):
+        """Return the commands later launches have sent since the last poll"""
+        commands = []
+        while self.server is not None:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                # Nothing waiting (BlockingIOError) or the socket was closed
+                break
+            with conn:
+                conn.settimeout(0.5)
+                data = b''
+                try:
+                    while not data.endswith(b'\n') and len(data) < MAX_MESSAGE:
+                        chunk = conn.recv(MAX_MESSAGE)
+                        if not chunk:
+                            break
+                        data += chunk
+                    received = json.loads(data.decode('utf-8')).get('commands', [])
+                except (OSError, ValueError, AttributeError):
+                    continue
+            commands.extend(command for command in received if command in COMMANDS)
+        metrics.inc('instance_commands', len(commands))
+        return commands
+
+
+def launch_parser(description=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--test-mode', action='store_true', help='enter test mode (asks for the admin password)')
+    parser.add_argument('--reload', action='store_true', help='re-read the schedules')
+    parser.add_argument('--new-instance', action='store_true', help='start even if a tracker is already running')
+    return parser
+
+
+def launch_commands(args):
+    """The commands a launch's arguments stand for; every launch shows the window"""
+    commands = ['show']
+    if args.test_mode:
+        commands.append('test_mode')
+    if args.reload:
+        commands.append('reload')
+    return commands
+
+
+def claim(argv=None, description=None):
+    """Become the running tracker, or forward this launch's commands to it and exit.
+
+    Returns (guard, commands): the guard to poll() for commands from later
+    launches (None with --new-instance) and this launch's own commands.
+    Calling it again returns the same pair.
+    """
+    global _claimed
+    if _claimed is not None:
+        return _claimed
+    args = launch_parser(description).parse_args(argv)
+    commands = launch_commands(args)
+    if args.new_instance:
+        _claimed = (None, commands)
+        return _claimed
+    guard = InstanceGuard()
+    if not guard.acquire():
+        if guard.forward(commands):
+            sys.exit(0)
+        sys.exit("The schedule tracker is already running but did not answer; try again in a moment.")
+    atexit.register(guard.release)
+    _claimed = (guard, commands)
+    return _claimed
+
+
+def main():
+    """Send commands to the running tracker (without starting one)"""
+    parser = launch_parser(main.__doc__)
+    args = parser.parse_args()
+    guard = InstanceGuard()
+    if guard.acquire():
+        guard.release()
+        sys.exit("No schedule tracker is running.")
+    if not guard.forward(launch_commands(args)):
+        sys.exit("The schedule tracker did not answer.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+"""Opt-in timing instrumentation and runtime metrics for the schedule trackers.
+
+Set SH_SCHED_PROFILE=1 (or use Help > Enable Profiling) to record timing
+spans around the hot paths. SH_SCHED_PROFILE=cprofile also runs cProfile.
+While disabled each instrumented call costs one attribute check.
+
+Cumulative counters are always kept (they are plain integer adds) and can
+be read from Help > Diagnostics or, with SH_SCHED_METRICS_PORT set, from
+http://127.0.0.1:<port>/metrics in Prometheus text format.
+"""
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# Number of recent spans kept in the ring buffer
+RING_SIZE = 4096
+
+
+class SpanStats:
+    """Running totals for one span name"""
+    __slots__ = ('count', 'total_ns', 'min_ns', 'max_ns')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def add(self, duration_ns):
+        self.count += 1
+        self.total_ns += duration_ns
+        if self.min_ns is None or duration_ns < self.min_ns:
+            self.min_ns = duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+
+class Profiler:
+    def __init__(self, ring_size=RING_SIZE):
+        self.enabled = False
+        self.spans = deque(maxlen=ring_size)  # (name, start_ns, duration_ns, thread_id)
+        self.totals = {}
+        self.lock = threading.Lock()
+        self.profile = None
+        # perf_counter has no fixed epoch; anchor trace timestamps here, once, so
+        # spans kept from an earlier enable() never get negative times
+        self.origin_ns = time.perf_counter_ns()
+
+    def enable(self, cprofile=False):
+        self.enabled = True
+        if cprofile and self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def disable(self):
+        self.enabled = False
+        if self.profile is not None:
+            self.profile.disable()
+
+    def clear(self):
+        with self.lock:
+            self.spans.clear()
+            self.totals.clear()
+
+    def record(self, name, start_ns, duration_ns):
+        with self.lock:
+            self.spans.append((name, start_ns, duration_ns, threading.get_ident()))
+            stats = self.totals.get(name)
+            if stats is None:
+                stats = self.totals[name] = SpanStats()
+            stats.add(duration_ns)
+
+    def stats(self):
+        """Return {name: {'count', 'min_ms', 'avg_ms', 'max_ms', 'p99_ms'}}
+
+        Count, min, avg and max cover every recorded call; p99 is taken
+        from the spans still in the ring buffer.
+        """
+        with self.lock:
+            spans = list(self.spans)
+            totals = {name: (s.count, s.total_ns, s.min_ns, s.max_ns) for name, s in self.totals.items()}
+        recent = {}
+        for name, _, duration_ns, _ in spans:
+            recent.setdefault(name, []).append(duration_ns)
+        result = {}
+        for name, (count, total_ns, min_ns, max_ns) in sorted(totals.items()):
+            durations = sorted(recent.get(name, ())) or [max_ns]
+            p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+            result[name] = {
+                'count': count,
+                'min_ms': min_ns / 1e6,
+                'avg_ms': total_ns / count / 1e6,
+                'max_ms': max_ns / 1e6,
+                'p99_ms': p99 / 1e6,
+            }
+        return result
+
+    def format_stats(self):
+        """Return the stats as a plain-text table"""
+        lines = [f"{'Span':<24}{'Count':>8}{'Min ms':>10}{'Avg ms':>10}{'P99 ms':>10}{'Max ms':>10}"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:<24}{s['count']:>8}{s['min_ms']:>10.3f}{s['avg_ms']:>10.3f}"
+                         f"{s['p99_ms']:>10.3f}{s['max_ms']:>10.3f}")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path):
+        """Write the ring buffer as Chrome trace-event JSON (chrome://tracing, Perfetto)"""
+        with self.lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        events = [{
+            'name': name,
+            'ph': 'X',
+            'ts': (start_ns - self.origin_ns) / 1000,
+            'dur': duration_ns / 1000,
+            'pid': pid,
+            'tid': tid,
+        } for name, start_ns, duration_ns, tid in spans]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export_cprofile(self, path):
+        """Write collected cProfile stats (load with pstats); False if cProfile never ran"""
+        if self.profile is None:
+            return False
+        self.profile.create_stats()
+        self.profile.dump_stats(path)
+        if self.enabled:
+            self.profile.enable()
+        return True
+
+
+profiler = Profiler()
+
+
+class span:
+    """Context manager recording a timing span when profiling is enabled"""
+    __slots__ = ('name', 'start_ns')
+
+    def __init__(self, name):
+        self.name = name
+        self.start_ns = None
+
+    def __enter__(self):
+        if profiler.enabled:
+            self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start_ns is not None:
+            profiler.record(self.name, self.start_ns, time.perf_counter_ns() - self.start_ns)
+        return False
+
+
+def profiled(name=None):
+    """Decorator recording a timing span around every call of the function"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            start_ns = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(span_name, start_ns, time.perf_counter_ns() - start_ns)
+        return wrapper
+    return decorator
+
+
+def export_profile(base_path):
+    """Write <base>.trace.json and, when available, <base>.prof; return the paths written"""
+    paths = [base_path + '.trace.json']
+    profiler.export_chrome_trace(paths[0])
+    if profiler.export_cprofile(base_path + '.prof'):
+        paths.append(base_path + '.prof')
+    return paths
+
+
+# Counter name -> help text, in display order
+COUNTERS = {
+    'timer_wakeups': 'Update timer wakeups',
+    'engine_lookups': 'Schedule lookups (time to message)',
+    'label_redraws': 'Schedule labels whose text changed',
+    'label_redraws_skipped': 'Label updates skipped because the text was unchanged',
+    'settings_writes': 'Settings writes',
+    'bytes_written': 'Bytes written to settings and schedule files',
+    'schedule_reloads': 'Schedule files loaded or rebuilt',
+    'tray_updates': 'Tray tooltip updates',
+    'reminders_fired': 'Reminder notifications shown',
+    'roster_lookups': 'Student location lookups',
+    'name_searches': 'Name searches',
+    'store_writes': 'Database transactions committed',
+    'override_compiles': 'Override schedules compiled',
+    'clock_jumps': 'Wall-clock jumps detected (sleep, clock changes)',
+    'clock_jump_seconds': 'Seconds the wall clock jumped, summed',
+    'instance_commands': 'Commands forwarded by later launches',
+    'cards_rendered': 'Signage status cards rendered',
+}
+
+
+def resident_memory_bytes():
+    """Return the process resident set size in bytes (0 if unavailable)"""
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return 0
+        # macOS and other Unixes only report the peak
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return 0
+
+
+class Metrics:
+    """Cumulative counters plus gauges sampled when read"""
+
+    def __init__(self):
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_write(self, nbytes):
+        """Count one settings/schedule file write of nbytes"""
+        with self.lock:
+            self.counters['settings_writes'] += 1
+            self.counters['bytes_written'] += nbytes
+
+    def gauges(self):
+        return {
+            'resident_memory_bytes': resident_memory_bytes(),
+            'cpu_seconds': time.process_time(),
+            'uptime_seconds': time.time() - self.started,
+        }
+
+    def snapshot(self):
+        with self.lock:
+            values = dict(self.counters)
+        values.update(self.gauges())
+        return values
+
+    def prometheus_text(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self.lock:
+            counters = dict(self.counters)
+        lines = []
+        for name, value in counters.items():
+            metric = f"sh_sched_{name}_total"
+            lines.append(f"# HELP {metric} {COUNTERS.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        gauges = self.gauges()
+        lines += ["# HELP sh_sched_resident_memory_bytes Resident set size",
+                  "# TYPE sh_sched_resident_memory_bytes gauge",
+                  f"sh_sched_resident_memory_bytes {gauges['resident_memory_bytes']}",
+                  "# HELP sh_sched_cpu_seconds_total Process CPU time",
+                  "# TYPE sh_sched_cpu_seconds_total counter",
+                  f"sh_sched_cpu_seconds_total {gauges['cpu_seconds']:.3f}",
+                  "# HELP sh_sched_uptime_seconds Seconds since start",
+                  "# TYPE sh_sched_uptime_seconds gauge",
+                  f"sh_sched_uptime_seconds {gauges['uptime_seconds']:.0f}"]
+        return "\n".join(lines) + "\n"
+
+    def format_text(self):
+        """Return the metrics as a plain-text table for the Diagnostics dialog"""
+        lines = []
+        for name, value in self.snapshot().items():
+            if name == 'resident_memory_bytes':
+                value = f"{value / (1024 * 1024):.1f} MB"
+            elif isinstance(value, float):
+                value = f"{value:.1f}"
+            lines.append(f"{name.replace('_', ' ').capitalize():<32}{value:>14}")
+        return "\n".join(lines)
+
+
+metrics = Metrics()
+
+
+def _metrics_handler():
+    """The endpoint's request handler; http.server is only imported when it starts"""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+_metrics_server = None
+
+
+def serve_metrics(port=None):
+    """Start the local metrics endpoint (port from SH_SCHED_METRICS_PORT if not given)
+
+    Returns the server, or None when no port is configured or it is in use.
+    """
+    global _metrics_server
+    if _metrics_server is not None:
+        return _metrics_server
+    if port is None:
+        port = os.environ.get('SH_SCHED_METRICS_PORT')
+    if not port:
+        return None
+    from http.server import ThreadingHTTPServer
+    try:
+        server = ThreadingHTTPServer(('127.0.0.1', int(port)), _metrics_handler())
+    except (OSError, ValueError) as e:
+        print(f"Metrics endpoint not started: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='sh-sched-metrics', daemon=True).start()
+    _metrics_server = server
+    return server
+
+
+_mode = os.environ.get('SH_SCHED_PROFILE', '').strip().lower()
+if _mode and _mode not in ('0', 'false', 'no', 'off'):
+    profiler.enable(cprofile=(_mode == 'cprofile'))
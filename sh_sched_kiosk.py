@@ -0,0 +1,231 @@
+"""Kiosk mode: one process drives several display windows.
+
+kiosk.json lists the displays, e.g. one per hallway screen or per school:
+
+    {"displays": [
+        {"title": "Main Office", "screen": 0},
+        {"title": "Middle School", "school": "southampton_middle_school",
+         "schedules": ["regular_schedule"], "track": "Lunch B", "screen": 1},
+        {"title": "Online Academy", "timezone": "America/Los_Angeles", "windowed": true}]}
+
+A display shows one school's schedules (default: SCHOOL_KEY, every
+schedule it has), optionally as a track sees them and in another time
+zone, full screen on the given screen unless "windowed" is set.
+
+All displays run on one engine: Schedules are built once per school file
+(load_schedules shares them), the colors come from the one settings
+store, and a single timer wakes the whole kiosk at the start of each
+minute (every segment boundary is on a minute), with one JumpDetector
+watchdog for sleep and clock changes. A display is a few labels, and a
+wakeup only rewrites the labels whose text changed, so each added screen
+costs a handful of widgets and no timers, threads or schedule copies.
+
+    python sh_sched_kiosk.py [kiosk.json] [--file schedules.json]
+"""
+import json
+import sys
+import time
+
+from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel, QSizePolicy
+from PyQt6.QtCore import QTimer, Qt
+from PyQt6.QtGui import QKeySequence, QShortcut
+
+from sh_sched_engine import SCHEDULES_FILE, SCHOOL_KEY, load_schedules, segment_of, track_view, schedule_title
+from sh_sched_clock import get_clock, JumpDetector, JUMP_CHECK_MS
+from sh_sched_instrument import metrics, serve_metrics
+from sh_sched_settings import get_settings
+
+KIOSK_FILE = 'kiosk.json'
+
+# Settings that restyle every display when changed
+COLOR_SETTINGS = ('window_bg_color', 'window_text_color', 'message_bg_color', 'message_text_color')
+
+
+class Display:
+    """What one kiosk window shows: a school's schedules, a track and a clock"""
+
+    def __init__(self, spec, index, path=SCHEDULES_FILE):
+        self.title = spec.get('title') or f"Display {index + 1}"
+        self.school = spec.get('school') or SCHOOL_KEY
+        self.keys = tuple(spec.get('schedules') or ())
+        self.track = spec.get('track') or ''
+        self.clock = get_clock(spec.get('timezone') or '')
+        self.screen = spec.get('screen', index)
+        self.windowed = bool(spec.get('windowed'))
+        self.path = path
+        self.base = None    # the shared Schedules the view was made from
+        self.view = None
+
+    def __repr__(self):
+        return f"Display({self.title!r}, {self.school!r})"
+
+    def schedules(self):
+        """The school's shared Schedules, as this display's track sees them"""
+        base = load_schedules(self.path, self.school)
+        if base is not self.base:
+            self.base = base
+            self.view = track_view(base, self.track)
+        return self.view
+
+
+def load_kiosk(path=KIOSK_FILE, schedules_path=SCHEDULES_FILE):
+    """Return the Displays listed in kiosk.json; a missing file gives one default display"""
+    try:
+        with open(path, 'r') as f:
+            specs = json.load(f).get('displays') or [{}]
+    except FileNotFoundError:
+        specs = [{}]
+    return [Display(spec, index, schedules_path) for index, spec in enumerate(specs)]
+
+
+class KioskWindow(QWidget):
+    """One display: a heading with the time, then one message per schedule"""
+
+    def __init__(self, display):
+        super().__init__()
+        self.display = display
+        self.setWindowTitle(f"SH Schedule Tracker - {display.title}")
+        layout = QVBoxLayout(self)
+        self.heading = QLabel(display.title)
+        self.heading.setObjectName("kiosk_heading")
+        layout.addWidget(self.heading)
+        self.rows = []      # (key, message label)
+        for key in display.keys or tuple(display.schedules()):
+            title = QLabel(schedule_title(key))
+            title.setProperty("class", "title")
+            label = QLabel("")
+            label.setObjectName("kiosk_message")
+            label.setWordWrap(True)
+            label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+            label.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+            layout.addWidget(title)
+            layout.addWidget(label)
+            self.rows.append((key, label))
+
+    def place(self, screens):
+        """Fill the display's screen, or show as a normal window"""
+        if not self.display.windowed and 0 <= self.display.screen < len(screens):
+            self.setGeometry(screens[self.display.screen].geometry())
+            self.showFullScreen()
+        else:
+            self.resize(640, 120 + 90 * len(self.rows))
+            self.show()
+
+    def apply_styles(self, colors):
+        self.setStyleSheet(f"""
+            QWidget {{
+                background-color: {colors['window_bg_color']};
+                color: {colors['window_text_color']};
+            }}
+            #kiosk_heading, QLabel[class="title"] {{
+                font-weight: bold;
+            }}
+            #kiosk_message {{
+                background-color: {colors['message_bg_color']};
+                color: {colors['message_text_color']};
+                border: 2px solid #0000cc;
+                border-radius: 5px;
+                padding: 8px;
+                font-weight: bold;
+            }}
+        """)
+
+    def resizeEvent(self, event):
+        # Text grows with the screen: the rows share the height
+        super().resizeEvent(event)
+        size = max(10, self.height() // (6 * (len(self.rows) + 1)))
+        for widget in [self.heading] + [label for _, label in self.rows]:
+            font = widget.font()
+            font.setPointSize(size)
+            widget.setFont(font)
+        for widget in self.findChildren(QLabel):
+            if widget.property("class") == "title":
+                font = widget.font()
+                font.setPointSize(max(8, size * 2 // 3))
+                widget.setFont(font)
+
+    def update_display(self, instant):
+        """Bring the labels up to date; only changed text is set"""
+        seconds = int(self.display.clock.wall(instant)[1])
+        schedules = self.display.schedules()
+        set_text(self.heading, f"{self.display.title}    {seconds // 3600:02d}:{seconds // 60 % 60:02d}")
+        for key, label in self.rows:
+            set_text(label, segment_of(schedules, key, seconds).message)
+
+
+def set_text(label, text):
+    if label.text() != text:
+        label.setText(text)
+        metrics.inc('label_redraws')
+    else:
+        metrics.inc('label_redraws_skipped')
+
+
+class Kiosk:
+    """The windows of every display, driven by one timer and one settings store"""
+
+    def __init__(self, displays):
+        self.settings = get_settings()
+        self.windows = [KioskWindow(display) for display in displays]
+        self.apply_styles()
+        self.settings.subscribe(self.on_setting_changed)
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.refresh)
+        self.clock_jumps = JumpDetector()
+        self.jump_timer = QTimer()
+        self.jump_timer.timeout.connect(self.check_clock)
+        self.jump_timer.start(JUMP_CHECK_MS)
+
+    def show(self, screens):
+        for window in self.windows:
+            window.place(screens)
+            QShortcut(QKeySequence("Ctrl+Q"), window, activated=QApplication.quit)
+        self.refresh()
+
+    def apply_styles(self):
+        colors = {key: self.settings.get(key) for key in COLOR_SETTINGS}
+        for window in self.windows:
+            window.apply_styles(colors)
+
+    def on_setting_changed(self, key, value):
+        if key in COLOR_SETTINGS:
+            self.apply_styles()
+
+    def refresh(self):
+        """Update every display, then sleep until the next minute starts"""
+        metrics.inc('timer_wakeups')
+        self.settings.poll()
+        instant = time.time()
+        for window in self.windows:
+            window.update_display(instant)
+        # Zone offsets are whole minutes, so one minute edge serves every display
+        self.timer.start(int((60 - time.time() % 60) * 1000) + 50)
+
+    def check_clock(self):
+        """Watchdog: after a sleep or a clock change, refresh at once"""
+        if self.clock_jumps.check():
+            self.refresh()
+
+
+def main():
+    """Run the displays listed in kiosk.json in one process"""
+    import argparse
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('config', nargs='?', default=KIOSK_FILE)
+    parser.add_argument('--file', default=SCHEDULES_FILE, help='schedules file or database')
+    args = parser.parse_args()
+    try:
+        displays = load_kiosk(args.config, args.file)
+    except (ValueError, OSError) as e:
+        sys.exit(f"Can't read {args.config}: {e}")
+    app = QApplication(sys.argv)
+    # Local Prometheus endpoint, only when SH_SCHED_METRICS_PORT is set
+    serve_metrics()
+    kiosk = Kiosk(displays)
+    kiosk.show(app.screens())
+    sys.exit(app.exec())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Override layers: one-off days built by patching a base schedule.
+
+An assembly or early dismissal is described in calendar.json as changes
+to a base schedule, and the days it runs on name it like any schedule:
+
+    "overrides": {
+        "pep_rally": {"base": "regular_schedule", "changes": [
+            {"cancel": "9"},
+            {"insert": "Pep Rally", "start": "13:21", "end": "14:01"},
+            {"shorten": "8", "minutes": 5}]}},
+    "days": {"2026-10-30": "pep_rally"}
+
+Changes apply in order, to periods named as in the base schedule:
+
+- insert: add a period with the given start and end;
+- cancel: drop a period;
+- shift: move a period, and every period after it, by `minutes`
+  (add "only": true to move just that one); missing times stay missing;
+- shorten: end a period `minutes` earlier, or at `end`.
+
+The base schedules stay untouched. An override is compiled into its own
+Schedule the first time a day needs it, and the compiled schedules are
+kept in a small LRU cache, so a calendar with hundreds of override days
+only holds the ones in use.
+"""
+from collections import OrderedDict
+
+from sh_sched_engine import Schedule, Period, parse_hhmm, format_hhmm, DAY_SECONDS
+from sh_sched_instrument import metrics
+
+# Compiled override schedules kept at once
+OVERRIDE_CACHE_SIZE = 32
+
+CHANGE_KINDS = ('insert', 'cancel', 'shift', 'shorten')
+
+# (Override, base Schedule) -> compiled Schedule, least recently used first
+_compiled = OrderedDict()
+
+
+class Override:
+    """A base schedule key plus the changes that turn it into one day's schedule"""
+    __slots__ = ('key', 'base', 'changes')
+
+    def __init__(self, key, base, changes=()):
+        changes = tuple(dict(change) for change in changes)
+        for change in changes:
+            kinds = [kind for kind in CHANGE_KINDS if kind in change]
+            if len(kinds) != 1:
+                raise ValueError(f"{key}: each change needs exactly one of {', '.join(CHANGE_KINDS)}: {change}")
+        object.__setattr__(self, 'key', key)
+        object.__setattr__(self, 'base', base)
+        object.__setattr__(self, 'changes', changes)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} objects are read-only")
+
+    def __repr__(self):
+        return f"Override({self.key!r}, {self.base!r}, {len(self.changes)} changes)"
+
+    def __reduce__(self):
+        return Override, (self.key, self.base, self.changes)
+
+    def to_dict(self):
+        return {'base': self.base, 'changes': [dict(change) for change in self.changes]}
+
+
+def _shifted(time_text, minutes, key):
+    # A missing time (the Warning rows have no end) stays missing
+    if not time_text:
+        return time_text
+    seconds = parse_hhmm(time_text) + minutes * 60
+    if not 0 <= seconds < DAY_SECONDS:
+        raise ValueError(f"{key}: shifting {time_text} by {minutes} minutes leaves the day")
+    return format_hhmm(seconds)
+
+
+def apply_changes(key, periods, changes):
+    """Return the periods after applying an override's changes, sorted by start"""
+    periods = [[period.name, period.start, period.end] for period in periods]
+
+    def find(name):
+        name = str(name)
+        for index, period in enumerate(periods):
+            if period[0] == name:
+                return index
+        raise ValueError(f"{key}: no period {name!r} to change")
+
+    for change in changes:
+        if 'insert' in change:
+            periods.append([str(change['insert']), change['start'], change['end']])
+        elif 'cancel' in change:
+            del periods[find(change['cancel'])]
+        elif 'shift' in change:
+            index = find(change['shift'])
+            minutes = int(change['minutes'])
+            for period in periods[index:index + 1] if change.get('only') else periods[index:]:
+                period[1] = _shifted(period[1], minutes, key)
+                period[2] = _shifted(period[2], minutes, key)
+        else:
+            period = periods[find(change['shorten'])]
+            if not period[2]:
+                raise ValueError(f"{key}: period {period[0]!r} has no end to shorten")
+            end = change['end'] if 'end' in change else _shifted(period[2], -int(change['minutes']), key)
+            if not parse_hhmm(period[1]) <= parse_hhmm(end) <= parse_hhmm(period[2]):
+                raise ValueError(f"{key}: period {period[0]!r} can't be shortened to end at {end}")
+            period[2] = end
+    periods.sort(key=lambda period: parse_hhmm(period[1]))
+    return [Period(name, start, end) for name, start, end in periods]
+
+
+def override_schedule(override, schedules):
+    """The Schedule an Override produces from `schedules`, compiled on first use.
+
+    Returns None when the base schedule does not exist.
+    """
+    base = schedules.get(override.base)
+    if base is None:
+        return None
+    cache_key = (override, base)
+    schedule = _compiled.get(cache_key)
+    if schedule is not None:
+        _compiled.move_to_end(cache_key)
+        return schedule
+    schedule = Schedule(override.key, apply_changes(override.key, base.periods, override.changes))
+    metrics.inc('override_compiles')
+    _compiled[cache_key] = schedule
+    if len(_compiled) > OVERRIDE_CACHE_SIZE:
+        _compiled.popitem(last=False)
+    return schedule
@@ -0,0 +1,157 @@
+"""Bell reminders for the schedule trackers.
+
+A reminder rule is a small dict saved in the 'reminders' setting, written
+and shown in plain text such as "2 min before end of Period 9" or
+"at start of Extra Help on delay with sound".
+
+ReminderScheduler turns the rules into one heap of (time, event) entries
+for the day, taken from every period's start and end time. The app keeps a
+single timer aimed at the head of the heap, so a wakeup only happens when
+a reminder is actually due, however many rules there are.
+"""
+import heapq
+import re
+import sys
+
+from sh_sched_engine import format_hhmm
+from sh_sched_instrument import metrics
+
+# Short names accepted after "on"; rules without one use the regular schedule
+SCHEDULE_ALIASES = {
+    'regular': 'regular_schedule',
+    'delay': 'two_hour_delay',
+    'homeroom': 'homeroom_schedule',
+    'all': '*',
+}
+DEFAULT_SCHEDULE = 'regular_schedule'
+
+RULE_PATTERN = re.compile(
+    r'^(?:(?P<minutes>\d+)\s*min(?:ute)?s?\s+(?P<direction>before|after)\s+(?:the\s+)?|at\s+(?:the\s+)?)?'
+    r'(?P<event>start|end)\s+of\s+(?P<period>.+?)'
+    r'(?:\s+on\s+(?P<schedule>\w+))?(?P<sound>\s+with\s+sound)?$',
+    re.IGNORECASE)
+
+
+def parse_rule(text):
+    """Parse a rule such as '2 min before end of Period 9'; raises ValueError if it doesn't match"""
+    match = RULE_PATTERN.match(text.strip())
+    if not match:
+        raise ValueError(f"Not a reminder rule: {text.strip()!r}")
+    schedule = (match.group('schedule') or '').lower()
+    if schedule and schedule not in SCHEDULE_ALIASES:
+        raise ValueError(f"Unknown schedule {schedule!r} (use {', '.join(SCHEDULE_ALIASES)})")
+    minutes = int(match.group('minutes') or 0)
+    return {
+        'event': match.group('event').lower(),
+        'period': match.group('period').strip(),
+        'offset': -minutes if (match.group('direction') or '').lower() == 'before' else minutes,
+        'schedule': SCHEDULE_ALIASES.get(schedule, DEFAULT_SCHEDULE),
+        'sound': bool(match.group('sound')),
+    }
+
+
+def describe_rule(rule):
+    """Return the text form of a rule (the inverse of parse_rule)"""
+    offset = rule.get('offset', 0)
+    if offset:
+        text = f"{abs(offset)} min {'before' if offset < 0 else 'after'} "
+    else:
+        text = "at "
+    text += f"{rule['event']} of {rule['period']}"
+    for alias, key in SCHEDULE_ALIASES.items():
+        if key == rule.get('schedule') and key != DEFAULT_SCHEDULE:
+            text += f" on {alias}"
+    if rule.get('sound'):
+        text += " with sound"
+    return text
+
+
+def reminder_message(name, event, offset):
+    """Format the notification text once per reminder, e.g. 'Period 9 ends in 2 min'"""
+    if offset < 0:
+        return sys.intern(f"{name} {event}s in {-offset} min")
+    if offset > 0:
+        return sys.intern(f"{name} {'started' if event == 'start' else 'ended'} {offset} min ago")
+    return sys.intern(f"{name} {event}s")
+
+
+class Reminder:
+    """One armed reminder: fires at `time` seconds since midnight"""
+    __slots__ = ('time', 'schedule', 'message', 'sound')
+
+    def __init__(self, time, schedule, message, sound):
+        self.time = time
+        self.schedule = schedule
+        self.message = message
+        self.sound = sound
+
+    def __repr__(self):
+        return f"Reminder({format_hhmm(self.time)}, {self.schedule!r}, {self.message!r})"
+
+
+def _period_times(schedule):
+    """Map lower-cased period names (and display names) to [(start, end, display name)]"""
+    times = {}
+    # Every period counts, including ones the status messages hide (Homeroom before Period 1)
+    for period, start, end in zip(schedule.periods, schedule.starts, schedule.ends):
+        entry = (start, end, period.display_name)
+        for name in {period.name.lower(), period.display_name.lower()}:
+            times.setdefault(name, []).append(entry)
+    return times
+
+
+class ReminderScheduler:
+    """Timer queue of the day's reminders, ordered by firing time"""
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self.heap = []
+        self.schedules = None
+        self.day = None
+
+    def set_rules(self, rules):
+        """Replace the rules; they take effect at the next arm()"""
+        self.rules = list(rules)
+
+    def arm(self, schedules, day, seconds):
+        """Rebuild the queue for `day`, keeping only reminders after `seconds`"""
+        self.schedules = schedules
+        self.day = day
+        entries = []
+        period_times = {key: _period_times(schedule) for key, schedule in schedules.items()}
+        for rule in self.rules:
+            keys = schedules if rule.get('schedule') == '*' else (rule.get('schedule', DEFAULT_SCHEDULE),)
+            offset = rule.get('offset', 0)
+            event = rule.get('event', 'start')
+            for key in keys:
+                for start, end, name in period_times.get(key, {}).get(rule.get('period', '').lower(), ()):
+                    base = start if event == 'start' else end
+                    time = base + offset * 60
+                    if base < 0 or time <= seconds:
+                        continue
+                    reminder = Reminder(time, key, reminder_message(name, event, offset), rule.get('sound', False))
+                    entries.append((time, len(entries), reminder))
+        heapq.heapify(entries)
+        self.heap = entries
+
+    def next_due(self):
+        """Seconds since midnight of the next reminder today, or None"""
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, day, seconds):
+        """Remove and return every reminder due at or before `seconds` on `day`
+
+        On a new day the queue is re-armed first, skipping what has passed.
+        """
+        if day != self.day and self.schedules is not None:
+            self.arm(self.schedules, day, seconds)
+            return []
+        due = []
+        while self.heap and self.heap[0][0] <= seconds:
+            due.append(heapq.heappop(self.heap)[2])
+        if due:
+            metrics.inc('reminders_fired', len(due))
+        return due
+
+    def __len__(self):
+        return len(self.heap)
@@ -0,0 +1,507 @@
+"""Student roster index: where should a student be right now?
+
+Assignments (student -> section, each section meeting in one room during
+one period) are packed into a student x period matrix of section codes,
+stored as one flat array. Finding a student's room is a dict lookup for
+the student's row, a dict lookup for the period's column and one array
+read, so the answer costs the same for 50 students or 50,000.
+
+Roster files are JSON (SIS enrollment CSV exports can be imported with
+import_sis_csv, which streams the file and builds the same index):
+
+    {"sections": {"ENG10-3": {"period": "3", "room": "204",
+                              "course": "English 10", "teacher": "Smith"}},
+     "students": {"12345": {"name": "Doe, Jane", "sections": ["ENG10-3"]}}}
+"""
+import csv
+import io
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+
+from sh_sched_engine import PERIOD, PASSING, WAITING
+from sh_sched_instrument import profiled, metrics
+
+ROSTER_FILE = 'roster.json'
+
+# Section code meaning "no section this period"
+NO_SECTION = 0
+
+
+def _intern(value):
+    return sys.intern(str(value).strip()) if value not in (None, '') else ''
+
+
+def period_key(name):
+    """Normalize a period name so 'Period 3', '3' and 3 share one column"""
+    key = str(name).strip().lower()
+    if key.startswith('period '):
+        key = key[7:].strip()
+    return sys.intern(key)
+
+
+class Section:
+    """A class meeting: one period in one room; strings are interned"""
+    __slots__ = ('id', 'period', 'room', 'course', 'teacher')
+
+    def __init__(self, section_id, period, room, course='', teacher=''):
+        object.__setattr__(self, 'id', _intern(section_id))
+        object.__setattr__(self, 'period', _intern(period))
+        object.__setattr__(self, 'room', _intern(room))
+        object.__setattr__(self, 'course', _intern(course))
+        object.__setattr__(self, 'teacher', _intern(teacher))
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} objects are read-only")
+
+    def __repr__(self):
+        return f"Section({self.id!r}, period {self.period!r}, room {self.room!r})"
+
+    def __reduce__(self):
+        # Read-only, so pickle rebuilds it through __init__ (for worker processes)
+        return Section, (self.id, self.period, self.room, self.course, self.teacher)
+
+    def describe(self):
+        details = ", ".join(part for part in (self.course, self.teacher) if part)
+        return f"Room {self.room} ({details})" if details else f"Room {self.room}"
+
+
+class Location:
+    """Answer to "where is this student": the sections now and next, plus a message"""
+    __slots__ = ('student', 'section', 'next_section', 'message')
+
+    def __init__(self, student, section, next_section, message):
+        self.student = student
+        self.section = section
+        self.next_section = next_section
+        self.message = message
+
+    def __repr__(self):
+        return f"Location({self.student!r}, {self.message!r})"
+
+
+class Roster:
+    """Read-only student x period matrix of section codes.
+
+    sections[0] is None so code 0 can mean "no section". matrix holds
+    len(students) rows of len(periods) codes each.
+    """
+
+    def __init__(self, students, names, periods, sections, matrix):
+        self.students = students          # student ids, by row
+        self.names = names                # display names, by row
+        self.periods = periods            # normalized period keys, by column
+        self.sections = sections          # Section objects, by code
+        self.matrix = matrix
+        self.rows = {student: row for row, student in enumerate(students)}
+        self.columns = {period: column for column, period in enumerate(periods)}
+        self.enrollment_counts = None
+
+    def __len__(self):
+        return len(self.students)
+
+    def __repr__(self):
+        return f"Roster({len(self.students)} students, {len(self.periods)} periods, {len(self.sections) - 1} sections)"
+
+    def section(self, student, period):
+        """Return the student's Section for a period name, or None"""
+        row = self.rows.get(student)
+        column = self.columns.get(period_key(period))
+        if row is None or column is None:
+            return None
+        return self.sections[self.matrix[row * len(self.periods) + column]]
+
+    def timetable(self, student):
+        """Return [(period, Section)] for every period the student has a section"""
+        row = self.rows.get(student)
+        if row is None:
+            return []
+        width = len(self.periods)
+        codes = self.matrix[row * width:(row + 1) * width]
+        return [(self.periods[column], self.sections[code]) for column, code in enumerate(codes) if code]
+
+    def where(self, student, segment):
+        """Locate a student during a schedule Segment (see sh_sched_engine)"""
+        metrics.inc('roster_lookups')
+        if student not in self.rows:
+            return None
+        current = self.section(student, segment.current.name) if segment.current else None
+        following = self.section(student, segment.next.name) if segment.next else None
+        if segment.kind == PERIOD:
+            message = current.describe() if current else f"No class during {segment.message}"
+        elif segment.kind in (PASSING, WAITING) and following:
+            message = f"On the way to {following.describe()}"
+        else:
+            message = segment.message
+        return Location(student, current, following, message)
+
+    def enrollment(self):
+        """Return students per section code (code 0: empty student-period slots).
+
+        One Counter pass over the whole matrix, done on first use and kept,
+        since a Roster never changes.
+        """
+        if self.enrollment_counts is None:
+            counts = array('I', bytes(4 * len(self.sections)))
+            for code, students in Counter(self.matrix).items():
+                counts[code] = students
+            self.enrollment_counts = counts
+        return self.enrollment_counts
+
+    def teaching(self, teacher, period):
+        """Return the Section a teacher has during a period name, or None"""
+        key = period_key(period)
+        for section in self.sections[1:]:
+            if section.teacher == teacher and period_key(section.period) == key:
+                return section
+        return None
+
+    def to_dict(self):
+        sections = {s.id: {'period': s.period, 'room': s.room, 'course': s.course, 'teacher': s.teacher}
+                    for s in self.sections[1:]}
+        students = {}
+        for student, name in zip(self.students, self.names):
+            students[student] = {'name': name, 'sections': [s.id for _, s in self.timetable(student)]}
+        return {'sections': sections, 'students': students}
+
+
+class RosterBuilder:
+    """Collects sections, students and assignments, then packs them into a Roster"""
+
+    def __init__(self):
+        self.sections = [None]
+        self.section_codes = {}
+        self.students = []
+        self.names = []
+        self.rows = {}
+        # Assignments as two parallel columns; the matrix is packed in build()
+        self.assigned_rows = array('I')
+        self.assigned_codes = array('I')
+
+    def add_section(self, section_id, period, room, course='', teacher=''):
+        section = Section(section_id, period, room, course, teacher)
+        code = self.section_codes.get(section.id)
+        if code is None:
+            code = self.section_codes[section.id] = len(self.sections)
+            self.sections.append(section)
+        else:
+            self.sections[code] = section
+        return code
+
+    def add_student(self, student_id, name=''):
+        student_id = _intern(student_id)
+        row = self.rows.get(student_id)
+        if row is None:
+            row = self.rows[student_id] = len(self.students)
+            self.students.append(student_id)
+            self.names.append(str(name or '').strip())
+        elif name:
+            self.names[row] = str(name).strip()
+        return row
+
+    def assign(self, student_id, section_id):
+        """Put a student in a section; returns False if the section is unknown"""
+        code = self.section_codes.get(str(section_id).strip())
+        if code is None:
+            return False
+        self.assigned_rows.append(self.add_student(student_id))
+        self.assigned_codes.append(code)
+        return True
+
+    def build(self):
+        periods = []
+        columns = {}
+        section_columns = array('l', [0])
+        for section in self.sections[1:]:
+            key = period_key(section.period)
+            if key not in columns:
+                columns[key] = len(periods)
+                periods.append(key)
+            section_columns.append(columns[key])
+        # 16-bit codes cover most schools; larger districts fall back to 32-bit
+        typecode = 'H' if len(self.sections) <= 0xFFFF else 'I'
+        width = len(periods)
+        matrix = array(typecode, bytes(array(typecode).itemsize * width * len(self.students)))
+        for row, code in zip(self.assigned_rows, self.assigned_codes):
+            matrix[row * width + section_columns[code]] = code
+        return Roster(tuple(self.students), tuple(self.names), tuple(periods), tuple(self.sections), matrix)
+
+
+def roster_from_dict(data):
+    builder = RosterBuilder()
+    for section_id, info in data.get('sections', {}).items():
+        builder.add_section(section_id, info.get('period', ''), info.get('room', ''),
+                            info.get('course', ''), info.get('teacher', ''))
+    for student_id, info in data.get('students', {}).items():
+        builder.add_student(student_id, info.get('name', ''))
+        for section_id in info.get('sections', []):
+            builder.assign(student_id, section_id)
+    return builder.build()
+
+
+# SIS export column names accepted for each field (compared lower-cased)
+CSV_COLUMNS = {
+    'student_id': ('student_id', 'student id', 'studentid', 'student_number', 'student number', 'id'),
+    'student_name': ('student_name', 'student name', 'name'),
+    'last_name': ('last_name', 'last name', 'lastname'),
+    'first_name': ('first_name', 'first name', 'firstname'),
+    'section_id': ('section_id', 'section id', 'section', 'course_section'),
+    'period': ('period', 'per', 'period_name'),
+    'room': ('room', 'room_number', 'room number'),
+    'course': ('course', 'course_code', 'course code', 'course_name'),
+    'teacher': ('teacher', 'teacher_name', 'instructor'),
+}
+REQUIRED_COLUMNS = ('student_id', 'section_id', 'period', 'room')
+
+# Rejected rows kept as examples in the import report
+REJECT_SAMPLES = 20
+
+# Rows between progress updates
+PROGRESS_ROWS = 50000
+
+
+class ImportReport:
+    """Counts and timing for one CSV import"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.samples = []   # (line number, reason), at most REJECT_SAMPLES
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def reject(self, line, reason):
+        self.rejected += 1
+        if len(self.samples) < REJECT_SAMPLES:
+            self.samples.append((line, reason))
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def format_text(self):
+        lines = [f"Imported {self.accepted:,} of {self.rows:,} rows in {self.seconds:.1f} s "
+                 f"({self.rows_per_second:,.0f} rows/s, {self.bytes / (1024 * 1024) / max(self.seconds, 1e-9):.1f} MB/s)"]
+        if self.rejected:
+            lines.append(f"Rejected {self.rejected:,} rows, for example:")
+            lines += [f"  line {line}: {reason}" for line, reason in self.samples]
+        return "\n".join(lines)
+
+
+def _csv_columns(header):
+    """Map field name -> column index from a CSV header row"""
+    names = [name.strip().lower() for name in header]
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+    missing = [field for field in REQUIRED_COLUMNS if field not in columns]
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)}")
+    return columns
+
+
+@profiled()
+def import_sis_csv(path, progress=None, cancel=None):
+    """Stream an SIS enrollment CSV (one row per student/section) into a Roster.
+
+    Rows are read one at a time, so memory grows with the number of
+    students and sections, not with the file size. progress(done, total)
+    is called every PROGRESS_ROWS rows with byte counts; a set cancel
+    Event stops the import with InterruptedError. Returns (Roster, ImportReport).
+    """
+    report = ImportReport(path)
+    started = time.perf_counter()
+    total = os.path.getsize(path)
+    builder = RosterBuilder()
+    section_codes = builder.section_codes
+    student_rows = builder.rows
+    assigned_rows = builder.assigned_rows
+    assigned_codes = builder.assigned_codes
+    with open(path, 'rb') as raw:
+        reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline=''))
+        columns = _csv_columns(next(reader, []))
+        student_col = columns['student_id']
+        section_col = columns['section_id']
+        optional = {field: columns.get(field) for field in ('student_name', 'last_name', 'first_name',
+                                                            'course', 'teacher')}
+        width = max(columns.values()) + 1
+        for line, row in enumerate(reader, start=2):
+            report.rows += 1
+            if report.rows % PROGRESS_ROWS == 0:
+                if cancel is not None and cancel.is_set():
+                    raise InterruptedError("Import cancelled")
+                if progress:
+                    progress(raw.tell(), total)
+            if len(row) < width:
+                if any(row):
+                    report.reject(line, f"expected {width} columns, found {len(row)}")
+                else:
+                    report.rows -= 1  # blank line
+                continue
+            student_id = row[student_col].strip()
+            section_id = row[section_col].strip()
+            if not student_id or not section_id:
+                report.reject(line, "missing student id or section")
+                continue
+            code = section_codes.get(section_id)
+            if code is None:
+                period = row[columns['period']].strip()
+                room = row[columns['room']].strip()
+                if not period or not room:
+                    report.reject(line, f"section {section_id} has no period or room")
+                    continue
+                code = builder.add_section(section_id, period, room,
+                                           row[optional['course']] if optional['course'] is not None else '',
+                                           row[optional['teacher']] if optional['teacher'] is not None else '')
+            student = student_rows.get(student_id)
+            if student is None:
+                if optional['student_name'] is not None:
+                    name = row[optional['student_name']]
+                elif optional['last_name'] is not None and optional['first_name'] is not None:
+                    name = f"{row[optional['last_name']].strip()}, {row[optional['first_name']].strip()}"
+                else:
+                    name = ''
+                student = builder.add_student(student_id, name)
+            assigned_rows.append(student)
+            assigned_codes.append(code)
+            report.accepted += 1
+        report.bytes = raw.tell()
+    roster = builder.build()
+    report.seconds = time.perf_counter() - started
+    if progress:
+        progress(total, total)
+    return roster, report
+
+
+class ImportJob:
+    """Runs import_sis_csv on a worker thread; the UI polls it with a timer.
+
+    Nothing here touches the UI, so it is safe with both Qt and Tk.
+    """
+
+    def __init__(self, path, save_to=None):
+        self.path = path
+        self.save_to = save_to
+        self.done_bytes = 0
+        self.total_bytes = 1
+        self.roster = None
+        self.report = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='sh-sched-roster-import', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            self.roster, self.report = import_sis_csv(self.path, self.on_progress, self.cancel_event)
+            if self.save_to:
+                save_roster(self.roster, self.save_to)
+        except Exception as e:
+            self.error = e
+
+    def on_progress(self, done, total):
+        self.done_bytes = done
+        self.total_bytes = max(total, 1)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def finished(self):
+        return not self.thread.is_alive()
+
+    @property
+    def fraction(self):
+        return min(1.0, self.done_bytes / self.total_bytes)
+
+
+# Loaded rosters, keyed by (absolute path, file mtime or database revision)
+_loaded = {}
+
+
+def _database(path):
+    """Return the SQLite database standing in for `path`, or None for JSON"""
+    if path.endswith(('.db', '.sqlite', '.sqlite3')) or os.environ.get('SH_SCHED_DB'):
+        import sh_sched_store
+        return sh_sched_store.resolve(path, ROSTER_FILE)
+    return None
+
+
+@profiled()
+def load_roster(path=ROSTER_FILE):
+    """Load a roster file, reusing the index already built for this version of it"""
+    database = _database(path)
+    full_path = os.path.abspath(database or path)
+    if database:
+        import sh_sched_store
+        cache_key = (full_path, sh_sched_store.roster_revision(full_path))
+    else:
+        cache_key = (full_path, os.stat(full_path).st_mtime_ns)
+    roster = _loaded.get(cache_key)
+    if roster is None:
+        if database:
+            revision, roster = sh_sched_store.load_roster(full_path)
+            cache_key = (full_path, revision)
+        else:
+            with open(full_path, 'r') as f:
+                roster = roster_from_dict(json.load(f))
+        for key in [k for k in _loaded if k[0] == full_path]:
+            del _loaded[key]
+        _loaded[cache_key] = roster
+    return roster
+
+
+def roster_exists(path=ROSTER_FILE):
+    """True if a roster has been saved at `path` (file or database)"""
+    database = _database(path)
+    if database:
+        import sh_sched_store
+        return os.path.exists(database) and sh_sched_store.roster_revision(database) > 0
+    return os.path.exists(path)
+
+
+def save_roster(roster, path=ROSTER_FILE):
+    database = _database(path)
+    if database:
+        import sh_sched_store
+        sh_sched_store.save_roster(roster, database)
+        return
+    text = json.dumps(roster.to_dict(), indent=2)
+    with open(path, 'w') as f:
+        f.write(text)
+    metrics.record_write(len(text.encode('utf-8')))
+
+
+def main():
+    """Show where students are at a time of day (default: now)"""
+    import argparse
+    from datetime import datetime
+    from sh_sched_engine import load_schedules, parse_hhmm
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('students', nargs='+', help='student ids')
+    parser.add_argument('--time', help='HH:MM (default: now)')
+    parser.add_argument('--schedule', default='regular_schedule')
+    parser.add_argument('--roster', default=ROSTER_FILE)
+    args = parser.parse_args()
+    roster = load_roster(args.roster)
+    segment = load_schedules()[args.schedule].segment_at(
+        parse_hhmm(args.time or datetime.now().strftime("%H:%M")))
+    for student in args.students:
+        location = roster.where(student, segment)
+        print(f"{student:<12}{location.message if location else 'Unknown student'}")
+
+
+if __name__ == '__main__':
+    main()
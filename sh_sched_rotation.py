@@ -0,0 +1,159 @@
+"""Rotating schedules: A/B days and drop rotations.
+
+A rotation is a timing template (any schedule) plus, for each day
+letter, the blocks that meet in the template's numbered periods, in
+order. A null block drops that slot for the day:
+
+    "rotations": {
+        "ab": {"template": "block_schedule", "cycle": ["A", "B"],
+               "letters": {"A": ["1", "2", "3", "4"], "B": ["5", "6", "7", "8"]}}},
+    "default": "ab"
+
+Named periods of the template (Homeroom, Lunch) are kept on every day.
+The calendar assigns letters: each school day that runs the rotation
+takes the next letter of the cycle, so days off don't use one up, and a
+day set to "ab:B" pins the letter and the cycle carries on from there.
+Such days resolve to the key "ab:A", "ab:B", ... everywhere else.
+
+Each (template, ordering) pair is compiled once into a RotationTable,
+shared by every day and every rotation that uses it. A table maps each
+slot to its block both ways, so "which block is Period 3 today" is two
+dict lookups.
+"""
+from types import MappingProxyType
+
+from sh_sched_engine import Schedule, Period
+
+# Separates the rotation key from the day letter in a schedule key
+LETTER_SEPARATOR = ':'
+
+# (template Schedule, blocks) -> RotationTable
+_compiled = {}
+
+
+class Rotation:
+    """A template schedule key, letters in cycle order and each letter's blocks"""
+    __slots__ = ('key', 'template', 'cycle', 'letters')
+
+    def __init__(self, key, template, letters, cycle=None):
+        letters = {str(letter): tuple(str(block) if block is not None else None for block in blocks)
+                   for letter, blocks in letters.items()}
+        cycle = tuple(str(letter) for letter in cycle) if cycle else tuple(letters)
+        for letter in cycle:
+            if letter not in letters:
+                raise ValueError(f"{key}: day letter {letter!r} in the cycle has no blocks")
+        if not cycle:
+            raise ValueError(f"{key}: a rotation needs at least one day letter")
+        object.__setattr__(self, 'key', key)
+        object.__setattr__(self, 'template', template)
+        object.__setattr__(self, 'cycle', cycle)
+        object.__setattr__(self, 'letters', letters)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} objects are read-only")
+
+    def __repr__(self):
+        return f"Rotation({self.key!r}, {self.template!r}, {''.join(self.cycle)})"
+
+    def __reduce__(self):
+        return Rotation, (self.key, self.template, self.letters, self.cycle)
+
+    def day_key(self, letter):
+        return f"{self.key}{LETTER_SEPARATOR}{letter}"
+
+    def to_dict(self):
+        return {'template': self.template, 'cycle': list(self.cycle),
+                'letters': {letter: list(blocks) for letter, blocks in self.letters.items()}}
+
+
+def split_day_key(key):
+    """'ab:B' -> ('ab', 'B'); keys without a letter give (key, None)"""
+    rotation, separator, letter = key.partition(LETTER_SEPARATOR)
+    return (rotation, letter) if separator else (key, None)
+
+
+class RotationTable:
+    """One ordering of a template's blocks: its compiled Schedule and slot <-> block maps
+
+    schedule is the template with the blocks in its numbered periods, keyed
+    by the template since the table is shared by every rotation using it;
+    blocks maps a template period name to the block meeting then (None:
+    dropped) and slots maps a block back to its period name.
+    """
+    __slots__ = ('schedule', 'blocks', 'slots')
+
+    def __init__(self, schedule, blocks, slots):
+        object.__setattr__(self, 'schedule', schedule)
+        object.__setattr__(self, 'blocks', MappingProxyType(dict(blocks)))
+        object.__setattr__(self, 'slots', MappingProxyType(dict(slots)))
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} objects are read-only")
+
+    def __repr__(self):
+        return f"RotationTable({self.schedule.key!r}, {dict(self.blocks)})"
+
+    def __reduce__(self):
+        return RotationTable, (self.schedule, dict(self.blocks), dict(self.slots))
+
+
+def compile_rotation(key, template, blocks):
+    """Put `blocks` into the template's numbered periods, in order (`key` names the rotation in errors)"""
+    slots = [index for index, period in enumerate(template.periods) if period.name.isdigit()]
+    if len(blocks) != len(slots):
+        raise ValueError(f"{key}: {len(blocks)} blocks for {len(slots)} numbered periods in {template.key}")
+    block_at = dict(zip(slots, blocks))
+    periods = []
+    for index, period in enumerate(template.periods):
+        if index not in block_at:
+            periods.append(period)
+        elif block_at[index] is not None:
+            periods.append(Period(block_at[index], period.start, period.end))
+    slot_blocks = {template.periods[index].name: block for index, block in block_at.items()}
+    block_slots = {block: slot for slot, block in slot_blocks.items() if block is not None}
+    return RotationTable(Schedule(template.key, periods), slot_blocks, block_slots)
+
+
+def rotation_table(rotation, letter, schedules):
+    """The shared RotationTable for one day letter, or None without the template"""
+    template = schedules.get(rotation.template)
+    blocks = rotation.letters.get(letter)
+    if template is None or blocks is None:
+        return None
+    cache_key = (template, blocks)
+    table = _compiled.get(cache_key)
+    if table is None:
+        table = _compiled[cache_key] = compile_rotation(rotation.day_key(letter), template, blocks)
+        # Tables for replaced templates are no longer reachable
+        for stale in [k for k in _compiled if k[0].key == template.key and k[0] is not template]:
+            del _compiled[stale]
+    return table
+
+
+def main():
+    """Show the day letter and which block meets in each period"""
+    import argparse
+    from sh_sched_engine import load_schedules
+    from sh_sched_calendar import CALENDAR_FILE, load_calendar, parse_date
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('dates', nargs='*', help='YYYY-MM-DD (default: today)')
+    parser.add_argument('--period', help='only this period, e.g. 3')
+    parser.add_argument('--calendar', default=CALENDAR_FILE)
+    args = parser.parse_args()
+    calendar = load_calendar(args.calendar)
+    schedules = load_schedules()
+    for day in args.dates or [calendar.today()]:
+        day = parse_date(day)
+        key = calendar.schedule_for(day)
+        table = calendar.rotation_table(key, schedules) if key else None
+        if table is None:
+            print(f"{day.isoformat()} {day.strftime('%a')}  {key or 'No school'} (no rotation)")
+            continue
+        print(f"{day.isoformat()} {day.strftime('%a')}  {key}")
+        for slot, block in table.blocks.items():
+            if args.period is None or slot == args.period:
+                print(f"    Period {slot}: {'Block ' + block if block else '(dropped)'}")
+
+
+if __name__ == '__main__':
+    main()
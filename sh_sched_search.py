@@ -0,0 +1,254 @@
+"""Search-as-you-type over student and staff names.
+
+NameIndex keeps every searchable word (last name, first name, student id,
+teacher name) as a normalized key in one sorted list, so the names starting
+with what has been typed so far are a bisect away. A second sorted list
+holds Soundex keys of the same words, which catches misspellings such as
+"Jonson" for "Johnson" or "Mikael" for "Michael".
+
+Building the index for a large roster takes a moment, so IndexJob builds
+it on a worker thread and the UI polls it, like ImportJob in sh_sched_roster.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+
+from sh_sched_engine import PERIOD, PASSING, WAITING
+from sh_sched_instrument import profiled, metrics
+from sh_sched_roster import ROSTER_FILE, load_roster
+
+# Kinds of match
+STUDENT = 'student'
+STAFF = 'staff'
+
+# Results returned by NameIndex.search by default
+SEARCH_LIMIT = 10
+
+# Most sound-alike entries examined per query word
+MAX_SCAN = 500
+
+# Shortest query word looked up phonetically
+PHONETIC_MIN_LENGTH = 3
+
+# Milliseconds to wait after the last keystroke before searching
+DEBOUNCE_MS = 150
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+_SOUNDEX_CODES = {}
+for _letters, _digit in (('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6')):
+    for _letter in _letters:
+        _SOUNDEX_CODES[_letter] = _digit
+
+
+def normalize(text):
+    """Lower-case words with accents and punctuation removed: 'O'Brien, José' -> ['obrien', 'jose']"""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii').lower()
+    return _WORD.findall(text.replace("'", ''))
+
+
+def soundex(word):
+    """American Soundex code of a normalized word ('robert' -> 'r163'); '' for digits"""
+    if not word or not word[0].isalpha():
+        return ''
+    code = word[0]
+    last = _SOUNDEX_CODES.get(word[0], '')
+    for letter in word[1:]:
+        digit = _SOUNDEX_CODES.get(letter, '')
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w don't separate letters with the same code; vowels do
+        if letter not in 'hw':
+            last = digit
+    return code.ljust(4, '0')
+
+
+class Match:
+    """One search result; `key` is the student id or the teacher name"""
+    __slots__ = ('kind', 'key', 'name')
+
+    def __init__(self, kind, key, name):
+        self.kind = kind
+        self.key = key
+        self.name = name
+
+    def __repr__(self):
+        return f"Match({self.kind!r}, {self.key!r}, {self.name!r})"
+
+    def __str__(self):
+        if self.kind == STUDENT:
+            return f"{self.name} ({self.key})" if self.name else self.key
+        return f"{self.name} (staff)"
+
+
+class NameIndex:
+    """Prefix and phonetic index over names; read-only once built"""
+
+    def __init__(self, matches, words, word_entries, sounds, sound_entries):
+        self.matches = matches              # Match objects, by entry number
+        self.words = words                  # sorted normalized words
+        self.word_entries = word_entries    # entry number for each word
+        self.sounds = sounds                # sorted Soundex keys
+        self.sound_entries = sound_entries  # entry number for each key
+        # ' word word ...' per entry, so each extra typed word is one substring test
+        entry_words = [[] for _ in matches]
+        for word, entry in zip(words, word_entries):
+            entry_words[entry].append(word)
+        self.entry_text = [' ' + ' '.join(words) for words in entry_words]
+
+    def __len__(self):
+        return len(self.matches)
+
+    def __repr__(self):
+        return f"NameIndex({len(self.matches)} names, {len(self.words)} words)"
+
+    def _prefix_range(self, word):
+        low = bisect.bisect_left(self.words, word)
+        high = bisect.bisect_left(self.words, word + '\x7f', low)
+        return low, high
+
+    def _has_words(self, entry, query_words):
+        text = self.entry_text[entry]
+        return all(query_word in text for query_word in query_words)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Return up to `limit` Matches for typed text, best first.
+
+        Every typed word must start one of the name's words. Words are
+        sorted, and entries are numbered in name order, so walking the
+        prefix range gives exact words first (Lee before Leeds), then
+        longer words alphabetically; the walk stops after `limit` hits, so
+        a short first word costs no more than a long one. Sound-alike names
+        fill any remaining places.
+        """
+        metrics.inc('name_searches')
+        query_words = normalize(text)
+        if not query_words:
+            return []
+        # Scan the rarest typed word; check the others against each candidate
+        ranges = [(self._prefix_range(word), word) for word in query_words]
+        (low, high), scan_word = min(ranges, key=lambda item: item[0][1] - item[0][0])
+        others = [' ' + word for word in query_words if word != scan_word]
+        results = []
+        seen = set()
+        for position in range(low, high):
+            entry = self.word_entries[position]
+            if entry in seen or (others and not self._has_words(entry, others)):
+                continue
+            seen.add(entry)
+            results.append(self.matches[entry])
+            if len(results) == limit:
+                return results
+        if len(results) < limit and len(scan_word) >= PHONETIC_MIN_LENGTH:
+            results.extend(self._sounds_like(scan_word, others, seen, limit - len(results)))
+        return results
+
+    def _sounds_like(self, word, others, seen, limit):
+        sound = soundex(word)
+        if not sound:
+            return []
+        found = []
+        position = bisect.bisect_left(self.sounds, sound)
+        end = min(len(self.sounds), position + MAX_SCAN)
+        while position < end and self.sounds[position] == sound and len(found) < limit:
+            entry = self.sound_entries[position]
+            position += 1
+            if entry in seen or (others and not self._has_words(entry, others)):
+                continue
+            seen.add(entry)
+            found.append(self.matches[entry])
+        return found
+
+
+@profiled()
+def build_name_index(roster):
+    """Index a Roster's students (by name and id) and its teachers"""
+    matches = [Match(STUDENT, student, name) for student, name in zip(roster.students, roster.names)]
+    teachers = {section.teacher for section in roster.sections[1:] if section.teacher}
+    matches.extend(Match(STAFF, teacher, teacher) for teacher in teachers)
+    # Number entries in name order so equal words list their names alphabetically
+    matches.sort(key=lambda match: (normalize(match.name), match.key))
+    pairs = []
+    for entry, match in enumerate(matches):
+        words = set(normalize(match.name))
+        if match.kind == STUDENT:
+            words.add(match.key.lower())
+        pairs.extend((word, entry) for word in words)
+    pairs.sort()
+    sound_pairs = sorted((soundex(word), entry) for word, entry in pairs if word[0].isalpha())
+    return NameIndex(matches,
+                     [word for word, _ in pairs], [entry for _, entry in pairs],
+                     [sound for sound, _ in sound_pairs], [entry for _, entry in sound_pairs])
+
+
+def describe_match(roster, match, segment):
+    """Where a search result should be during a schedule Segment, as one line"""
+    if match.kind == STUDENT:
+        location = roster.where(match.key, segment)
+        return location.message if location else segment.message
+    if segment.kind == PERIOD:
+        section = roster.teaching(match.key, segment.current.name)
+        return section.describe() if section else f"No class during {segment.message}"
+    if segment.kind in (PASSING, WAITING) and segment.next:
+        section = roster.teaching(match.key, segment.next.name)
+        if section:
+            return f"On the way to {section.describe()}"
+    return segment.message
+
+
+class IndexJob:
+    """Builds a NameIndex on a worker thread; the UI polls it with a timer.
+
+    Give it a Roster, or a path to load one from. Nothing here touches
+    the UI, so it is safe with both Qt and Tk.
+    """
+
+    def __init__(self, roster=None, path=ROSTER_FILE):
+        self.path = path
+        self.roster = roster
+        self.index = None
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name='sh-sched-name-index', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            if self.roster is None:
+                self.roster = load_roster(self.path)
+            self.index = build_name_index(self.roster)
+            # Count enrollment here too, so the first occupancy view is instant
+            self.roster.enrollment()
+        except Exception as e:
+            self.error = e
+
+    @property
+    def finished(self):
+        return not self.thread.is_alive()
+
+
+def main():
+    """Search a roster file for names as they would be typed"""
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('query', nargs='+', help='partial name or student id')
+    parser.add_argument('--roster', default=ROSTER_FILE)
+    parser.add_argument('--limit', type=int, default=SEARCH_LIMIT)
+    args = parser.parse_args()
+    index = build_name_index(load_roster(args.roster))
+    started = time.perf_counter()
+    results = index.search(' '.join(args.query), args.limit)
+    elapsed = time.perf_counter() - started
+    for match in results:
+        print(match)
+    print(f"{len(results)} matches in {elapsed * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""Settings store shared by the Qt and Tk schedule trackers.
+
+All frontends read and write one JSON file in the per-user config
+directory. Values are cached in memory and typed by SETTINGS below, so
+get() never touches the disk once the store is loaded. Writes are
+batched: set() marks the store dirty and a background flush writes it
+out FLUSH_DELAY seconds later (or immediately on flush()). poll() picks
+up changes written by another running instance with a single stat().
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+
+from sh_sched_instrument import metrics, profiled
+
+# Seconds to wait after a change before writing the file
+FLUSH_DELAY = 2.0
+
+# Setting name -> (type, default)
+SETTINGS = {
+    'admin_password': (str, 'shs'),
+    'window_bg_color': (str, '#000000'),
+    'window_text_color': (str, '#FFFFFF'),
+    'message_bg_color': (str, '#000066'),
+    'message_text_color': (str, '#FFFFFF'),
+    'frame_bg_color': (str, '#000000'),
+    'frame_text_color': (str, '#FFFFFF'),
+    'tray_icon': (str, 'clock.png'),
+    'window_size': (str, 'small'),
+    'window_position_x': (int, None),
+    'window_position_y': (int, None),
+    'window_width': (int, None),
+    'window_height': (int, None),
+    'test_mode_enabled': (bool, False),
+    'show_upcoming': (bool, False),
+    'track': (str, ''),
+    'timezone': (str, ''),
+    'reminders': (list, []),
+}
+
+# Tk's schedule_settings.json names for the same settings
+LEGACY_TK_KEYS = {
+    'password': 'admin_password',
+    'window_color': 'window_bg_color',
+    'text_color': 'window_text_color',
+    'label_bg_color': 'message_bg_color',
+    'label_text_color': 'message_text_color',
+    'frame_bg_color': 'frame_bg_color',
+    'frame_text_color': 'frame_text_color',
+    'window_x': 'window_position_x',
+    'window_y': 'window_position_y',
+}
+
+
+def settings_path():
+    """Return the shared settings file path (SH_SCHED_SETTINGS overrides it)"""
+    override = os.environ.get('SH_SCHED_SETTINGS')
+    if override:
+        return os.path.abspath(override)
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Application Support')
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return os.path.join(base, 'SouthamptonHS', 'ScheduleTracker', 'settings.json')
+
+
+def coerce(key, value):
+    """Convert a raw value (from JSON or QSettings) to the setting's declared type"""
+    kind, default = SETTINGS.get(key, (None, None))
+    if value is None or kind is None:
+        return value
+    try:
+        if kind is list:
+            return list(value) if isinstance(value, (list, tuple)) else default
+        if kind is bool:
+            if isinstance(value, str):
+                return value.strip().lower() in ('1', 'true', 'yes', 'on')
+            return bool(value)
+        return kind(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class SettingsStore:
+    def __init__(self, path=None):
+        self.path = path or settings_path()
+        self.lock = threading.RLock()
+        self.values = {}
+        self.dirty = set()
+        self.unnotified = set()  # external changes merged by a background flush
+        self.listeners = []
+        self.flush_timer = None
+        self.mtime_ns = None
+        self.is_new = not os.path.exists(self.path)
+        self.load()
+
+    @profiled('load_settings')
+    def load(self):
+        """(Re)read the file into the cache; returns the keys whose values changed"""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.mtime_ns = os.stat(self.path).st_mtime_ns
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        with self.lock:
+            changed = []
+            for key, value in data.items():
+                value = coerce(key, value)
+                # Unsaved local changes win over the file
+                if key not in self.dirty and self.values.get(key) != value:
+                    self.values[key] = value
+                    changed.append(key)
+        return changed
+
+    def get(self, key, default=None):
+        """Return a cached setting, falling back to its declared default"""
+        with self.lock:
+            if key in self.values:
+                return self.values[key]
+        if default is not None:
+            return default
+        return SETTINGS.get(key, (None, None))[1]
+
+    def as_dict(self):
+        """Return a copy of every setting, declared defaults included"""
+        result = {key: default for key, (_, default) in SETTINGS.items()}
+        with self.lock:
+            result.update(self.values)
+        return result
+
+    def set(self, key, value):
+        """Change a setting; listeners are told now, the file is written later"""
+        value = coerce(key, value)
+        with self.lock:
+            if key in self.values and self.values[key] == value:
+                return
+            self.values[key] = value
+            self.dirty.add(key)
+            self.schedule_flush()
+        self.notify(key, value)
+
+    def update(self, values):
+        for key, value in values.items():
+            self.set(key, value)
+
+    def subscribe(self, callback):
+        """Call callback(key, value) whenever a setting changes, here or in another instance"""
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def notify(self, key, value):
+        for callback in list(self.listeners):
+            callback(key, value)
+
+    def import_legacy(self, values, key_map=None):
+        """Copy settings from an older storage format without overwriting newer values"""
+        for old_key, value in values.items():
+            key = (key_map or {}).get(old_key, old_key)
+            if key in SETTINGS and value not in (None, '') and key not in self.values:
+                self.set(key, value)
+
+    def schedule_flush(self):
+        if self.flush_timer is None:
+            self.flush_timer = threading.Timer(FLUSH_DELAY, self.flush)
+            self.flush_timer.daemon = True
+            self.flush_timer.start()
+
+    @profiled('save_settings')
+    def flush(self):
+        """Write pending changes now, merged over whatever another instance saved"""
+        with self.lock:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            if not self.dirty:
+                return
+            # Merge what another instance saved; poll() reports it on the UI thread
+            if self.file_changed():
+                self.unnotified.update(self.load())
+            text = json.dumps(self.values, indent=4, sort_keys=True)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                f.write(text)
+            os.replace(temp_path, self.path)
+            self.mtime_ns = os.stat(self.path).st_mtime_ns
+            self.dirty.clear()
+            self.is_new = False
+        metrics.record_write(len(text.encode('utf-8')))
+
+    def file_changed(self):
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def poll(self):
+        """Reload if another instance changed the file; one stat() when nothing changed
+
+        Call this from the UI thread: listeners run in the calling thread.
+        """
+        with self.lock:
+            changed = set(self.unnotified)
+            self.unnotified.clear()
+            if self.file_changed():
+                changed.update(self.load())
+            values = {key: self.values[key] for key in changed}
+        for key, value in values.items():
+            self.notify(key, value)
+        return sorted(changed)
+
+
+_store = None
+
+
+def get_settings():
+    """Return the process-wide settings store, loading it on first use"""
+    global _store
+    if _store is None:
+        _store = SettingsStore()
+        atexit.register(_store.flush)
+    return _store
+
+
+def import_tk_settings(store, path='schedule_settings.json'):
+    """Migrate a Tk schedule_settings.json into the shared store (first run only)"""
+    try:
+        with open(path, 'r') as f:
+            store.import_legacy(json.load(f), LEGACY_TK_KEYS)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
@@ -0,0 +1,253 @@
+"""Status cards for signage players that can only show images.
+
+A card is the tracker's main window as a picture: for each schedule a
+title and its current message, in the colors set in the trackers' color
+settings. Cards are PNG (needs Pillow, as the Tk tracker's tray icon
+does) or SVG (no dependencies):
+
+    python sh_sched_signage.py now --out status.png --size 1920x1080
+    python sh_sched_signage.py day signage/ --format svg
+
+A card only depends on which Segment each schedule is in, so it is
+rendered once per (segments, theme, size, format) and then served from
+an LRU cache; reloading the schedules builds new Segments and so new
+cards. `day` pre-renders every distinct card of the day in one batch and
+writes cards.json, which maps each start time to its image; cards that
+look the same share one file.
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+from sh_sched_engine import (SCHEDULES_FILE, SCHOOL_KEY, load_schedules, segment_of, track_view,
+                             schedule_title, parse_hhmm, format_hhmm)
+from sh_sched_instrument import metrics, profiled
+from sh_sched_settings import get_settings
+
+# Settings a card is drawn in, in theme tuple order
+THEME_SETTINGS = ('window_bg_color', 'window_text_color', 'message_bg_color', 'message_text_color')
+
+# Message box outline, as in the trackers
+BORDER_COLOR = '#0000cc'
+
+CARD_SIZE = (800, 480)
+FORMATS = ('png', 'svg')
+
+# Rendered cards kept at once (a school day has a few dozen states)
+CARD_CACHE_SIZE = 256
+
+# Tried in order for PNG text; Pillow's own font is the fallback
+FONT_FILES = ('DejaVuSans-Bold.ttf', 'arialbd.ttf', 'Arial Bold.ttf', 'LiberationSans-Bold.ttf')
+
+# (keys, segments, theme, size, format) -> image bytes, least recently used first
+_cards = OrderedDict()
+
+# Pillow fonts by point size
+_fonts = {}
+
+
+def current_theme():
+    """The configured colors as a theme tuple (THEME_SETTINGS order)"""
+    settings = get_settings()
+    return tuple(settings.get(key) for key in THEME_SETTINGS)
+
+
+def parse_size(value):
+    """'800x480' -> (800, 480)"""
+    width, _, height = str(value).lower().partition('x')
+    size = (int(width), int(height))
+    if min(size) < 16:
+        raise ValueError(f"card size {value!r} is too small")
+    return size
+
+
+def _fit(text, height, width):
+    """Font size that fits `text` on one line in a width x height box (about 0.6 em per character)"""
+    return max(6, int(min(height, width / (0.6 * max(1, len(text))))))
+
+
+def card_shapes(titles, messages, theme, size):
+    """Lay a card out as ('rect', x, y, w, h, radius, fill, outline) and
+    ('text', x, baseline, text, font size, color) shapes, shared by both formats"""
+    window_bg, window_text, message_bg, message_text = theme
+    width, height = size
+    shapes = [('rect', 0, 0, width, height, 0, window_bg, None)]
+    if not titles:
+        return shapes
+    pad = max(4, height // 40)
+    row = (height - pad) / len(titles)
+    for index, (title, message) in enumerate(zip(titles, messages)):
+        top = pad + index * row
+        title_size = max(6, int(row * 0.2))
+        shapes.append(('text', pad, int(top + title_size), title, title_size, window_text))
+        box_top = int(top + title_size * 1.4)
+        box_height = int(top + row - pad) - box_top
+        shapes.append(('rect', pad, box_top, width - 2 * pad, box_height, max(2, pad // 2), message_bg, BORDER_COLOR))
+        text_size = _fit(message, box_height * 0.55, width - 4 * pad)
+        shapes.append(('text', 2 * pad, int(box_top + (box_height + text_size * 0.7) / 2), message, text_size,
+                       message_text))
+    return shapes
+
+
+def render_svg(shapes, size):
+    width, height = size
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-weight="bold">']
+    for shape in shapes:
+        if shape[0] == 'rect':
+            _, x, y, w, h, radius, fill, outline = shape
+            stroke = f' stroke="{outline}" stroke-width="2"' if outline else ''
+            parts.append(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" rx="{radius}" fill="{fill}"{stroke}/>')
+        else:
+            _, x, y, text, font_size, color = shape
+            parts.append(f'<text x="{x}" y="{y}" font-size="{font_size}" fill="{color}">{escape(text)}</text>')
+    parts.append('</svg>')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def _font(font_size):
+    font = _fonts.get(font_size)
+    if font is None:
+        from PIL import ImageFont
+        for name in FONT_FILES:
+            try:
+                font = ImageFont.truetype(name, font_size)
+                break
+            except OSError:
+                continue
+        else:
+            font = ImageFont.load_default(font_size)
+        _fonts[font_size] = font
+    return font
+
+
+def render_png(shapes, size):
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        raise RuntimeError("PNG cards need Pillow (pip install pillow); SVG cards do not") from None
+    image = Image.new('RGB', size)
+    draw = ImageDraw.Draw(image)
+    for shape in shapes:
+        if shape[0] == 'rect':
+            _, x, y, w, h, radius, fill, outline = shape
+            draw.rounded_rectangle((x, y, x + w - 1, y + h - 1), radius=radius, fill=fill, outline=outline,
+                                   width=2 if outline else 0)
+        else:
+            _, x, y, text, font_size, color = shape
+            draw.text((x, y), text, fill=color, font=_font(font_size), anchor='ls')
+    output = io.BytesIO()
+    image.save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+
+def render_card(keys, segments, theme, size=CARD_SIZE, format='png'):
+    """The card for one state (a Segment per key), rendered on first use and then cached"""
+    cache_key = (keys, segments, theme, size, format)
+    card = _cards.get(cache_key)
+    if card is not None:
+        _cards.move_to_end(cache_key)
+        return card
+    if format not in FORMATS:
+        raise ValueError(f"unknown card format {format!r}")
+    shapes = card_shapes([schedule_title(key) for key in keys], [segment.message for segment in segments],
+                         theme, size)
+    card = (render_png if format == 'png' else render_svg)(shapes, size)
+    metrics.inc('cards_rendered')
+    _cards[cache_key] = card
+    if len(_cards) > CARD_CACHE_SIZE:
+        _cards.popitem(last=False)
+    return card
+
+
+def status_card(schedules, seconds, keys=None, theme=None, size=CARD_SIZE, format='png'):
+    """The card for `schedules` at `seconds` after midnight (theme: the configured colors)"""
+    keys = tuple(keys or schedules)
+    segments = tuple(segment_of(schedules, key, seconds) for key in keys)
+    return render_card(keys, segments, theme or current_theme(), size, format)
+
+
+def day_states(schedules, keys=None):
+    """Yield (start seconds, segments) at midnight and at every time a shown schedule changes"""
+    keys = tuple(keys or schedules)
+    starts = {0}
+    for key in keys:
+        if key in schedules:
+            starts.update(schedules[key].segment_starts)
+    for start in sorted(starts):
+        yield start, tuple(segment_of(schedules, key, start) for key in keys)
+
+
+@profiled()
+def prerender_day(directory, schedules, keys=None, theme=None, size=CARD_SIZE, format='png'):
+    """Write every distinct card of the day to `directory`, plus cards.json mapping start times to files.
+
+    Returns the index that was written to cards.json.
+    """
+    keys = tuple(keys or schedules)
+    theme = theme or current_theme()
+    os.makedirs(directory, exist_ok=True)
+    cards = []
+    written = set()
+    for start, segments in day_states(schedules, keys):
+        card = render_card(keys, segments, theme, size, format)
+        name = f"card-{hashlib.sha1(card).hexdigest()[:12]}.{format}"
+        if name not in written:
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(card)
+            written.add(name)
+        cards.append({'start': format_hhmm(start), 'file': name})
+    index = {'size': list(size), 'format': format, 'cards': cards}
+    temp_path = os.path.join(directory, 'cards.json.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(index, f, indent=4)
+    os.replace(temp_path, os.path.join(directory, 'cards.json'))
+    return index
+
+
+def main():
+    """Render status cards (PNG or SVG) for signage players"""
+    import argparse
+    from sh_sched_clock import get_clock
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--file', default=SCHEDULES_FILE, help='schedules file or database')
+    parser.add_argument('--school', default=SCHOOL_KEY)
+    parser.add_argument('--schedules', help='comma-separated schedule keys (default: all)')
+    parser.add_argument('--track', default='', help='show the schedules as this track sees them')
+    parser.add_argument('--size', type=parse_size, default=CARD_SIZE, help='WIDTHxHEIGHT (default: 800x480)')
+    parser.add_argument('--format', choices=FORMATS, default='png')
+    commands = parser.add_subparsers(dest='command', required=True)
+    now = commands.add_parser('now', help='the card for the current time')
+    now.add_argument('--out', help='output file (default: status.png or status.svg)')
+    now.add_argument('--time', help='HH:MM instead of now')
+    now.add_argument('--timezone', default='', help="e.g. America/Chicago (default: this computer's)")
+    day = commands.add_parser('day', help="every distinct card of the day, with a cards.json index")
+    day.add_argument('directory')
+    args = parser.parse_args()
+    schedules = track_view(load_schedules(args.file, args.school), args.track)
+    keys = tuple(args.schedules.split(',')) if args.schedules else None
+    try:
+        if args.command == 'now':
+            seconds = parse_hhmm(args.time) if args.time else int(get_clock(args.timezone).wall()[1])
+            out = args.out or f"status.{args.format}"
+            card = status_card(schedules, seconds, keys, size=args.size, format=args.format)
+            with open(out, 'wb') as f:
+                f.write(card)
+            print(f"Wrote {out}")
+        else:
+            started = time.perf_counter()
+            index = prerender_day(args.directory, schedules, keys, size=args.size, format=args.format)
+            files = len({card['file'] for card in index['cards']})
+            print(f"{len(index['cards'])} states, {files} distinct cards written to {args.directory} "
+                  f"in {time.perf_counter() - started:.2f} s")
+    except (RuntimeError, ValueError) as e:
+        sys.exit(str(e))
+
+
+if __name__ == '__main__':
+    main()
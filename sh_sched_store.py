@@ -0,0 +1,384 @@
+"""Optional SQLite storage for schedules, the school calendar and rosters.
+
+JSON files stay the default. Point SH_SCHED_DB at a database file (or
+pass a path ending in .db to any --file/--calendar/--roster option) and
+load_schedules, save_schedules, load_calendar, save_calendar, load_roster
+and save_roster read and write the database instead.
+
+The database is only the source of truth: loading still builds the same
+compiled, read-only objects as the JSON loaders, and they are cached
+until the data changes, so lookups never run a query. Every save bumps a
+revision number in the meta table, which is what the caches check; the
+file's mtime is not enough because WAL commits land in the -wal file.
+
+- The database runs in WAL mode, so trackers keep reading while an
+  editor or an import writes.
+- An editor save replaces only the schedules it changed, inside one
+  BEGIN IMMEDIATE transaction.
+- A roster import is one transaction of executemany bulk inserts.
+
+    python sh_sched_store.py import schedules.db     # JSON files -> database
+    python sh_sched_store.py export schedules.db     # database -> JSON files
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+
+from sh_sched_instrument import profiled, metrics
+
+# Environment variable naming the database that replaces the default JSON files
+STORE_ENV = 'SH_SCHED_DB'
+
+# Paths ending in one of these are opened as databases
+STORE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    school TEXT NOT NULL,
+    schedule TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (school, schedule)
+);
+CREATE TABLE IF NOT EXISTS periods (
+    school TEXT NOT NULL,
+    schedule TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    start TEXT,
+    end TEXT,
+    PRIMARY KEY (school, schedule, position)
+);
+CREATE INDEX IF NOT EXISTS periods_by_start ON periods (school, schedule, start);
+CREATE TABLE IF NOT EXISTS track_periods (
+    school TEXT NOT NULL,
+    schedule TEXT NOT NULL,
+    track TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    start TEXT,
+    end TEXT,
+    PRIMARY KEY (school, schedule, track, position)
+);
+CREATE TABLE IF NOT EXISTS calendar (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS calendar_days (
+    date TEXT PRIMARY KEY,
+    schedule TEXT
+);
+CREATE TABLE IF NOT EXISTS sections (
+    code INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    period TEXT NOT NULL,
+    room TEXT NOT NULL,
+    course TEXT NOT NULL,
+    teacher TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS students (
+    row INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS enrollments (
+    student TEXT NOT NULL,
+    period TEXT NOT NULL,
+    section TEXT NOT NULL,
+    PRIMARY KEY (student, period)
+) WITHOUT ROWID;
+"""
+
+# Revision counters in the meta table, one per kind of data
+SCHEDULES = 'schedules_revision'
+CALENDAR = 'calendar_revision'
+ROSTER = 'roster_revision'
+
+
+def is_store(path):
+    return str(path).lower().endswith(STORE_SUFFIXES)
+
+
+def resolve(path, default):
+    """Return the database to use for `path`, or None to use the JSON file.
+
+    A path ending in .db is a database. The default JSON file name is
+    replaced by SH_SCHED_DB when that is set; explicit paths are not.
+    """
+    if is_store(path):
+        return path
+    database = os.environ.get(STORE_ENV)
+    if database and path == default:
+        return database
+    return None
+
+
+def connect(path):
+    """Open a database in WAL mode, creating the tables if needed.
+
+    The connection is in autocommit mode; writes use transaction().
+    """
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+        with transaction(conn):
+            # executescript() would commit; run the statements one by one instead
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+    return conn
+
+
+@contextmanager
+def transaction(conn):
+    """BEGIN IMMEDIATE ... COMMIT: take the write lock up front, roll back on error"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def revision(conn, kind):
+    row = conn.execute('SELECT value FROM meta WHERE key = ?', (kind,)).fetchone()
+    return row[0] if row else 0
+
+
+def _bump(conn, kind):
+    conn.execute('INSERT INTO meta (key, value) VALUES (?, 1) '
+                 'ON CONFLICT (key) DO UPDATE SET value = value + 1', (kind,))
+
+
+# Schedules
+
+def read_schedules(conn, school):
+    """Return a school's schedules in their JSON form, in saved order"""
+    data = {key: {'periods': []} for key, in conn.execute(
+        'SELECT schedule FROM schedules WHERE school = ? ORDER BY position', (school,))}
+    rows = conn.execute('SELECT schedule, name, start, end FROM periods WHERE school = ? '
+                        'ORDER BY schedule, position', (school,))
+    for key, name, start, end in rows:
+        data.setdefault(key, {'periods': []})['periods'].append({'name': name, 'start': start, 'end': end})
+    rows = conn.execute('SELECT schedule, track, name, start, end FROM track_periods WHERE school = ? '
+                        'ORDER BY schedule, track, position', (school,))
+    for key, track, name, start, end in rows:
+        tracks = data.setdefault(key, {'periods': []}).setdefault('tracks', {})
+        tracks.setdefault(track, []).append({'name': name, 'start': start, 'end': end})
+    return data
+
+
+def write_schedules(conn, school, data):
+    """Replace the given schedules of a school (JSON form); others are kept.
+
+    Run inside transaction().
+    """
+    position = conn.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM schedules WHERE school = ?',
+                            (school,)).fetchone()[0]
+    for key, value in data.items():
+        periods = value.get('periods', []) if isinstance(value, dict) else value or []
+        tracks = (value.get('tracks') or {}) if isinstance(value, dict) else {}
+        if conn.execute('INSERT OR IGNORE INTO schedules (school, schedule, position) VALUES (?, ?, ?)',
+                        (school, key, position)).rowcount:
+            position += 1
+        conn.execute('DELETE FROM periods WHERE school = ? AND schedule = ?', (school, key))
+        conn.executemany('INSERT INTO periods (school, schedule, position, name, start, end) '
+                         'VALUES (?, ?, ?, ?, ?, ?)',
+                         [(school, key, number, str(p.get('name', '')), p.get('start'), p.get('end'))
+                          for number, p in enumerate(periods)])
+        conn.execute('DELETE FROM track_periods WHERE school = ? AND schedule = ?', (school, key))
+        conn.executemany('INSERT INTO track_periods (school, schedule, track, position, name, start, end) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         [(school, key, track, number, str(p.get('name', '')), p.get('start'), p.get('end'))
+                          for track, track_periods in tracks.items() for number, p in enumerate(track_periods)])
+    _bump(conn, SCHEDULES)
+
+
+def schedules_revision(path):
+    with closing(connect(path)) as conn:
+        return revision(conn, SCHEDULES)
+
+
+@profiled('load_schedules_db')
+def load_schedules(path, school):
+    with closing(connect(path)) as conn:
+        return revision(conn, SCHEDULES), read_schedules(conn, school)
+
+
+@profiled('save_schedules_db')
+def save_schedules(data, path, school):
+    with closing(connect(path)) as conn, transaction(conn):
+        write_schedules(conn, school, data)
+    metrics.inc('store_writes')
+
+
+# Calendar
+
+def read_calendar(conn):
+    data = {key: json.loads(value) for key, value in conn.execute('SELECT key, value FROM calendar')}
+    data['days'] = dict(conn.execute('SELECT date, schedule FROM calendar_days ORDER BY date'))
+    return data
+
+
+def write_calendar(conn, data):
+    """Replace the calendar with `data` (its JSON form); run inside transaction()"""
+    conn.execute('DELETE FROM calendar')
+    conn.executemany('INSERT INTO calendar (key, value) VALUES (?, ?)',
+                     [(key, json.dumps(value)) for key, value in data.items() if key != 'days'])
+    conn.execute('DELETE FROM calendar_days')
+    conn.executemany('INSERT INTO calendar_days (date, schedule) VALUES (?, ?)',
+                     sorted(data.get('days', {}).items()))
+    _bump(conn, CALENDAR)
+
+
+@profiled('load_calendar_db')
+def load_calendar(path):
+    """Return the calendar's JSON form, or None if none was ever saved"""
+    with closing(connect(path)) as conn:
+        if not revision(conn, CALENDAR):
+            return None
+        return read_calendar(conn)
+
+
+def save_calendar(data, path):
+    with closing(connect(path)) as conn, transaction(conn):
+        write_calendar(conn, data)
+    metrics.inc('store_writes')
+
+
+# Rosters
+
+def read_roster(conn):
+    """Build a Roster straight from the tables, in saved row and code order"""
+    from sh_sched_roster import RosterBuilder
+    builder = RosterBuilder()
+    for section_id, period, room, course, teacher in conn.execute(
+            'SELECT id, period, room, course, teacher FROM sections ORDER BY code'):
+        builder.add_section(section_id, period, room, course, teacher)
+    for student_id, name in conn.execute('SELECT id, name FROM students ORDER BY row'):
+        builder.add_student(student_id, name)
+    assign = builder.assign
+    for student_id, section_id in conn.execute('SELECT student, section FROM enrollments'):
+        assign(student_id, section_id)
+    return builder.build()
+
+
+def write_roster(conn, roster):
+    """Replace the roster with bulk inserts; run inside transaction()"""
+    conn.execute('DELETE FROM enrollments')
+    conn.execute('DELETE FROM students')
+    conn.execute('DELETE FROM sections')
+    sections = roster.sections
+    conn.executemany('INSERT INTO sections (code, id, period, room, course, teacher) VALUES (?, ?, ?, ?, ?, ?)',
+                     ((code, s.id, s.period, s.room, s.course, s.teacher) for code, s in enumerate(sections[1:], 1)))
+    conn.executemany('INSERT INTO students (row, id, name) VALUES (?, ?, ?)',
+                     ((row, student, name) for row, (student, name) in enumerate(zip(roster.students, roster.names))))
+    width = len(roster.periods)
+    matrix = roster.matrix
+    periods = roster.periods
+    conn.executemany('INSERT INTO enrollments (student, period, section) VALUES (?, ?, ?)',
+                     ((student, periods[index % width], sections[matrix[index]].id)
+                      for student_row, student in enumerate(roster.students)
+                      for index in range(student_row * width, (student_row + 1) * width) if matrix[index]))
+    _bump(conn, ROSTER)
+
+
+def roster_revision(path):
+    with closing(connect(path)) as conn:
+        return revision(conn, ROSTER)
+
+
+@profiled('load_roster_db')
+def load_roster(path):
+    with closing(connect(path)) as conn:
+        if not revision(conn, ROSTER):
+            raise FileNotFoundError(f"No roster has been saved in {path}")
+        return revision(conn, ROSTER), read_roster(conn)
+
+
+@profiled('save_roster_db')
+def save_roster(roster, path):
+    with closing(connect(path)) as conn, transaction(conn):
+        write_roster(conn, roster)
+    metrics.inc('store_writes')
+
+
+# JSON import and export
+
+@profiled()
+def import_json(path, schedules_file=None, calendar_file=None, roster_file=None):
+    """Copy whichever JSON files are given into the database, in one transaction"""
+    from sh_sched_roster import roster_from_dict
+    imported = []
+    with closing(connect(path)) as conn, transaction(conn):
+        if schedules_file:
+            with open(schedules_file, 'r') as f:
+                for school, data in json.load(f).items():
+                    write_schedules(conn, school, data)
+            imported.append(schedules_file)
+        if calendar_file and os.path.exists(calendar_file):
+            with open(calendar_file, 'r') as f:
+                write_calendar(conn, json.load(f))
+            imported.append(calendar_file)
+        if roster_file and os.path.exists(roster_file):
+            with open(roster_file, 'r') as f:
+                write_roster(conn, roster_from_dict(json.load(f)))
+            imported.append(roster_file)
+    return imported
+
+
+@profiled()
+def export_json(path, schedules_file=None, calendar_file=None, roster_file=None):
+    """Write the database back out as the usual JSON files"""
+    exported = []
+    with closing(connect(path)) as conn:
+        if schedules_file:
+            schools = [school for school, in conn.execute('SELECT DISTINCT school FROM schedules ORDER BY school')]
+            _write_json(schedules_file, {school: read_schedules(conn, school) for school in schools}, 4)
+            exported.append(schedules_file)
+        if calendar_file and revision(conn, CALENDAR):
+            _write_json(calendar_file, read_calendar(conn), 4)
+            exported.append(calendar_file)
+        if roster_file and revision(conn, ROSTER):
+            _write_json(roster_file, read_roster(conn).to_dict(), 2)
+            exported.append(roster_file)
+    return exported
+
+
+def _write_json(path, data, indent):
+    text = json.dumps(data, indent=indent)
+    with open(path, 'w') as f:
+        f.write(text)
+    metrics.record_write(len(text.encode('utf-8')))
+
+
+def main():
+    """Copy the JSON data files into a SQLite database, or back out again"""
+    import argparse
+    from sh_sched_engine import SCHEDULES_FILE
+    from sh_sched_calendar import CALENDAR_FILE
+    from sh_sched_roster import ROSTER_FILE
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('database')
+    parser.add_argument('--schedules', default=SCHEDULES_FILE)
+    parser.add_argument('--calendar', default=CALENDAR_FILE)
+    parser.add_argument('--roster', default=ROSTER_FILE)
+    args = parser.parse_args()
+    copy = import_json if args.action == 'import' else export_json
+    files = copy(args.database, args.schedules, args.calendar, args.roster)
+    direction = 'into' if args.action == 'import' else 'from'
+    print(f"{args.action.capitalize()}ed {', '.join(files) or 'nothing'} {direction} {args.database}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""The school year written out as a table, for reporting.
+
+Every school day x running schedule x segment becomes one row of the
+timeline table, with local 'YYYY-MM-DD HH:MM:SS' start and end times, so
+questions like "what was happening on 2026-03-04 at 10:41" or "all Extra
+Help sessions in March" are indexed range queries:
+
+    SELECT * FROM timeline WHERE day = ? AND start <= ? AND end > ?
+    SELECT * FROM timeline WHERE name = ? AND start >= ? AND start < ?
+
+The table lives in a SQLite database (SH_SCHED_DB, or timeline.db).
+Building is incremental: timeline_days remembers which schedule ran on
+each day and a digest of it, and only days where either changed are
+rewritten.
+"""
+import hashlib
+import json
+import os
+import time
+from contextlib import closing
+from datetime import date, datetime, timedelta
+
+from sh_sched_engine import PERIOD, DAY_SECONDS, SCHEDULES_FILE, SCHOOL_KEY, load_schedules
+from sh_sched_calendar import parse_date
+from sh_sched_instrument import profiled
+from sh_sched_store import STORE_ENV, connect, transaction
+
+TIMELINE_FILE = 'timeline.db'
+
+TIMELINE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS timeline_days (
+    school TEXT NOT NULL,
+    day TEXT NOT NULL,
+    schedule TEXT,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (school, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS timeline (
+    school TEXT NOT NULL,
+    day TEXT NOT NULL,
+    schedule TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT,
+    message TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS timeline_by_day ON timeline (day, start);
+CREATE INDEX IF NOT EXISTS timeline_by_name ON timeline (name, start);
+"""
+
+TIMELINE_COLUMNS = ('school', 'day', 'schedule', 'position', 'kind', 'name', 'message', 'start', 'end')
+
+
+def timeline_path():
+    """The database holding the timeline: SH_SCHED_DB if set, else timeline.db"""
+    return os.environ.get(STORE_ENV) or TIMELINE_FILE
+
+
+def connect_timeline(path=None):
+    conn = connect(path or timeline_path())
+    with transaction(conn):
+        for statement in TIMELINE_SCHEMA.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+    return conn
+
+
+def schedule_digest(schedule):
+    """Short hash of a schedule's periods; changes whenever its segments would"""
+    text = json.dumps(schedule.to_dict(), sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _clock(seconds):
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def _day_template(schedule):
+    """(position, kind, name, message, start clock, end clock or None for midnight) per segment"""
+    return [(position, segment.kind,
+             segment.current.display_name if segment.kind == PERIOD else None, segment.message,
+             _clock(segment.start), _clock(segment.end) if segment.end < DAY_SECONDS else None)
+            for position, segment in enumerate(schedule.segments)]
+
+
+class TimelineReport:
+    """What one build_timeline() call did"""
+
+    def __init__(self):
+        self.days_written = 0
+        self.days_kept = 0
+        self.days_removed = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    def format_text(self):
+        return (f"{self.days_written} days rewritten ({self.rows} segments), {self.days_kept} unchanged, "
+                f"{self.days_removed} removed in {self.seconds:.2f} s")
+
+
+@profiled()
+def build_timeline(conn, calendar, schools, first_day, last_day):
+    """Bring the timeline up to date for every day in [first_day, last_day].
+
+    schools maps a school key to its Schedules. Days whose schedule key
+    and digest are both unchanged are left alone; days outside the range and
+    schools no longer given are removed.
+    """
+    started = time.perf_counter()
+    report = TimelineReport()
+    digests = {}
+    templates = {}
+    existing = dict(((school, day), (schedule, digest)) for school, day, schedule, digest in
+                    conn.execute('SELECT school, day, schedule, digest FROM timeline_days'))
+    changed = []
+    rows = []
+    first, last = parse_date(first_day).toordinal(), parse_date(last_day).toordinal()
+    for ordinal in range(first, last + 1):
+        day = date.fromordinal(ordinal).isoformat()
+        next_day = None
+        key = calendar.schedule_for(ordinal)
+        for school, schedules in schools.items():
+            schedule = calendar.resolve(key, schedules) if key else None
+            digest = ''
+            if schedule is not None:
+                digest = digests.get((school, key))
+                if digest is None:
+                    digest = digests[(school, key)] = schedule_digest(schedule)
+            # The key is stored on every row, so a renamed day is rewritten even with the same periods
+            stored_key = key if schedule is not None else None
+            if existing.pop((school, day), None) == (stored_key, digest):
+                report.days_kept += 1
+                continue
+            changed.append((school, day, stored_key, digest))
+            if schedule is None:
+                continue
+            template = templates.get((school, key))
+            if template is None:
+                template = templates[(school, key)] = _day_template(schedule)
+            if next_day is None:
+                next_day = date.fromordinal(ordinal + 1).isoformat()
+            rows.extend((school, day, key, position, kind, name, message,
+                         f"{day} {start}", f"{day} {end}" if end else f"{next_day} 00:00:00")
+                        for position, kind, name, message, start, end in template)
+    removed = list(existing)
+    with transaction(conn):
+        conn.executemany('DELETE FROM timeline WHERE school = ? AND day = ?',
+                         [(school, day) for school, day, _, _ in changed] + removed)
+        conn.executemany('DELETE FROM timeline_days WHERE school = ? AND day = ?', removed)
+        conn.executemany('INSERT OR REPLACE INTO timeline_days (school, day, schedule, digest) VALUES (?, ?, ?, ?)',
+                         changed)
+        conn.executemany(f"INSERT INTO timeline ({', '.join(TIMELINE_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         rows)
+    report.days_written = len(changed)
+    report.days_removed = len(removed)
+    report.rows = len(rows)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _timestamp(value):
+    """Accept a datetime or 'YYYY-MM-DD HH:MM[:SS]' (or ISO 'T'); return 'YYYY-MM-DD HH:MM:SS'"""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).strip())
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def happening_at(conn, when, school=None):
+    """Timeline rows (as dicts) in progress at a local date and time"""
+    when = _timestamp(when)
+    query = f"SELECT {', '.join(TIMELINE_COLUMNS)} FROM timeline WHERE day = ? AND start <= ? AND end > ?"
+    params = [when[:10], when, when]
+    if school:
+        query += ' AND school = ?'
+        params.append(school)
+    return [dict(zip(TIMELINE_COLUMNS, row)) for row in conn.execute(query + ' ORDER BY school', params)]
+
+
+def sessions(conn, name, first_day, last_day, school=None):
+    """Every period called `name` ('Extra Help', 'Period 3') between two dates, inclusive"""
+    first = parse_date(first_day).isoformat()
+    after_last = (parse_date(last_day) + timedelta(days=1)).isoformat()
+    query = f"SELECT {', '.join(TIMELINE_COLUMNS)} FROM timeline WHERE name = ? AND start >= ? AND start < ?"
+    params = [name, first, after_last]
+    if school:
+        query += ' AND school = ?'
+        params.append(school)
+    return [dict(zip(TIMELINE_COLUMNS, row)) for row in conn.execute(query + ' ORDER BY start, school', params)]
+
+
+def main():
+    """Build the school-year timeline table, or query it"""
+    import argparse
+    from sh_sched_calendar import CALENDAR_FILE, load_calendar
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--db', help=f'timeline database (default: ${STORE_ENV} or {TIMELINE_FILE})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='write the days that changed since the last build')
+    build.add_argument('--from', dest='first_day', help='YYYY-MM-DD (default: the calendar\'s first day)')
+    build.add_argument('--to', dest='last_day', help='YYYY-MM-DD (default: the calendar\'s last day)')
+    build.add_argument('--school', action='append', help=f'school key (repeatable; default: {SCHOOL_KEY})')
+    build.add_argument('--file', default=SCHEDULES_FILE)
+    build.add_argument('--calendar', default=CALENDAR_FILE)
+    at = commands.add_parser('at', help='what was happening at a date and time')
+    at.add_argument('when', help="'YYYY-MM-DD HH:MM'")
+    named = commands.add_parser('sessions', help='every period with a name between two dates')
+    named.add_argument('name', help="e.g. 'Extra Help' or 'Period 3'")
+    named.add_argument('--from', dest='first_day', required=True)
+    named.add_argument('--to', dest='last_day', required=True)
+    args = parser.parse_args()
+    with closing(connect_timeline(args.db)) as conn:
+        if args.command == 'build':
+            calendar = load_calendar(args.calendar)
+            first_day = args.first_day or calendar.first_day
+            last_day = args.last_day or calendar.last_day
+            if not first_day or not last_day:
+                parser.error('the calendar has no first_day/last_day; give --from and --to')
+            schools = {school: load_schedules(args.file, school) for school in args.school or [SCHOOL_KEY]}
+            print(build_timeline(conn, calendar, schools, first_day, last_day).format_text())
+            return
+        if args.command == 'at':
+            rows = happening_at(conn, args.when)
+        else:
+            rows = sessions(conn, args.name, args.first_day, args.last_day)
+        for row in rows:
+            print(f"{row['start']} - {row['end'][11:16]}  {row['school']:<24}{row['schedule']:<20}{row['message']}")
+        print(f"{len(rows)} rows")
+
+
+if __name__ == '__main__':
+    main()
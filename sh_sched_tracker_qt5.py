@@ -2,20 +2,44 @@ import sys
 import json
 import argparse
 from datetime import datetime
+from sh_sched_instance import claim
+if __name__ == '__main__':
+    # A second launch forwards its arguments to the running tracker and
+    # exits here, before the Qt modules are loaded
+    claim()
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QLabel, QSystemTrayIcon, QMenu, QPushButton, 
                             QTimeEdit, QHBoxLayout, QCheckBox, QMenuBar, QSizePolicy, 
-                            QMessageBox, QFileDialog, QSpinBox, QDialog, QTableWidget, 
+                            QMessageBox, QFileDialog, QProgressDialog, QListWidget, QSpinBox, QDialog, QTableWidget, 
                             QTableWidgetItem, QComboBox, QHeaderView, QInputDialog, QLineEdit, 
                             QColorDialog, QTextEdit, QAction, QActionGroup)
-from PyQt5.QtCore import QTimer, Qt, QTime, QSettings, QPoint, QSize
+from PyQt5.QtCore import QTimer, Qt, QTime, QSettings, QPoint, QSize, QEvent, QSocketNotifier
 from PyQt5.QtGui import QIcon, QColor
 import os
+from sh_sched_engine import (load_schedules, save_schedules, build_schedules,
+                             schedules_to_dict, parse_hhmm, format_hhmm, next_boundary, segment_of,
+                             track_view, track_names, Lookahead, format_countdown, UPCOMING_COUNT, DAY_SECONDS)
+from sh_sched_instrument import profiler, profiled, export_profile, metrics, serve_metrics
+from sh_sched_settings import get_settings
+from sh_sched_clock import get_clock, JumpDetector, JUMP_CHECK_MS, JUMP_IDLE_CHECK_MS
+from sh_sched_reminders import ReminderScheduler, parse_rule, describe_rule
+from sh_sched_roster import ImportJob, ROSTER_FILE, roster_exists
+from sh_sched_search import IndexJob, describe_match, DEBOUNCE_MS
+from sh_sched_occupancy import room_occupancy
 
 # Directory constants
 ICON_DIR = "icons"
 TEST_DIR = "testing"
 
+# Schedules listed in the "Coming Up" panel, with their short titles
+UPCOMING_TITLES = {
+    'regular_schedule': 'Regular',
+    'two_hour_delay': '2-Hr Delay',
+    'homeroom_schedule': 'Homeroom',
+}
+# Extra window height while the panel is shown
+UPCOMING_HEIGHT = 100
+
 # Create directories if they don't exist
 os.makedirs(ICON_DIR, exist_ok=True)
 os.makedirs(TEST_DIR, exist_ok=True)
@@ -92,7 +116,7 @@ class ColorSettingsDialog(QDialog):
         button.setFixedSize(40, 20)
         
         # Get color from settings or use default
-        color = QColor(self.parent.settings.value(setting_name, self.parent.default_colors[setting_name]))
+        color = QColor(self.parent.settings.get(setting_name, self.parent.default_colors[setting_name]))
         button.setStyleSheet(f"background-color: {color.name()};")
         
         # Store the setting name with the button
@@ -150,9 +174,13 @@ class ScheduleWindow(QMainWindow):
         # Track password reset attempts
         self.reset_password_attempts = 0
         
-        # Initialize settings
-        self.settings = QSettings('SouthamptonHS', 'ScheduleTracker')
-        self.admin_password = self.settings.value('admin_password', 'shs')
+        # Initialize settings (one store shared with the Tk app; values saved
+        # by older versions in QSettings are copied over on first run)
+        self.settings = get_settings()
+        if self.settings.is_new:
+            legacy = QSettings('SouthamptonHS', 'ScheduleTracker')
+            self.settings.import_legacy({key: legacy.value(key) for key in legacy.allKeys()})
+        self.admin_password = self.settings.get('admin_password')
         
         # Create menu bar after settings are initialized
         self.create_menu_bar()
@@ -168,16 +196,38 @@ class ScheduleWindow(QMainWindow):
         # Initialize current colors from settings or defaults
         self.current_colors = {}
         for key, default in self.default_colors.items():
-            self.current_colors[key] = self.settings.value(key, default)
+            self.current_colors[key] = self.settings.get(key, default)
+        
+        # Follow changes made by this window's dialogs or by another instance
+        self.settings.subscribe(self.on_setting_changed)
+        
+        # Wall-clock time in the configured zone (the computer's own by default)
+        self.clock = self.school_clock()
         
         # Test mode initialization
         self.test_mode = False
         self.test_time = datetime.now()
         self.test_container = None
         
-        # Load schedules
-        with open('schedules.json', 'r') as f:
-            self.schedules = json.load(f)['southampton_high_school']
+        # Low-power mode while hidden to the tray
+        self.low_power = False
+        self.tray_messages = None
+        
+        # Student roster, replaced by Tools > Import Roster, and its name index
+        self.roster = None
+        self.roster_job = None
+        self.name_index = None
+        self.index_job = None
+        self.search_dialog = None
+        self.index_poll = QTimer(self)
+        self.index_poll.timeout.connect(self.poll_name_index)
+        self.load_name_index()
+        
+        # Next few transitions for the optional "Coming Up" panel
+        self.lookahead = Lookahead(UPCOMING_COUNT, tuple(UPCOMING_TITLES))
+        
+        # Load schedules (shared, read-only objects built once per file)
+        self.schedules = load_schedules()
         
         # Create central widget and layout
         self.setup_ui()
@@ -185,10 +235,24 @@ class ScheduleWindow(QMainWindow):
         # Set up system tray
         self.setup_system_tray()
         
+        # Notice sleep/resume and clock changes: every timer checks when it fires,
+        # and a watchdog covers the long waits between them
+        self.clock_jumps = JumpDetector()
+        self.jump_timer = QTimer()
+        self.jump_timer.timeout.connect(self.check_clock)
+        self.jump_timer.start(JUMP_CHECK_MS)
+        
         # Set up timer for updates
         self.timer = QTimer()
-        self.timer.timeout.connect(self.update_periods)
-        self.timer.start(60000)  # Update every minute
+        self.timer.timeout.connect(self.on_timer)
+        self.arm_timer()  # Update every minute
+        
+        # Reminder notifications: one single-shot timer aimed at the next one due
+        self.reminders = ReminderScheduler(self.settings.get('reminders'))
+        self.reminder_timer = QTimer()
+        self.reminder_timer.setSingleShot(True)
+        self.reminder_timer.timeout.connect(self.on_reminder_timer)
+        self.arm_reminders()
         
         # Initial update
         self.update_periods()
@@ -294,6 +358,38 @@ class ScheduleWindow(QMainWindow):
         
         self.main_layout.addWidget(schedule_container)
         
+        # "Coming Up" panel: one row per upcoming transition, hidden unless enabled
+        self.upcoming_container = QWidget()
+        self.upcoming_container.setObjectName("upcoming_container")
+        self.upcoming_container.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Minimum)
+        upcoming_layout = QVBoxLayout(self.upcoming_container)
+        upcoming_layout.setSpacing(0)
+        upcoming_layout.setContentsMargins(2, 2, 2, 2)
+        
+        upcoming_title = QLabel("Coming Up")
+        upcoming_title.setProperty("class", "title")
+        upcoming_title.setAlignment(Qt.AlignLeft)
+        upcoming_layout.addWidget(upcoming_title)
+        
+        # Each row is (widget, transition label, countdown label)
+        self.upcoming_rows = []
+        for _ in range(UPCOMING_COUNT):
+            row = QWidget()
+            row_layout = QHBoxLayout(row)
+            row_layout.setContentsMargins(2, 0, 2, 0)
+            text_label = QLabel("")
+            text_label.setObjectName("upcoming_text")
+            countdown_label = QLabel("")
+            countdown_label.setObjectName("upcoming_countdown")
+            countdown_label.setAlignment(Qt.AlignRight)
+            row_layout.addWidget(text_label)
+            row_layout.addWidget(countdown_label)
+            upcoming_layout.addWidget(row)
+            self.upcoming_rows.append((row, text_label, countdown_label))
+        
+        self.main_layout.addWidget(self.upcoming_container)
+        self.upcoming_container.setVisible(self.settings.get('show_upcoming'))
+        
         # Set up window properties
         self.setMinimumWidth(300)
         self.setMinimumHeight(200)
@@ -330,7 +426,7 @@ class ScheduleWindow(QMainWindow):
             action = QAction(size_name.capitalize(), self)
             action.setCheckable(True)
             action.setData(size_name)
-            if size_name == self.settings.value('window_size', 'small'):
+            if size_name == self.settings.get('window_size'):
                 action.setChecked(True)
             action.triggered.connect(lambda checked, s=size_name: self.change_window_size(s))
             size_group.addAction(action)
@@ -355,7 +451,7 @@ class ScheduleWindow(QMainWindow):
         icon_group.addAction(timer_icon_action)
         
         # Set checked state based on saved preference
-        saved_icon = self.settings.value('tray_icon', 'clock.png')
+        saved_icon = self.settings.get('tray_icon')
         clock_icon_action.setChecked(saved_icon == 'clock.png')
         timer_icon_action.setChecked(saved_icon == 'timer.png')
         
@@ -369,6 +465,12 @@ class ScheduleWindow(QMainWindow):
         # Store actions for later use
         self.icon_actions = {'clock.png': clock_icon_action, 'timer.png': timer_icon_action}
         
+        self.upcoming_action = QAction('Show Coming Up', self)
+        self.upcoming_action.setCheckable(True)
+        self.upcoming_action.setChecked(self.settings.get('show_upcoming'))
+        self.upcoming_action.triggered.connect(self.toggle_upcoming)
+        tools_menu.addAction(self.upcoming_action)
+        
         tools_menu.addSeparator()
         
         # Group 2: Application Settings
@@ -380,6 +482,26 @@ class ScheduleWindow(QMainWindow):
         schedule_editor_action.triggered.connect(self.show_schedule_editor)
         tools_menu.addAction(schedule_editor_action)
         
+        reminders_action = QAction('Reminders', self)
+        reminders_action.triggered.connect(self.show_reminders)
+        tools_menu.addAction(reminders_action)
+        
+        import_roster_action = QAction('Import Roster', self)
+        import_roster_action.triggered.connect(self.import_roster)
+        tools_menu.addAction(import_roster_action)
+        
+        find_student_action = QAction('Find Student', self)
+        find_student_action.triggered.connect(self.show_student_search)
+        tools_menu.addAction(find_student_action)
+        
+        occupancy_action = QAction('Room Occupancy', self)
+        occupancy_action.triggered.connect(self.show_room_occupancy)
+        tools_menu.addAction(occupancy_action)
+        
+        select_track_action = QAction('Select Track', self)
+        select_track_action.triggered.connect(self.select_track)
+        tools_menu.addAction(select_track_action)
+        
         tools_menu.addSeparator()
         
         # Group 3: Security Settings
@@ -411,21 +533,39 @@ class ScheduleWindow(QMainWindow):
         user_guide_action.triggered.connect(self.show_user_guide)
         help_menu.addAction(user_guide_action)
         
+        # Add profiling actions
+        help_menu.addSeparator()
+        self.profiling_action = QAction('Enable Profiling', self)
+        self.profiling_action.setCheckable(True)
+        self.profiling_action.setChecked(profiler.enabled)
+        self.profiling_action.triggered.connect(self.toggle_profiling)
+        help_menu.addAction(self.profiling_action)
+        
+        export_profile_action = QAction('Export Profile...', self)
+        export_profile_action.triggered.connect(self.save_profile)
+        help_menu.addAction(export_profile_action)
+        
+        diagnostics_action = QAction('Diagnostics', self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        help_menu.addAction(diagnostics_action)
+        help_menu.addSeparator()
+        
         # Add About action
         about_action = QAction('About Schedule Tracker', self)
         about_action.triggered.connect(self.show_about_dialog)
         help_menu.addAction(about_action)
 
-    def show_schedule_editor(self):
+    def ask_admin_password(self, title, prompt):
+        """Prompt for the admin password; True if it was entered correctly"""
         # Prompt for password
         password_dialog = QInputDialog(self)
-        password_dialog.setWindowTitle('Schedule Editor Access')
-        password_dialog.setLabelText('Enter password to access schedule editor:')
+        password_dialog.setWindowTitle(title)
+        password_dialog.setLabelText(prompt)
         password_dialog.setTextEchoMode(QLineEdit.Password)
         self.setup_dialog_style(password_dialog)
         
         if not password_dialog.exec():
-            return
+            return False
         
         password = password_dialog.textValue()
         
@@ -436,12 +576,18 @@ class ScheduleWindow(QMainWindow):
             msg.setText('Incorrect password')
             self.setup_dialog_style(msg)
             msg.exec()
+            return False
+        return True
+
+    def show_schedule_editor(self):
+        if not self.ask_admin_password('Schedule Editor Access', 'Enter password to access schedule editor:'):
             return
         
-        editor = ScheduleEditorDialog(self.schedules, self)
+        editor = ScheduleEditorDialog(schedules_to_dict(self.schedules), self)
         if editor.exec() == QDialog.Accepted:
-            self.schedules = editor.get_updated_schedules()
+            self.schedules = build_schedules(editor.get_updated_schedules())
             self.save_schedules()
+            self.arm_reminders()
             self.update_periods()
 
     def setup_dialog_style(self, dialog):
@@ -469,37 +615,331 @@ class ScheduleWindow(QMainWindow):
             }
         """)
 
+    @profiled()
     def save_schedules(self):
         try:
-            with open('schedules.json', 'w') as f:
-                json.dump({'southampton_high_school': self.schedules}, f, indent=4)
+            save_schedules(self.schedules)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save schedules: {str(e)}")
 
+    def on_timer(self):
+        metrics.inc('timer_wakeups')
+        self.settings.poll()
+        if self.check_clock(self.timer_due):
+            # Already refreshed and re-aimed from the new time
+            return
+        self.update_periods()
+        self.arm_timer()
+
+    def arm_timer(self):
+        """Wake every minute while visible, only at the next transition while hidden"""
+        if self.low_power and not self.test_mode:
+            # Measured in real seconds, so a DST change before the boundary is accounted for
+            day, seconds = self.clock.wall()
+            delay = self.clock.until(day, next_boundary(self.display_schedules(), int(seconds)))
+            delay = max(1000, int(delay * 1000) + 50)
+        else:
+            delay = 60000
+        self.timer.start(delay)
+        self.timer_due = self.clock_jumps.deadline(delay)
+
+    def on_setting_changed(self, key, value):
+        """Apply a setting changed here or by another running instance"""
+        if key in self.current_colors:
+            if self.current_colors[key] != value:
+                self.current_colors[key] = value
+                self.apply_styles()
+                self.scale_fonts()
+        elif key == 'admin_password':
+            self.admin_password = value
+        elif key == 'reminders' and hasattr(self, 'reminders'):
+            self.reminders.set_rules(value)
+            self.arm_reminders()
+        elif key == 'show_upcoming' and hasattr(self, 'upcoming_container'):
+            self.upcoming_action.setChecked(value)
+            self.upcoming_container.setVisible(value)
+            self.set_window_size('test_mode' if self.test_mode else self.settings.get('window_size'))
+            self.update_periods()
+        elif key == 'tray_icon' and hasattr(self, 'tray_icon'):
+            self.tray_icon.setIcon(QIcon(os.path.join(ICON_DIR, value)))
+            for action_file, action in self.icon_actions.items():
+                action.setChecked(action_file == value)
+        elif key == 'track' and hasattr(self, 'reminders'):
+            self.arm_reminders()
+            self.update_periods()
+        elif key == 'timezone' and hasattr(self, 'reminders'):
+            self.clock = self.school_clock()
+            self.arm_reminders()
+            self.arm_timer()
+            self.update_periods()
+
+    def listen(self, instance):
+        """Run the commands later launches forward (show, test mode, reload)"""
+        self.instance = instance
+        if instance is not None:
+            self.instance_notifier = QSocketNotifier(instance.fileno(), QSocketNotifier.Read, self)
+            self.instance_notifier.activated.connect(lambda *args: self.run_commands(self.instance.poll()))
+
+    def run_commands(self, commands):
+        for command in commands:
+            if command == 'show':
+                if self.isMinimized():
+                    self.showNormal()
+                self.show_window()
+                self.raise_()
+            elif command == 'test_mode' and not self.test_mode_action.isChecked():
+                self.test_mode_action.setChecked(True)
+                self.toggle_test_mode(True)
+            elif command == 'reload':
+                self.reload_schedules()
+
+    def reload_schedules(self):
+        """Re-read the schedules file (after it was replaced outside the app)"""
+        try:
+            self.schedules = load_schedules()
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to load schedules: {str(e)}")
+            return
+        self.arm_reminders()
+        self.arm_timer()
+        self.update_periods()
+
+    def check_clock(self, due=None):
+        """After a sleep or a clock change, refresh and re-aim the timers at once; True if it did"""
+        if not self.clock_jumps.check(due) or self.test_mode:
+            return False
+        self.lookahead.invalidate()
+        self.arm_reminders()
+        self.arm_timer()
+        self.update_periods()
+        return True
+
+    def arm_reminders(self):
+        """Rebuild today's reminder queue (after a schedule or rule change)"""
+        day, seconds = self.clock.wall()
+        self.reminders.arm(self.display_schedules(), day, int(seconds))
+        self.arm_reminder_timer()
+
+    def arm_reminder_timer(self):
+        """Sleep until the next reminder, or until midnight to queue the next day's"""
+        self.reminder_timer.stop()
+        if not self.reminders.rules:
+            return
+        day = self.clock.wall()[0]
+        due = self.reminders.next_due()
+        delay = self.clock.until(day, DAY_SECONDS if due is None else due)
+        delay = max(0, int(delay * 1000) + 50)
+        self.reminder_timer.start(delay)
+        self.reminder_due = self.clock_jumps.deadline(delay)
+
+    def on_reminder_timer(self):
+        if self.check_clock(self.reminder_due):
+            # Re-armed from the new time; reminders missed while asleep are skipped
+            return
+        day, seconds = self.clock.wall()
+        for reminder in self.reminders.pop_due(day, int(seconds)):
+            self.show_reminder(reminder)
+        self.arm_reminder_timer()
+
+    def show_reminder(self, reminder):
+        title = UPCOMING_TITLES.get(reminder.schedule, "SH Schedule Tracker")
+        self.tray_icon.showMessage(title, reminder.message, QSystemTrayIcon.Information, 10000)
+        if reminder.sound:
+            QApplication.beep()
+
+    def import_roster(self):
+        """Import an SIS enrollment CSV on a worker thread, showing progress"""
+        if self.roster_job is not None:
+            return
+        if not self.ask_admin_password('Roster Import Access', 'Enter password to import a roster:'):
+            return
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Import SIS Roster",
+            "",
+            "CSV Files (*.csv);;All Files (*.*)"
+        )
+        if not file_path:
+            return
+        self.roster_job = ImportJob(file_path, save_to=ROSTER_FILE).start()
+        self.roster_progress = QProgressDialog("Importing roster...", "Cancel", 0, 100, self)
+        self.roster_progress.setWindowTitle("Import Roster")
+        self.roster_progress.setAutoClose(False)
+        self.roster_progress.canceled.connect(self.roster_job.cancel)
+        self.setup_dialog_style(self.roster_progress)
+        self.roster_progress.show()
+        # The worker never touches widgets; poll it from the UI thread instead
+        self.roster_poll = QTimer(self)
+        self.roster_poll.timeout.connect(self.poll_roster_import)
+        self.roster_poll.start(100)
+
+    def poll_roster_import(self):
+        job = self.roster_job
+        if not job.finished:
+            self.roster_progress.setValue(int(job.fraction * 100))
+            return
+        self.roster_poll.stop()
+        self.roster_progress.close()
+        self.roster_job = None
+        if isinstance(job.error, InterruptedError):
+            return
+        if job.error is not None:
+            QMessageBox.critical(self, "Error", f"Failed to import roster: {job.error}")
+            return
+        self.roster = job.roster
+        self.load_name_index(job.roster)
+        QMessageBox.information(self, "Roster Imported", job.report.format_text())
+
+    def load_name_index(self, roster=None):
+        """Build the name search index off the UI thread (from roster.json unless a roster is given)"""
+        if roster is None and not roster_exists():
+            return
+        self.index_job = IndexJob(roster).start()
+        self.index_poll.start(100)
+
+    def poll_name_index(self):
+        job = self.index_job
+        if job is None or not job.finished:
+            return
+        self.index_poll.stop()
+        self.index_job = None
+        if job.error is not None:
+            print(f"Failed to load roster: {job.error}")
+            return
+        self.roster = job.roster
+        self.name_index = job.index
+        if self.search_dialog is not None:
+            self.search_dialog.run_search()
+
+    def select_track(self):
+        """Choose the track (lunch wave, grade band) this display follows"""
+        names = track_names(self.schedules)
+        if not names:
+            QMessageBox.information(self, "Select Track", "None of the schedules have tracks (lunch waves, grade bands).")
+            return
+        choices = ["Main schedule"] + names
+        current = self.settings.get('track')
+        choice, ok = QInputDialog.getItem(self, "Select Track", "Show the schedule for:", choices,
+                                          choices.index(current) if current in choices else 0, False)
+        if ok:
+            # Listeners update the labels, Coming Up and reminders
+            self.settings.set('track', '' if choice == choices[0] else choice)
+
+    def show_room_occupancy(self):
+        if self.roster is None:
+            QMessageBox.information(self, "Room Occupancy", "No roster loaded. Use Tools > Import Roster.")
+            return
+        RoomOccupancyDialog(self).exec()
+
+    def show_student_search(self):
+        # Modeless, so it can stay open beside the tracker
+        if self.search_dialog is None:
+            self.search_dialog = StudentSearchDialog(self)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
+
+    def show_reminders(self):
+        dialog = RemindersDialog(self.settings.get('reminders'), self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.settings.set('reminders', dialog.rules)
+
+    def set_low_power(self, enabled):
+        """Suspend widget updates while hidden; catch up with one refresh when shown"""
+        if enabled == self.low_power:
+            return
+        self.low_power = enabled
+        if not enabled:
+            self.update_periods()
+        self.arm_timer()
+        self.jump_timer.setInterval(JUMP_IDLE_CHECK_MS if enabled else JUMP_CHECK_MS)
+
+    def set_label_text(self, label, text):
+        # Only touch the widget when the message actually changes
+        if label.text() != text:
+            label.setText(text)
+            metrics.inc('label_redraws')
+        else:
+            metrics.inc('label_redraws_skipped')
+
+    @profiled()
     def update_periods(self):
-        regular = self.get_current_period('regular_schedule')
-        delay = self.get_current_period('two_hour_delay')
-        homeroom = self.get_current_period('homeroom_schedule')
+        regular = self.get_current_segment('regular_schedule')
+        delay = self.get_current_segment('two_hour_delay')
+        homeroom = self.get_current_segment('homeroom_schedule')
         
         current_time = self.get_current_time()
         time_status = "TEST MODE" if self.test_mode else "LIVE"
         
-        self.regular_label.setText(regular)
-        self.delay_label.setText(delay)
-        self.homeroom_label.setText(homeroom)
+        if self.low_power:
+            # Hidden to tray: only the tooltip is kept current, and only when a segment changes
+            if (regular, delay, homeroom) != self.tray_messages:
+                self.update_tray_tooltip(f"Updated: {current_time} ({time_status})", regular, delay, homeroom)
+            return
+        
+        self.set_label_text(self.regular_label, regular.message)
+        self.set_label_text(self.delay_label, delay.message)
+        self.set_label_text(self.homeroom_label, homeroom.message)
+        
+        if self.settings.get('show_upcoming'):
+            self.update_upcoming(parse_hhmm(current_time))
         
         # Update window title with current time and mode
         self.setWindowTitle(f"SH Schedule Tracker - {current_time} ({time_status})")
         
         # Update tray tooltip
-        tooltip = f"Current Time: {current_time} ({time_status})\nRegular: {regular}\n2-Hour Delay: {delay}\nHomeroom: {homeroom}"
-        self.tray_icon.setToolTip(tooltip)
+        self.update_tray_tooltip(f"Current Time: {current_time} ({time_status})", regular, delay, homeroom)
+
+    def update_upcoming(self, seconds):
+        """Slide the Coming Up rows: a row is only rewritten when its transition changes"""
+        popped = self.lookahead.advance(self.display_schedules(), seconds)
+        items = self.lookahead.items
+        rows = self.upcoming_rows
+        if popped is None:
+            changed = range(len(rows))
+        else:
+            # Move the rows of passed transitions to the bottom for the new ones
+            popped = min(popped, len(rows))
+            layout = self.upcoming_container.layout()
+            for _ in range(popped):
+                row = rows.pop(0)
+                layout.removeWidget(row[0])
+                layout.addWidget(row[0])
+                rows.append(row)
+            changed = range(len(rows) - popped, len(rows))
+        for i in changed:
+            if i < len(items):
+                start, key, segment = items[i]
+                text = f"{format_hhmm(start)}  {UPCOMING_TITLES[key]}: {segment.message}"
+            else:
+                text = ""
+            self.set_label_text(rows[i][1], text)
+        for i, (_, _, countdown_label) in enumerate(rows):
+            self.set_label_text(countdown_label, format_countdown(items[i][0] - seconds) if i < len(items) else "")
+
+    def toggle_upcoming(self, checked):
+        self.settings.set('show_upcoming', checked)
+
+    def set_window_size(self, size_name):
+        """Fix the window at a preset size, taller while the Coming Up panel is shown"""
+        size = QSize(self.window_sizes[size_name])
+        if self.settings.get('show_upcoming'):
+            size.setHeight(size.height() + UPCOMING_HEIGHT)
+        self.setFixedSize(size)
+
+    def update_tray_tooltip(self, status, regular, delay, homeroom):
+        self.tray_messages = (regular, delay, homeroom)
+        tooltip = (f"{status}\nRegular: {regular.message}\n2-Hour Delay: {delay.message}"
+                   f"\nHomeroom: {homeroom.message}")
+        if self.tray_icon.toolTip() != tooltip:
+            self.tray_icon.setToolTip(tooltip)
+            metrics.inc('tray_updates')
 
     def setup_system_tray(self):
         self.tray_icon = QSystemTrayIcon(self)
         
         # Load saved icon preference or use default
-        icon_file = self.settings.value('tray_icon', 'clock.png')
+        icon_file = self.settings.get('tray_icon')
         icon_path = os.path.join(ICON_DIR, icon_file)
         icon = QIcon(icon_path)
         self.tray_icon.setIcon(icon)
@@ -517,16 +957,24 @@ class ScheduleWindow(QMainWindow):
                 self.show_window()
 
     def show_window(self):
+        self.set_low_power(False)
         self.show()
         self.activateWindow()  # Brings window to front
 
     def hide_window(self):
         self.hide()
+        self.set_low_power(True)
+
+    def changeEvent(self, event):
+        # Minimizing counts as hidden for power saving
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange and hasattr(self, 'timer'):
+            self.set_low_power(self.isMinimized())
 
     def closeEvent(self, event):
         # Save settings before closing
         self.save_window_position()
-        self.settings.setValue('admin_password', self.admin_password)
+        self.settings.set('admin_password', self.admin_password)
         
         # Ask user if they want to exit or minimize to tray
         reply = QMessageBox(
@@ -560,30 +1008,32 @@ class ScheduleWindow(QMainWindow):
         reply.move(x, y)
         
         if reply.exec() == QMessageBox.Yes:
-            self.settings.setValue('test_mode_enabled', self.test_mode)
+            self.settings.set('test_mode_enabled', self.test_mode)
+            self.settings.flush()
             event.accept()
             QApplication.quit()
         else:
             event.ignore()
             self.hide_window()
 
+    @profiled()
     def save_window_position(self):
         # Save current window position and size as individual values
         pos = self.pos()
         size = self.size()
-        self.settings.setValue('window_position_x', pos.x())
-        self.settings.setValue('window_position_y', pos.y())
-        self.settings.setValue('window_width', size.width())
-        self.settings.setValue('window_height', size.height())
+        self.settings.set('window_position_x', pos.x())
+        self.settings.set('window_position_y', pos.y())
+        self.settings.set('window_width', size.width())
+        self.settings.set('window_height', size.height())
 
     def restore_window_position(self):
         # Get saved position
-        pos_x = self.settings.value('window_position_x', type=int)
-        pos_y = self.settings.value('window_position_y', type=int)
+        pos_x = self.settings.get('window_position_x')
+        pos_y = self.settings.get('window_position_y')
         
         # Set initial size based on saved preference or default to small
-        saved_size = self.settings.value('window_size', 'small')
-        self.setFixedSize(self.window_sizes[saved_size])
+        saved_size = self.settings.get('window_size')
+        self.set_window_size(saved_size)
         
         if pos_x is not None and pos_y is not None:
             # Check if the saved position is valid (on a visible screen)
@@ -616,7 +1066,7 @@ class ScheduleWindow(QMainWindow):
     def setup_test_controls(self):
         if self.test_container is None:
             # Set fixed test mode size
-            self.setFixedSize(self.window_sizes['test_mode'])
+            self.set_window_size('test_mode')
             
             self.test_container = QWidget()
             self.test_container.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Policy.Minimum)
@@ -848,8 +1298,8 @@ class ScheduleWindow(QMainWindow):
             self.test_container = None
             
             # Restore previous window size
-            saved_size = self.settings.value('window_size', 'small')
-            self.setFixedSize(self.window_sizes[saved_size])
+            saved_size = self.settings.get('window_size')
+            self.set_window_size(saved_size)
 
     def set_test_time(self):
         if self.test_mode:
@@ -866,6 +1316,7 @@ class ScheduleWindow(QMainWindow):
         if hasattr(self, 'time_file_timer') and self.time_file_timer.isActive():
             self.time_file_timer.setInterval(self.delay_spinbox.value() * 1000)
 
+    @profiled()
     def load_time_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self,
@@ -921,6 +1372,7 @@ class ScheduleWindow(QMainWindow):
         self.current_line_index = 0
         self.test_time_label.setText("")  # Clear the test time label
 
+    @profiled()
     def apply_styles(self):
         # Apply window background and text colors
         self.setStyleSheet(f"""
@@ -949,6 +1401,12 @@ class ScheduleWindow(QMainWindow):
                 font-weight: bold;
             }}
             
+            /* Style for the Coming Up rows */
+            #upcoming_text, #upcoming_countdown {{
+                background-color: transparent;
+                color: {self.current_colors['window_text_color']};
+            }}
+            
             /* Style for schedule containers */
             QWidget[class="schedule_container"] {{
                 background-color: {self.current_colors['window_bg_color']};
@@ -987,6 +1445,7 @@ class ScheduleWindow(QMainWindow):
     def quit_application(self):
         # Save position before quitting
         self.save_window_position()
+        self.settings.flush()
         QApplication.quit()
 
     def change_password(self):
@@ -1049,7 +1508,7 @@ class ScheduleWindow(QMainWindow):
         
         # Save new password
         self.admin_password = new_pwd
-        self.settings.setValue('admin_password', new_pwd)
+        self.settings.set('admin_password', new_pwd)
         
         success_msg = QMessageBox(self)
         success_msg.setIcon(QMessageBox.Information)
@@ -1103,7 +1562,7 @@ class ScheduleWindow(QMainWindow):
         
         # Reset to default password
         self.admin_password = 'shs'
-        self.settings.setValue('admin_password', 'shs')
+        self.settings.set('admin_password', 'shs')
         
         # Reset attempt counter on successful password reset
         self.reset_password_attempts = 0
@@ -1147,66 +1606,26 @@ class ScheduleWindow(QMainWindow):
             self.test_mode = False
             self.update_periods()
 
-    def get_current_period(self, schedule_type):
-        current_time = datetime.strptime(self.get_current_time(), "%H:%M")
-        schedule = self.schedules[schedule_type]
-        periods = schedule['periods']
-        
-        # Check if it's before school (between midnight and warning bell)
-        warning_bell = datetime.strptime("07:25", "%H:%M")
-        if current_time < warning_bell:
-            return "Before School"
-        
-        # Find Period 1
-        period_1 = next((p for p in periods if p['name'] == '1'), None)
-        if period_1 and period_1['start']:
-            period_1_start = datetime.strptime(period_1['start'], "%H:%M")
-            # If we're between warning bell and period 1
-            if warning_bell <= current_time < period_1_start:
-                return f"Period 1 starts at {period_1['start']}"
-        
-        # Check if it's after school (after 14:30)
-        after_school_time = datetime.strptime("14:30", "%H:%M")
-        if current_time >= after_school_time:
-            return "After School"
-        
-        # Check if we're in a period
-        for period in periods:
-            if period['start'] and period['end']:
-                start_time = datetime.strptime(period['start'], "%H:%M")
-                end_time = datetime.strptime(period['end'], "%H:%M")
-                
-                if start_time <= current_time <= end_time:
-                    period_name = period['name']
-                    return f"Period {period_name}" if period_name.isdigit() else period_name
-        
-        # If not in a period, check if we're between periods
-        for i in range(len(periods) - 1):
-            current_period = periods[i]
-            next_period = periods[i + 1]
-            
-            if current_period['end'] and next_period['start']:
-                period_end = datetime.strptime(current_period['end'], "%H:%M")
-                next_start = datetime.strptime(next_period['start'], "%H:%M")
-                
-                if period_end < current_time < next_start:
-                    current_name = current_period['name']
-                    next_name = next_period['name']
-                    
-                    # Format period numbers
-                    if current_name.isdigit():
-                        current_name = f"Period {current_name}"
-                    if next_name.isdigit():
-                        next_name = f"Period {next_name}"
-                    
-                    return f"{current_name} → {next_name}"
-        
-        return "Not in Session"
+    @profiled()
+    def get_current_segment(self, schedule_type):
+        """Return the precompiled Segment (message included) for the current time"""
+        return segment_of(self.display_schedules(), schedule_type, parse_hhmm(self.get_current_time()))
+
+    def school_clock(self):
+        """The clock for the time zone setting (this computer's zone if unset or unknown)"""
+        try:
+            return get_clock(self.settings.get('timezone'))
+        except ValueError:
+            return get_clock()
+
+    def display_schedules(self):
+        """The schedules as the configured track (lunch wave, grade band) sees them"""
+        return track_view(self.schedules, self.settings.get('track'))
 
     def get_current_time(self):
         if self.test_mode:
             return self.test_time.strftime("%H:%M")
-        return datetime.now().strftime("%H:%M")
+        return self.clock.now().strftime("%H:%M")
 
     def show_color_settings(self):
         dialog = ColorSettingsDialog(self)
@@ -1214,7 +1633,7 @@ class ScheduleWindow(QMainWindow):
         if dialog.exec() == QDialog.Accepted:
             # Save colors to settings
             for key, color in self.current_colors.items():
-                self.settings.setValue(key, color)
+                self.settings.set(key, color)
             
             # Apply new colors
             self.apply_styles()
@@ -1254,6 +1673,7 @@ class ScheduleWindow(QMainWindow):
         self.adjust_layout_spacing()
         self.adjust_container_heights()
         
+    @profiled()
     def scale_fonts(self):
         """Scale fonts based on window size"""
         # Calculate scale factor based on window width
@@ -1269,6 +1689,11 @@ class ScheduleWindow(QMainWindow):
                 font.setPointSize(title_font_size)
                 font.setBold(True)
                 widget.setFont(font)
+        for _, text_label, countdown_label in self.upcoming_rows:
+            for label in (text_label, countdown_label):
+                font = label.font()
+                font.setPointSize(title_font_size)
+                label.setFont(font)
         
         # Scale label fonts with a more conservative minimum size
         label_font_size = max(7, int(self.base_label_font_size * scale_factor))
@@ -1328,6 +1753,8 @@ class ScheduleWindow(QMainWindow):
             available_height -= self.menuBar().height()
         if hasattr(self, 'test_container') and self.test_container:
             available_height -= self.test_container.height()
+        if self.upcoming_container.isVisible():
+            available_height -= self.upcoming_container.height()
             
         # Calculate base height for each container (minus margins and spacing)
         base_height = (available_height - self.main_layout.spacing() * 4) // 3
@@ -1356,14 +1783,14 @@ class ScheduleWindow(QMainWindow):
             action.setChecked(action_file == icon_file)
         
         # Save preference
-        self.settings.setValue('tray_icon', icon_file)
+        self.settings.set('tray_icon', icon_file)
 
     def change_window_size(self, size_name):
         # Update window size
         if not self.test_mode:
-            self.setFixedSize(self.window_sizes[size_name])
+            self.set_window_size(size_name)
             # Save preference
-            self.settings.setValue('window_size', size_name)
+            self.settings.set('window_size', size_name)
         
         # Update checked states
         for action in self.size_actions.actions():
@@ -1382,6 +1809,39 @@ class ScheduleWindow(QMainWindow):
         dialog = UserGuideDialog(self)
         dialog.exec()
 
+    def show_diagnostics(self):
+        dialog = DiagnosticsDialog(self)
+        dialog.exec()
+
+    def toggle_profiling(self, checked):
+        if checked:
+            profiler.enable()
+        else:
+            profiler.disable()
+
+    def save_profile(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export Profile",
+            "sh_sched_profile.trace.json",
+            "Chrome Trace Files (*.trace.json);;All Files (*.*)"
+        )
+        
+        if file_path:
+            base_path = file_path[:-len('.trace.json')] if file_path.endswith('.trace.json') else file_path
+            try:
+                paths = export_profile(base_path)
+            except Exception as e:
+                QMessageBox.warning(self, "Error", f"Error exporting profile: {str(e)}")
+                return
+            
+            msg = QMessageBox(self)
+            msg.setWindowTitle('Profile Exported')
+            msg.setText("Saved:\n" + "\n".join(paths))
+            msg.setDetailedText(profiler.format_stats())
+            self.setup_dialog_style(msg)
+            msg.exec()
+
 class ScheduleEditorDialog(QDialog):
     def __init__(self, schedules, parent=None):
         super().__init__(parent)
@@ -1601,6 +2061,350 @@ class UserGuideDialog(QDialog):
             }
         """)
 
+class RemindersDialog(QDialog):
+    def __init__(self, rules, parent=None):
+        super().__init__(parent)
+        self.rules = list(rules)
+        self.setup_ui()
+        
+    def setup_ui(self):
+        self.setWindowTitle("Reminders")
+        self.setMinimumWidth(450)
+        self.setMinimumHeight(300)
+        layout = QVBoxLayout(self)
+        
+        help_label = QLabel("One reminder per line, for example:\n"
+                            "  2 min before end of Period 9\n"
+                            "  at start of Extra Help with sound\n"
+                            "  5 min before start of Lunch on delay\n"
+                            "Schedules: regular (default), delay, homeroom, all")
+        
+        # Rules are edited as plain text and parsed on save
+        self.rules_edit = QTextEdit()
+        self.rules_edit.setPlainText("\n".join(describe_rule(rule) for rule in self.rules))
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        save_button = QPushButton("Save")
+        save_button.clicked.connect(self.save)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+        
+        button_layout.addStretch()
+        button_layout.addWidget(save_button)
+        button_layout.addWidget(cancel_button)
+        button_layout.addStretch()
+        
+        layout.addWidget(help_label)
+        layout.addWidget(self.rules_edit)
+        layout.addLayout(button_layout)
+        
+        # Apply dark theme styling
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #000000;
+            }
+            QLabel {
+                color: white;
+            }
+            QTextEdit {
+                background-color: #000066;
+                color: white;
+                border: 1px solid #0000cc;
+                font-size: 10pt;
+            }
+            QPushButton {
+                background-color: #000066;
+                color: white;
+                border: 1px solid #0000cc;
+                padding: 5px 15px;
+                font-size: 10pt;
+            }
+            QPushButton:hover {
+                background-color: #000099;
+            }
+        """)
+    
+    def save(self):
+        rules = []
+        for line in self.rules_edit.toPlainText().splitlines():
+            if not line.strip():
+                continue
+            try:
+                rules.append(parse_rule(line))
+            except ValueError as e:
+                QMessageBox.warning(self, "Error", str(e))
+                return
+        self.rules = rules
+        self.accept()
+
+
+class StudentSearchDialog(QDialog):
+    """Find a student or staff member by typing part of a name or id"""
+    def __init__(self, tracker):
+        super().__init__(tracker)
+        self.tracker = tracker
+        self.matches = []
+        self.setup_ui()
+        
+    def setup_ui(self):
+        self.setWindowTitle("Find Student")
+        self.setMinimumWidth(400)
+        self.setMinimumHeight(350)
+        layout = QVBoxLayout(self)
+        
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Type part of a name or a student id")
+        self.results_list = QListWidget()
+        self.location_label = QLabel()
+        self.location_label.setWordWrap(True)
+        
+        # Search once typing pauses; a keystroke only restarts this timer
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self.run_search)
+        self.search_edit.textChanged.connect(lambda: self.debounce_timer.start())
+        self.results_list.currentRowChanged.connect(self.show_location)
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+        button_layout.addStretch()
+        button_layout.addWidget(close_button)
+        button_layout.addStretch()
+        
+        layout.addWidget(self.search_edit)
+        layout.addWidget(self.results_list)
+        layout.addWidget(self.location_label)
+        layout.addLayout(button_layout)
+        
+        # Apply dark theme styling
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #000000;
+            }
+            QLabel {
+                color: white;
+                font-size: 10pt;
+            }
+            QLineEdit, QListWidget {
+                background-color: #000066;
+                color: white;
+                border: 1px solid #0000cc;
+                font-size: 10pt;
+            }
+            QListWidget::item:selected {
+                background-color: #0000cc;
+            }
+            QPushButton {
+                background-color: #000066;
+                color: white;
+                border: 1px solid #0000cc;
+                padding: 5px 15px;
+                font-size: 10pt;
+            }
+            QPushButton:hover {
+                background-color: #000099;
+            }
+        """)
+    
+    def run_search(self):
+        self.results_list.clear()
+        self.location_label.clear()
+        index = self.tracker.name_index
+        if index is None:
+            if self.tracker.index_job is not None:
+                self.location_label.setText("Loading roster...")
+            else:
+                self.location_label.setText("No roster loaded. Use Tools > Import Roster.")
+            return
+        self.matches = index.search(self.search_edit.text())
+        self.results_list.addItems([str(match) for match in self.matches])
+        if self.matches:
+            self.results_list.setCurrentRow(0)
+    
+    def show_location(self, row):
+        if not 0 <= row < len(self.matches):
+            self.location_label.clear()
+            return
+        match = self.matches[row]
+        lines = [f"{title}: {describe_match(self.tracker.roster, match, self.tracker.get_current_segment(key))}"
+                 for key, title in UPCOMING_TITLES.items()]
+        self.location_label.setText("\n".join(lines))
+
+
+class RoomOccupancyDialog(QDialog):
+    """Students per room right now, with the full day exportable as CSV"""
+    def __init__(self, tracker):
+        super().__init__(tracker)
+        self.tracker = tracker
+        # Counted once per roster; switching schedules only re-reads the table
+        self.occupancy = room_occupancy(tracker.roster)
+        self.setup_ui()
+        self.refresh()
+        
+    def setup_ui(self):
+        self.setWindowTitle("Room Occupancy")
+        self.setMinimumWidth(350)
+        self.setMinimumHeight(450)
+        layout = QVBoxLayout(self)
+        
+        self.schedule_selector = QComboBox()
+        self.schedule_keys = list(UPCOMING_TITLES)
+        self.schedule_selector.addItems(list(UPCOMING_TITLES.values()))
+        self.schedule_selector.currentIndexChanged.connect(self.refresh)
+        
+        self.heading_label = QLabel()
+        self.room_table = QTableWidget()
+        self.room_table.setColumnCount(2)
+        self.room_table.setHorizontalHeaderLabels(["Room", "Students"])
+        self.room_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.room_table.verticalHeader().setVisible(False)
+        header = self.room_table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Stretch)
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        export_button = QPushButton("Export Day...")
+        export_button.clicked.connect(self.export_csv)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(refresh_button)
+        button_layout.addWidget(export_button)
+        button_layout.addWidget(close_button)
+        
+        layout.addWidget(self.schedule_selector)
+        layout.addWidget(self.heading_label)
+        layout.addWidget(self.room_table)
+        layout.addLayout(button_layout)
+        
+        # Apply dark theme styling
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #000000;
+            }
+            QLabel {
+                color: white;
+                font-size: 10pt;
+            }
+            QComboBox, QTableWidget {
+                background-color: #000066;
+                color: white;
+                gridline-color: #0000cc;
+                border: 1px solid #0000cc;
+            }
+            QHeaderView::section {
+                background-color: #000033;
+                color: white;
+                padding: 5px;
+                border: 1px solid #0000cc;
+            }
+            QPushButton {
+                background-color: #000066;
+                color: white;
+                border: 1px solid #0000cc;
+                padding: 5px 15px;
+                font-size: 10pt;
+            }
+            QPushButton:hover {
+                background-color: #000099;
+            }
+        """)
+    
+    def refresh(self):
+        key = self.schedule_keys[self.schedule_selector.currentIndex()]
+        heading, rooms, unassigned = self.occupancy.at(self.tracker.get_current_segment(key))
+        if unassigned:
+            heading += f" ({unassigned} students with no class)"
+        self.heading_label.setText(heading)
+        self.room_table.setRowCount(len(rooms))
+        for row, (room, students) in enumerate(rooms):
+            self.room_table.setItem(row, 0, QTableWidgetItem(room))
+            self.room_table.setItem(row, 1, QTableWidgetItem(str(students)))
+    
+    def export_csv(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export Room Occupancy",
+            "room_occupancy.csv",
+            "CSV Files (*.csv);;All Files (*.*)"
+        )
+        if not file_path:
+            return
+        try:
+            self.occupancy.write_csv(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to export room occupancy: {e}")
+
+
+class DiagnosticsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setup_ui()
+        
+    def setup_ui(self):
+        self.setWindowTitle("Diagnostics")
+        self.setMinimumWidth(600)
+        self.setMinimumHeight(400)
+        layout = QVBoxLayout(self)
+        
+        # Create text display
+        self.text_display = QTextEdit()
+        self.text_display.setReadOnly(True)
+        self.text_display.setLineWrapMode(QTextEdit.NoWrap)
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        ok_button = QPushButton("OK")
+        ok_button.clicked.connect(self.accept)
+        
+        button_layout.addStretch()
+        button_layout.addWidget(refresh_button)
+        button_layout.addWidget(ok_button)
+        button_layout.addStretch()
+        
+        # Add widgets to layout
+        layout.addWidget(self.text_display)
+        layout.addLayout(button_layout)
+        
+        # Apply dark theme styling
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #000000;
+            }
+            QTextEdit {
+                background-color: #000066;
+                color: white;
+                border: 1px solid #0000cc;
+                font-family: "Courier New", monospace;
+                font-size: 10pt;
+            }
+            QPushButton {
+                background-color: #000066;
+                color: white;
+                border: 1px solid #0000cc;
+                padding: 5px 15px;
+                font-size: 10pt;
+            }
+            QPushButton:hover {
+                background-color: #000099;
+            }
+        """)
+        
+        self.refresh()
+    
+    def refresh(self):
+        text = "RUNTIME METRICS\n\n" + metrics.format_text()
+        if profiler.totals:
+            text += "\n\nTIMING SPANS\n\n" + profiler.format_stats()
+        self.text_display.setPlainText(text)
+
 class AboutDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -1671,11 +2475,17 @@ class AboutDialog(QDialog):
         """)
 
 def main():
+    instance, commands = claim()
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)
     
+    # Local Prometheus endpoint, only when SH_SCHED_METRICS_PORT is set
+    serve_metrics()
+    
     window = ScheduleWindow()
     window.show()
+    window.listen(instance)
+    window.run_commands(commands)
     
     sys.exit(app.exec())
 
@@ -1,3 +1,8 @@
+from sh_sched_instance import claim, INSTANCE_POLL_MS, INSTANCE_IDLE_POLL_MS
+if __name__ == "__main__":
+    # A second launch forwards its arguments to the running tracker and
+    # exits here, before Tk, PIL and pystray are loaded
+    claim()
 import tkinter as tk
 from tkinter import ttk, messagebox, colorchooser, filedialog
 import json
@@ -9,6 +14,27 @@ from PIL import Image, ImageTk
 import pystray
 import threading
 import platform
+from sh_sched_engine import (load_schedules, save_schedules, build_schedules, schedules_to_dict, next_boundary,
+                             segment_of, track_view, track_names, format_hhmm, Lookahead, format_countdown,
+                             UPCOMING_COUNT, DAY_SECONDS)
+from sh_sched_instrument import profiler, profiled, export_profile, metrics, serve_metrics
+from sh_sched_settings import get_settings, import_tk_settings
+from sh_sched_clock import get_clock, JumpDetector, JUMP_IDLE_CHECK_MS
+from sh_sched_reminders import ReminderScheduler, parse_rule, describe_rule
+from sh_sched_roster import ImportJob, ROSTER_FILE, roster_exists
+from sh_sched_search import IndexJob, describe_match, DEBOUNCE_MS
+from sh_sched_occupancy import room_occupancy
+
+# Schedules listed in the "Coming Up" panel, with their short titles
+UPCOMING_TITLES = {
+    'regular_schedule': 'Regular',
+    'two_hour_delay': 'Delay',
+    'homeroom_schedule': 'Homeroom',
+}
+# Window heights: normal, extra for the test panel, extra for the Coming Up panel
+BASE_HEIGHT = 225
+TEST_PANEL_HEIGHT = 175
+UPCOMING_HEIGHT = 100
 
 class ScheduleTrackerTk:
     def __init__(self, enable_test_mode=False):
@@ -30,11 +56,27 @@ class ScheduleTrackerTk:
         self.test_time = datetime.strptime("07:00", "%H:%M").time()
         self.test_timer = None
         self.test_delay = 1000  # milliseconds between time updates in test mode
-        self.settings = {}
+        self.update_job = None
+        self.low_power = False  # True while minimized or hidden
+        self.tray_messages = None
+        self.lookahead = Lookahead(UPCOMING_COUNT, tuple(UPCOMING_TITLES))
+        self.reminder_job = None
+        # Notices sleep/resume and clock changes; the timers check it when they fire
+        self.clock_jumps = JumpDetector()
+        self.jump_job = None
+        self.roster = None  # replaced by Tools > Import Roster
+        self.roster_job = None
+        self.name_index = None
+        self.index_job = None
+        self.search_dialog = None
+        self.schedules = {}
         self.load_settings()
+        # Wall-clock time in the configured zone (the computer's own by default)
+        self.clock = self.school_clock()
+        self.load_name_index()
         
         # Set initial window size
-        self.root.geometry("325x225")
+        self.root.geometry(f"325x{self.window_height()}")
         
         # Create main frame
         self.main_frame = ttk.Frame(self.root, padding="10")
@@ -56,6 +98,10 @@ class ScheduleTrackerTk:
             # Start tray icon in a separate thread
             threading.Thread(target=lambda: self.tray_icon.run(), daemon=True).start()
 
+        # Reminder notifications: one after() job aimed at the next one due
+        self.reminders = ReminderScheduler(self.settings.get('reminders'))
+        self.arm_reminders()
+
         # Start timer for updates
         self.update_timer()
 
@@ -69,13 +115,16 @@ class ScheduleTrackerTk:
         # Bind window close event
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
+        # Suspend widget updates while minimized
+        self.root.bind('<Unmap>', self.on_unmap)
+        self.root.bind('<Map>', self.on_map)
+        
         # Set window position after all widgets are created
         self.root.update_idletasks()
         self.restore_window_position()
         
         self.current_period = "Not in session"
         self.is_visible = True
-        self.password = self.settings.get('password', '')
 
     def create_menu(self):
         menubar = tk.Menu(self.root)
@@ -94,11 +143,27 @@ class ScheduleTrackerTk:
         self.tools_menu.add_command(label="Edit Schedule...", command=self.edit_schedule)
         self.tools_menu.add_separator()
         self.tools_menu.add_command(label="Enable Test Mode", command=self.enable_test_mode)
+        self.tools_menu.add_separator()
+        self.upcoming_var = tk.BooleanVar(value=self.settings.get('show_upcoming'))
+        self.tools_menu.add_checkbutton(label="Show Coming Up", variable=self.upcoming_var,
+                                        command=self.toggle_upcoming)
+        self.tools_menu.add_command(label="Reminders...", command=self.show_reminders)
+        self.tools_menu.add_command(label="Import Roster...", command=self.import_roster)
+        self.tools_menu.add_command(label="Find Student...", command=self.show_student_search)
+        self.tools_menu.add_command(label="Room Occupancy...", command=self.show_room_occupancy)
+        self.tools_menu.add_command(label="Select Track...", command=self.select_track)
 
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Help", menu=help_menu)
         help_menu.add_command(label="User Guide", command=self.show_user_guide)
+        help_menu.add_separator()
+        self.profiling_var = tk.BooleanVar(value=profiler.enabled)
+        help_menu.add_checkbutton(label="Enable Profiling", variable=self.profiling_var,
+                                  command=self.toggle_profiling)
+        help_menu.add_command(label="Export Profile...", command=self.save_profile)
+        help_menu.add_command(label="Diagnostics", command=self.show_diagnostics)
+        help_menu.add_separator()
         help_menu.add_command(label="About", command=self.show_about)
 
     def create_schedule_display(self):
@@ -123,6 +188,22 @@ class ScheduleTrackerTk:
         self.homeroom_label = ttk.Label(homeroom_frame, text="Not in session", style='Period.TLabel', width=30)
         self.homeroom_label.grid(row=0, column=0, padx=5, pady=5)
 
+        # "Coming Up" frame: one row per upcoming transition, hidden unless enabled
+        self.upcoming_frame = ttk.LabelFrame(self.main_frame, text="Coming Up", style='Period.TLabelframe')
+        self.upcoming_frame.grid(row=3, column=0, padx=5, pady=5, sticky='ew')
+        # Each row is (frame, transition label, countdown label)
+        self.upcoming_rows = []
+        for _ in range(UPCOMING_COUNT):
+            row = ttk.Frame(self.upcoming_frame, style='Upcoming.TFrame')
+            row.pack(fill='x', padx=5)
+            text_label = ttk.Label(row, text="", style='Upcoming.TLabel')
+            text_label.pack(side='left')
+            countdown_label = ttk.Label(row, text="", style='Upcoming.TLabel')
+            countdown_label.pack(side='right')
+            self.upcoming_rows.append((row, text_label, countdown_label))
+        if not self.settings.get('show_upcoming'):
+            self.upcoming_frame.grid_remove()
+
         # Configure grid weights for better resizing
         self.main_frame.grid_columnconfigure(0, weight=1)
         for i in range(3):  # Three rows for three schedules
@@ -156,6 +237,40 @@ class ScheduleTrackerTk:
         else:
             # On macOS/Linux, use standard window minimize
             self.root.iconify()
+        self.set_low_power(True)
+
+    def on_unmap(self, event):
+        # <Unmap> is also delivered for child widgets; only the root window matters
+        if event.widget is self.root and self.root.state() in ('iconic', 'withdrawn'):
+            self.set_low_power(True)
+
+    def on_map(self, event):
+        if event.widget is self.root:
+            self.set_low_power(False)
+
+    def set_low_power(self, enabled):
+        """Suspend widget updates while hidden; catch up with one refresh when shown"""
+        if enabled == self.low_power:
+            return
+        self.low_power = enabled
+        # Hidden, the update loop may sleep for an hour: watch the clock in between
+        if enabled:
+            self.jump_job = self.root.after(JUMP_IDLE_CHECK_MS, self.watch_clock)
+        elif self.jump_job is not None:
+            self.root.after_cancel(self.jump_job)
+            self.jump_job = None
+        # Re-run the update loop now so the next wakeup uses the new interval
+        self.update_timer()
+
+    def next_update_delay(self):
+        """Milliseconds until the next update: every second while visible,
+        only at the next schedule transition while hidden"""
+        if not self.low_power or self.test_mode:
+            return 1000
+        # Measured in real seconds, so a DST change before the boundary is accounted for
+        day, seconds = self.clock.wall()
+        delay = self.clock.until(day, next_boundary(self.display_schedules(), int(seconds)))
+        return max(1000, int(delay * 1000) + 50)
 
     def on_close(self):
         """Handle window close button"""
@@ -169,8 +284,18 @@ class ScheduleTrackerTk:
             self.save_window_position()
             self.root.quit()
 
-    def update_timer(self):
+    def update_timer(self, due=None):
         """Update the display with current time"""
+        metrics.inc('timer_wakeups')
+        self.settings.poll()
+        if self.check_clock(due):
+            # The update loop was re-run from the new time
+            return
+        # Only one update loop may be pending at a time
+        if self.update_job is not None:
+            self.root.after_cancel(self.update_job)
+            self.update_job = None
+        
         if self.test_mode:
             if self.test_timer is not None:
                 # In test mode with active timer, use test time
@@ -180,206 +305,486 @@ class ScheduleTrackerTk:
                 current_time = self.test_time
         else:
             # Use real time in normal mode
-            current_time = datetime.now().time()
+            current_time = self.clock.now().time()
         
         self.update_schedule_display(current_time)
         
         # Only schedule next update if not in test mode or if test timer is not active
         if not self.test_mode or self.test_timer is None:
-            self.root.after(1000, self.update_timer)
+            delay = self.next_update_delay()
+            self.update_job = self.root.after(delay, self.update_timer, self.clock_jumps.deadline(delay))
 
+    @profiled()
     def update_schedule_display(self, current_time):
-        # Update window title with current time
         time_str = current_time.strftime("%H:%M")
-        self.root.title(f"SH Schedule Tracker - {time_str}")
         
-        # Get schedule messages
-        regular_period = self.get_current_period(current_time, "regular")
-        delay_period = self.get_current_period(current_time, "two_hour_delay")
-        homeroom_period = self.get_current_period(current_time, "homeroom_schedule")
+        # Get schedule segments
+        regular_period = self.get_current_segment(current_time, "regular_schedule")
+        delay_period = self.get_current_segment(current_time, "two_hour_delay")
+        homeroom_period = self.get_current_segment(current_time, "homeroom_schedule")
         
-        # Update labels
-        self.regular_label.configure(text=regular_period, style='Period.TLabel')
-        self.delay_label.configure(text=delay_period, style='Period.TLabel')
-        self.homeroom_label.configure(text=homeroom_period, style='Period.TLabel')
+        if self.low_power:
+            # Hidden: only the tray tooltip is kept current, and only when a segment changes
+            if (regular_period, delay_period, homeroom_period) != self.tray_messages:
+                self.update_tray_tooltip(f"Updated: {time_str}", regular_period, delay_period, homeroom_period)
+            return
         
-        # Update tray tooltip (Windows only)
-        if platform.system() == 'Windows' and self.tray_icon:
-            tooltip = (f"Current Time: {time_str}\n"
-                      f"Regular: {regular_period}\n"
-                      f"2-Hour Delay: {delay_period}\n"
-                      f"Homeroom: {homeroom_period}")
-            self.tray_icon.title = tooltip
+        # Update window title with current time
+        self.root.title(f"SH Schedule Tracker - {time_str}")
+        
+        if self.settings.get('show_upcoming'):
+            self.update_upcoming(current_time.hour * 3600 + current_time.minute * 60 + current_time.second)
+        
+        # Update labels (only when the message actually changes)
+        for label, text in ((self.regular_label, regular_period.message),
+                            (self.delay_label, delay_period.message),
+                            (self.homeroom_label, homeroom_period.message)):
+            if label.cget('text') != text:
+                label.configure(text=text, style='Period.TLabel')
+                metrics.inc('label_redraws')
+            else:
+                metrics.inc('label_redraws_skipped')
+        
+        # Update tray tooltip
+        self.update_tray_tooltip(f"Current Time: {time_str}", regular_period, delay_period, homeroom_period)
+
+    def update_upcoming(self, seconds):
+        """Slide the Coming Up rows: a row is only rewritten when its transition changes"""
+        popped = self.lookahead.advance(self.display_schedules(), seconds)
+        items = self.lookahead.items
+        rows = self.upcoming_rows
+        if popped is None:
+            changed = range(len(rows))
+        else:
+            # Move the rows of passed transitions to the bottom for the new ones
+            popped = min(popped, len(rows))
+            for _ in range(popped):
+                row = rows.pop(0)
+                row[0].pack_forget()
+                row[0].pack(fill='x', padx=5)
+                rows.append(row)
+            changed = range(len(rows) - popped, len(rows))
+        for i in changed:
+            if i < len(items):
+                start, key, segment = items[i]
+                text = f"{format_hhmm(start)}  {UPCOMING_TITLES[key]}: {segment.message}"
+            else:
+                text = ""
+            rows[i][1].configure(text=text)
+        for i, (_, _, countdown_label) in enumerate(rows):
+            text = format_countdown(items[i][0] - seconds) if i < len(items) else ""
+            if countdown_label.cget('text') != text:
+                countdown_label.configure(text=text)
+
+    def listen(self, instance):
+        """Run the commands later launches forward (show, test mode, reload)"""
+        self.instance = instance
+        if instance is None:
+            return
+        try:
+            # Wake only when a launch connects
+            self.root.tk.createfilehandler(instance.fileno(), tk.READABLE, self.on_instance_readable)
+        except (AttributeError, RuntimeError, tk.TclError):
+            # No file handlers on Windows or with threaded Tcl: poll, slowly while hidden
+            self.root.after(INSTANCE_POLL_MS, self.poll_instance)
+
+    def on_instance_readable(self, fileno, mask):
+        self.run_commands(self.instance.poll())
+
+    def poll_instance(self):
+        # A non-blocking accept is cheap
+        self.run_commands(self.instance.poll())
+        self.root.after(INSTANCE_IDLE_POLL_MS if self.low_power else INSTANCE_POLL_MS, self.poll_instance)
+
+    def run_commands(self, commands):
+        for command in commands:
+            if command == 'show':
+                self.set_low_power(False)
+                self.root.deiconify()
+                self.root.lift()
+                self.root.focus_force()
+                self.is_visible = True
+            elif command == 'test_mode' and not self.test_mode:
+                self.enable_test_mode()
+            elif command == 'reload':
+                self.reload_schedules()
+
+    def reload_schedules(self):
+        """Re-read the schedules file (after it was replaced outside the app)"""
+        try:
+            self.schedules = load_schedules()
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to load schedules: {str(e)}")
+            return
+        self.arm_reminders()
+        self.update_timer()
 
-    def get_current_period(self, current_time, schedule_type):
-        # Remove '_schedule' suffix if present for regular schedule
-        if schedule_type == 'regular_schedule':
-            schedule_type = 'regular'
+    def check_clock(self, due=None):
+        """After a sleep or a clock change, refresh and re-aim the timers at once; True if it did"""
+        if not self.clock_jumps.check(due) or self.test_mode:
+            return False
+        self.lookahead.invalidate()
+        self.arm_reminders()
+        self.update_timer()
+        return True
+
+    def watch_clock(self):
+        self.jump_job = self.root.after(JUMP_IDLE_CHECK_MS, self.watch_clock)
+        self.check_clock()
+
+    def arm_reminders(self):
+        """Rebuild today's reminder queue (after a schedule or rule change)"""
+        day, seconds = self.clock.wall()
+        self.reminders.arm(self.display_schedules(), day, int(seconds))
+        self.arm_reminder_timer()
+
+    def arm_reminder_timer(self):
+        """Sleep until the next reminder, or until midnight to queue the next day's"""
+        if self.reminder_job is not None:
+            self.root.after_cancel(self.reminder_job)
+            self.reminder_job = None
+        if not self.reminders.rules:
+            return
+        day = self.clock.wall()[0]
+        due = self.reminders.next_due()
+        delay = self.clock.until(day, DAY_SECONDS if due is None else due)
+        delay = max(0, int(delay * 1000) + 50)
+        self.reminder_job = self.root.after(delay, self.check_reminders, self.clock_jumps.deadline(delay))
+
+    def check_reminders(self, due):
+        self.reminder_job = None
+        if self.check_clock(due):
+            # Re-armed from the new time; reminders missed while asleep are skipped
+            return
+        day, seconds = self.clock.wall()
+        for reminder in self.reminders.pop_due(day, int(seconds)):
+            self.show_reminder(reminder)
+        self.arm_reminder_timer()
+
+    def show_reminder(self, reminder):
+        """Show a reminder as a tray notification (Windows) and ring the bell if asked"""
+        title = UPCOMING_TITLES.get(reminder.schedule, "SH Schedule Tracker")
+        if self.tray_icon:
+            try:
+                self.tray_icon.notify(reminder.message, title)
+            except Exception as e:
+                print(f"Failed to show notification: {e}")
+        if reminder.sound:
+            self.root.bell()
+
+    def show_reminders(self):
+        """Edit reminder rules, one per line"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Reminders")
+        dialog.transient(self.root)
+        dialog.configure(bg='#000080')
+        
+        help_text = ("One reminder per line, for example:\n"
+                     "  2 min before end of Period 9\n"
+                     "  at start of Extra Help with sound\n"
+                     "  5 min before start of Lunch on delay\n"
+                     "Schedules: regular (default), delay, homeroom, all")
+        tk.Label(dialog, text=help_text, justify='left', bg='#000080', fg='white').pack(padx=10, pady=(10, 0), anchor='w')
+        
+        text_widget = tk.Text(dialog, width=50, height=12, bg='#000080', fg='white', insertbackground='white')
+        text_widget.pack(fill='both', expand=True, padx=10, pady=10)
+        text_widget.insert('1.0', "\n".join(describe_rule(rule) for rule in self.settings.get('reminders')))
+        
+        def save():
+            rules = []
+            for line in text_widget.get('1.0', 'end').splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    rules.append(parse_rule(line))
+                except ValueError as e:
+                    messagebox.showerror("Error", str(e), parent=dialog)
+                    return
+            self.settings.set('reminders', rules)
+            dialog.destroy()
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Save", command=save).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Cancel", command=dialog.destroy).pack(side='left', padx=5)
+
+    def import_roster(self):
+        """Import an SIS enrollment CSV on a worker thread, showing progress"""
+        if self.roster_job is not None or not self.check_password():
+            return
+        file_path = filedialog.askopenfilename(
+            title="Import SIS Roster",
+            filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")]
+        )
+        if not file_path:
+            return
+        self.roster_job = ImportJob(file_path, save_to=ROSTER_FILE).start()
         
-        schedule = self.settings.get(f'{schedule_type}', [])
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Import Roster")
+        dialog.transient(self.root)
+        dialog.configure(bg='#000080')
+        tk.Label(dialog, text="Importing roster...", bg='#000080', fg='white').pack(padx=10, pady=(10, 0), anchor='w')
+        progress = ttk.Progressbar(dialog, length=250, maximum=100)
+        progress.pack(padx=10, pady=10)
+        ttk.Button(dialog, text="Cancel", command=self.roster_job.cancel).pack(pady=(0, 10))
+        dialog.protocol("WM_DELETE_WINDOW", self.roster_job.cancel)
+        
+        # The worker never touches widgets; poll it from the Tk thread instead
+        def poll():
+            job = self.roster_job
+            if not job.finished:
+                progress['value'] = job.fraction * 100
+                self.root.after(100, poll)
+                return
+            dialog.destroy()
+            self.roster_job = None
+            if isinstance(job.error, InterruptedError):
+                return
+            if job.error is not None:
+                messagebox.showerror("Error", f"Failed to import roster: {job.error}")
+                return
+            self.roster = job.roster
+            self.load_name_index(job.roster)
+            messagebox.showinfo("Roster Imported", job.report.format_text())
         
-        if not schedule:
-            return "No schedule defined"
+        self.root.after(100, poll)
+
+    def load_name_index(self, roster=None):
+        """Build the name search index off the Tk thread (from roster.json unless a roster is given)"""
+        if roster is None and not roster_exists():
+            return
+        job = self.index_job = IndexJob(roster).start()
         
-        # Sort periods by start time and filter out periods with None start or end times
-        valid_periods = [p for p in schedule if p.get('start') is not None and p.get('end') is not None]
+        def poll():
+            if not job.finished:
+                self.root.after(100, poll)
+                return
+            if job is not self.index_job:
+                return  # superseded by a newer roster
+            self.index_job = None
+            if job.error is not None:
+                print(f"Failed to load roster: {job.error}")
+                return
+            self.roster = job.roster
+            self.name_index = job.index
+            if self.search_dialog is not None:
+                self.search_dialog.run_search()
+        
+        self.root.after(100, poll)
+
+    def select_track(self):
+        """Choose the track (lunch wave, grade band) this display follows"""
+        names = track_names(self.schedules)
+        if not names:
+            messagebox.showinfo("Select Track", "None of the schedules have tracks (lunch waves, grade bands).")
+            return
+        choices = ["Main schedule"] + names
+        current = self.settings.get('track')
         
-        if not valid_periods:
-            return "No valid periods defined"
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Select Track")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        dialog.configure(bg='#000080')
+        tk.Label(dialog, text="Show the schedule for:", bg='#000080', fg='white').pack(padx=10, pady=(10, 5))
+        track_var = tk.StringVar(value=current if current in choices else choices[0])
+        ttk.Combobox(dialog, textvariable=track_var, values=choices, state='readonly').pack(fill='x', padx=10)
+        
+        def apply():
+            # Listeners update the labels, Coming Up and reminders
+            self.settings.set('track', '' if track_var.get() == choices[0] else track_var.get())
+            dialog.destroy()
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="OK", command=apply).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Cancel", command=dialog.destroy).pack(side='left', padx=5)
+
+    def show_room_occupancy(self):
+        """Students per room right now, with the full day exportable as CSV"""
+        if self.roster is None:
+            messagebox.showinfo("Room Occupancy", "No roster loaded. Use Tools > Import Roster.")
+            return
+        # Counted once per roster; switching schedules only re-reads the table
+        occupancy = room_occupancy(self.roster)
         
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Room Occupancy")
+        dialog.transient(self.root)
+        dialog.configure(bg='#000080')
+        
+        schedule_var = tk.StringVar(value=next(iter(UPCOMING_TITLES.values())))
+        selector = ttk.Combobox(dialog, textvariable=schedule_var, values=list(UPCOMING_TITLES.values()),
+                                state='readonly')
+        selector.pack(fill='x', padx=10, pady=(10, 5))
+        heading_label = tk.Label(dialog, text="", anchor='w', bg='#000080', fg='white')
+        heading_label.pack(fill='x', padx=10)
+        
+        tree = ttk.Treeview(dialog, columns=('room', 'students'), show='headings', height=15)
+        tree.heading('room', text="Room")
+        tree.heading('students', text="Students")
+        tree.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        def refresh():
+            key = next(key for key, title in UPCOMING_TITLES.items() if title == schedule_var.get())
+            current_time = self.test_time if self.test_mode else self.clock.now().time()
+            heading, rooms, unassigned = occupancy.at(self.get_current_segment(current_time, key))
+            if unassigned:
+                heading += f" ({unassigned} students with no class)"
+            heading_label.config(text=heading)
+            tree.delete(*tree.get_children())
+            for room, students in rooms:
+                tree.insert('', 'end', values=(room, students))
+        
+        def export_csv():
+            file_path = filedialog.asksaveasfilename(
+                parent=dialog,
+                title="Export Room Occupancy",
+                initialfile="room_occupancy.csv",
+                defaultextension=".csv",
+                filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")]
+            )
+            if not file_path:
+                return
+            try:
+                occupancy.write_csv(file_path)
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to export room occupancy: {e}", parent=dialog)
+        
+        selector.bind('<<ComboboxSelected>>', lambda e: refresh())
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Refresh", command=refresh).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Export Day...", command=export_csv).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Close", command=dialog.destroy).pack(side='left', padx=5)
+        refresh()
+
+    def show_student_search(self):
+        # Non-modal, so it can stay open beside the tracker
+        if self.search_dialog is None:
+            self.search_dialog = StudentSearchDialog(self)
+        self.search_dialog.dialog.deiconify()
+        self.search_dialog.dialog.lift()
+        self.search_dialog.entry.focus_set()
+
+    def toggle_upcoming(self):
+        self.settings.set('show_upcoming', self.upcoming_var.get())
+
+    def window_height(self):
+        """Window height for the panels currently shown"""
+        height = BASE_HEIGHT
+        if self.test_mode:
+            height += TEST_PANEL_HEIGHT
+        if self.settings.get('show_upcoming'):
+            height += UPCOMING_HEIGHT
+        return height
+
+    def update_tray_tooltip(self, status, regular_period, delay_period, homeroom_period):
+        """Update tray tooltip (Windows only)"""
+        self.tray_messages = (regular_period, delay_period, homeroom_period)
+        if platform.system() == 'Windows' and self.tray_icon:
+            tooltip = (f"{status}\n"
+                      f"Regular: {regular_period.message}\n"
+                      f"2-Hour Delay: {delay_period.message}\n"
+                      f"Homeroom: {homeroom_period.message}")
+            if self.tray_icon.title != tooltip:
+                self.tray_icon.title = tooltip
+                metrics.inc('tray_updates')
+
+    @profiled()
+    def get_current_segment(self, current_time, schedule_type):
+        """Return the precompiled Segment (message included) for current_time"""
+        now = current_time.hour * 3600 + current_time.minute * 60 + current_time.second
+        return segment_of(self.display_schedules(), schedule_type, now)
+
+    def school_clock(self):
+        """The clock for the time zone setting (this computer's zone if unset or unknown)"""
         try:
-            sorted_periods = sorted(valid_periods, key=lambda x: datetime.strptime(x['start'], "%H:%M"))
-            
-            # Check if after last period (after 14:30)
-            last_end_time = datetime.strptime("14:30", "%H:%M").time()
-            if current_time > last_end_time:
-                return "After School"
-            
-            # Find Period 1 start time for the "waiting for period 1" message
-            period_1 = next((p for p in sorted_periods if str(p['name']) == '1'), None)
-            if period_1:
-                period_1_start = datetime.strptime(period_1['start'], "%H:%M").time()
-                if current_time < period_1_start:
-                    return f"Period 1 starts at {period_1['start']}"
-            
-            # Check if before first period
-            first_period = sorted_periods[0]
-            first_start = datetime.strptime(first_period['start'], "%H:%M").time()
-            
-            if current_time < first_start:
-                return "Before School"
-            
-            # Check current period and transitions
-            for i, period in enumerate(sorted_periods):
-                start_time = datetime.strptime(period['start'], "%H:%M").time()
-                end_time = datetime.strptime(period['end'], "%H:%M").time()
-                
-                if start_time <= current_time <= end_time:
-                    # Convert period name to string and check if it's a number
-                    period_name = str(period['name'])
-                    if period_name.isdigit():
-                        return f"Period {period_name}"
-                    else:
-                        return period_name
-                
-                # Check for transition between periods
-                if i < len(sorted_periods) - 1:  # If not the last period
-                    next_period = sorted_periods[i + 1]
-                    next_start = datetime.strptime(next_period['start'], "%H:%M").time()
-                    
-                    if end_time < current_time < next_start:
-                        # Format period names
-                        current_name = str(period['name'])
-                        next_name = str(next_period['name'])
-                        current_display = f"Period {current_name}" if current_name.isdigit() else current_name
-                        next_display = f"Period {next_name}" if next_name.isdigit() else next_name
-                        return f"{current_display} → {next_display}"
-                
-            return "Not in session"
-            
-        except (ValueError, TypeError) as e:
-            print(f"Error processing schedule: {e}")
-            return "Error in schedule format"
+            return get_clock(self.settings.get('timezone'))
+        except ValueError:
+            return get_clock()
+
+    def display_schedules(self):
+        """The schedules as the configured track (lunch wave, grade band) sees them"""
+        return track_view(self.schedules, self.settings.get('track'))
 
     def edit_schedule(self):
         if self.check_password():
             self.show_schedule_editor()
 
     def show_schedule_editor(self):
-        editor = ScheduleEditorDialog(self.root, self.settings)
+        editor = ScheduleEditorDialog(self.root, self.settings.as_dict())
         if editor.result:
-            self.settings = editor.result
-            self.save_settings()
+            # The editor has already written schedules.json; keep only the
+            # rebuilt schedules here so settings never hold a second copy;
+            # tracks are not edited here and carry over unchanged
+            current = schedules_to_dict(self.schedules)
+            self.schedules = build_schedules({
+                key: dict(current.get(key, {}), periods=editor.result.pop(name, []))
+                for key, name in (('regular_schedule', 'regular'), ('two_hour_delay', 'two_hour_delay'),
+                                  ('homeroom_schedule', 'homeroom_schedule'))
+            })
+            self.arm_reminders()
 
     def show_settings(self):
-        settings_dialog = SettingsDialog(self.root, self.settings)
+        settings_dialog = SettingsDialog(self.root, self.settings.as_dict())
         if settings_dialog.result:
-            self.settings = settings_dialog.result
+            # Listeners re-apply the colors as each one changes
+            self.settings.update(settings_dialog.result)
             self.save_settings()
-            self.apply_colors()  # Apply new colors immediately
 
     def check_password(self):
-        if not self.password:
+        password = self.settings.get('admin_password')
+        if not password:
             return True
         
         dialog = PasswordDialog(self.root)
-        return dialog.result == self.password
+        return dialog.result == password
+
+    def on_setting_changed(self, key, value):
+        """Apply a setting changed here or by another running instance"""
+        if key.endswith('_color') and hasattr(self, 'main_frame'):
+            self.apply_colors()
+        elif key == 'reminders' and hasattr(self, 'reminders'):
+            self.reminders.set_rules(value)
+            self.arm_reminders()
+        elif key == 'track' and hasattr(self, 'reminders'):
+            self.arm_reminders()
+            self.update_timer()
+        elif key == 'timezone' and hasattr(self, 'reminders'):
+            self.clock = self.school_clock()
+            self.arm_reminders()
+            self.update_timer()
+        elif key == 'show_upcoming' and hasattr(self, 'upcoming_frame'):
+            self.upcoming_var.set(value)
+            if value:
+                self.upcoming_frame.grid()
+            else:
+                self.upcoming_frame.grid_remove()
+            self.root.geometry(f"325x{self.window_height()}")
+            self.update_timer()
 
+    @profiled()
     def load_settings(self):
+        # Settings are shared with the Qt app; an old schedule_settings.json
+        # is migrated into the shared store on first run
+        self.settings = get_settings()
+        if self.settings.is_new:
+            import_tk_settings(self.settings)
+        self.settings.subscribe(self.on_setting_changed)
+        
+        # Load schedules
         try:
-            # Load settings
-            try:
-                with open('schedule_settings.json', 'r') as f:
-                    self.settings = json.load(f)
-            except FileNotFoundError:
-                self.settings = self.get_default_settings()
-                self.save_settings()
-            
-            # Load schedules
-            try:
-                with open('schedules.json', 'r') as f:
-                    schedules_data = json.load(f)
-                    if 'southampton_high_school' in schedules_data:
-                        school_data = schedules_data['southampton_high_school']
-                        # Debug print
-                        print("Loaded schedule data:", school_data)
-                        # Update settings with schedule data
-                        self.settings.update({
-                            'regular': school_data.get('regular_schedule', {}).get('periods', []),
-                            'two_hour_delay': school_data.get('two_hour_delay', {}).get('periods', []),
-                            'homeroom_schedule': school_data.get('homeroom_schedule', {}).get('periods', [])
-                        })
-                        # Debug print
-                        print("Updated settings:", self.settings)
-            except FileNotFoundError:
-                print("Warning: schedules.json not found")
-            except json.JSONDecodeError:
-                print("Warning: Invalid JSON in schedules.json")
-            
-        except Exception as e:
-            print(f"Error loading settings: {str(e)}")
-            self.settings = self.get_default_settings()
+            self.schedules = load_schedules()
+        except FileNotFoundError:
+            print("Warning: schedules.json not found")
+        except (json.JSONDecodeError, ValueError):
+            print("Warning: Invalid JSON in schedules.json")
 
     def save_settings(self):
-        # Save settings
-        with open('schedule_settings.json', 'w') as f:
-            json.dump(self.settings, f, indent=4)
-        
-        # Save schedules
-        try:
-            with open('schedules.json', 'r') as f:
-                schedules_data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            schedules_data = {'southampton_high_school': {}}
-        
-        # Update schedules data
-        if 'southampton_high_school' not in schedules_data:
-            schedules_data['southampton_high_school'] = {}
-        
-        school_data = schedules_data['southampton_high_school']
-        school_data.update({
-            'regular_schedule': {'periods': self.settings.get('regular', [])},
-            'two_hour_delay': {'periods': self.settings.get('two_hour_delay', [])},
-            'homeroom_schedule': {'periods': self.settings.get('homeroom_schedule', [])}
-        })
-        
-        # Save updated schedules
-        with open('schedules.json', 'w') as f:
-            json.dump(schedules_data, f, indent=4)
-
-    def get_default_settings(self):
-        return {
-            'regular': [],
-            'two_hour_delay': [],
-            'homeroom_schedule': [],
-            'password': '',
-            'window_color': '#FFFFFF',
-            'text_color': '#000000',
-            'label_bg_color': '#E0E0E0',    # Message background
-            'label_text_color': '#000000',   # Message text
-            'frame_bg_color': '#D0D0D0',    # Schedule frame label background
-            'frame_text_color': '#000000'    # Schedule frame label text
-        }
+        # Write pending changes now instead of waiting for the batched flush
+        self.settings.flush()
 
     def get_resource_path(self, relative_path):
         if hasattr(sys, '_MEIPASS'):
@@ -511,6 +916,58 @@ class ScheduleTrackerTk:
         
         dialog.wait_window()
 
+    def show_diagnostics(self):
+        """Show runtime counters and (if enabled) timing span statistics"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Diagnostics")
+        dialog.transient(self.root)
+        dialog.configure(bg='#000080')
+        
+        text_widget = tk.Text(dialog, wrap='none', width=80, height=24,
+                              font=('Courier New', 10),
+                              bg='#000080', fg='white', insertbackground='white')
+        text_widget.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        def refresh():
+            text = "RUNTIME METRICS\n\n" + metrics.format_text()
+            if profiler.totals:
+                text += "\n\nTIMING SPANS\n\n" + profiler.format_stats()
+            text_widget.config(state='normal')
+            text_widget.delete('1.0', 'end')
+            text_widget.insert('1.0', text)
+            text_widget.config(state='disabled')
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Refresh", command=refresh).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="OK", command=dialog.destroy).pack(side='left', padx=5)
+        
+        refresh()
+
+    def toggle_profiling(self):
+        """Turn timing spans on or off from the Help menu"""
+        if self.profiling_var.get():
+            profiler.enable()
+        else:
+            profiler.disable()
+
+    def save_profile(self):
+        """Export recorded spans as a Chrome trace (and cProfile stats if collected)"""
+        file_path = filedialog.asksaveasfilename(
+            title="Export Profile",
+            initialfile="sh_sched_profile.trace.json",
+            filetypes=[("Chrome Trace Files", "*.trace.json"), ("All Files", "*.*")]
+        )
+        if file_path:
+            base_path = file_path[:-len('.trace.json')] if file_path.endswith('.trace.json') else file_path
+            try:
+                paths = export_profile(base_path)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to export profile: {str(e)}")
+                return
+            messagebox.showinfo("Profile Exported",
+                                "Saved:\n" + "\n".join(paths) + "\n\n" + profiler.format_stats())
+
     def open_url(self, url):
         """Open a URL in the default web browser"""
         import webbrowser
@@ -530,14 +987,15 @@ class ScheduleTrackerTk:
     def run(self):
         self.root.mainloop()
 
+    @profiled()
     def apply_colors(self):
         # Get colors from settings
-        bg_color = self.settings.get('window_color', '#FFFFFF')
-        fg_color = self.settings.get('text_color', '#000000')
-        label_bg = self.settings.get('label_bg_color', '#E0E0E0')
-        label_fg = self.settings.get('label_text_color', '#000000')
-        frame_bg = self.settings.get('frame_bg_color', '#D0D0D0')
-        frame_fg = self.settings.get('frame_text_color', '#000000')
+        bg_color = self.settings.get('window_bg_color')
+        fg_color = self.settings.get('window_text_color')
+        label_bg = self.settings.get('message_bg_color')
+        label_fg = self.settings.get('message_text_color')
+        frame_bg = self.settings.get('frame_bg_color')
+        frame_fg = self.settings.get('frame_text_color')
         
         self.root.configure(bg=bg_color)
         self.main_frame.configure(style='Main.TFrame')
@@ -556,6 +1014,11 @@ class ScheduleTrackerTk:
                             background=frame_bg, 
                             foreground=frame_fg, 
                             font=('Arial', 12, 'bold'))
+        self.style.configure('Upcoming.TFrame', background=frame_bg)
+        self.style.configure('Upcoming.TLabel', 
+                            background=frame_bg, 
+                            foreground=frame_fg, 
+                            font=('Arial', 9))
         
         # Apply to existing widgets
         label_names = ['regular_label', 'delay_label', 'homeroom_label']
@@ -567,8 +1030,8 @@ class ScheduleTrackerTk:
         """Toggle test mode on/off with password protection"""
         if not self.test_mode:
             # Check password
-            dialog = PasswordDialog(self.root, default_password='shs')
-            if not dialog.result == 'shs':
+            dialog = PasswordDialog(self.root)
+            if not dialog.result == self.settings.get('admin_password'):
                 messagebox.showerror("Error", "Incorrect password")
                 return
 
@@ -578,10 +1041,10 @@ class ScheduleTrackerTk:
         if self.test_mode:
             # Show test panel and resize window
             self.test_panel.grid()
-            self.root.geometry("325x400")
+            self.root.geometry(f"325x{self.window_height()}")
             self.tools_menu.entryconfigure(2, label="Disable Test Mode")
             # Initialize test time to current time
-            self.test_time = datetime.now().time()
+            self.test_time = self.clock.now().time()
             self.hour_spinner.set(f"{self.test_time.hour:02d}")
             self.minute_spinner.set(f"{self.test_time.minute:02d}")
             # Start real-time updates
@@ -590,7 +1053,7 @@ class ScheduleTrackerTk:
             # Hide test panel and restore window size
             self.stop_auto_test()
             self.test_panel.grid_remove()
-            self.root.geometry("325x225")
+            self.root.geometry(f"325x{self.window_height()}")
             self.tools_menu.entryconfigure(2, label="Enable Test Mode")
             # Restart real-time updates
             self.update_timer()
@@ -735,7 +1198,7 @@ class ScheduleTrackerTk:
     def create_test_panel(self):
         """Create the test mode panel"""
         self.test_panel = ttk.LabelFrame(self.main_frame, text="Test Mode Controls", style='Period.TLabelframe')
-        self.test_panel.grid(row=3, column=0, padx=5, pady=5, sticky='nsew')
+        self.test_panel.grid(row=4, column=0, padx=5, pady=5, sticky='nsew')
         self.test_panel.grid_remove()  # Hidden by default
 
         # Time setting controls
@@ -805,8 +1268,8 @@ class ScheduleTrackerTk:
                 y = int(position[1])
                 # Only save if position is valid
                 if x >= 0 and y >= 0:
-                    self.settings['window_x'] = x
-                    self.settings['window_y'] = y
+                    self.settings.set('window_position_x', x)
+                    self.settings.set('window_position_y', y)
                     self.save_settings()
         except Exception as e:
             print(f"Error saving window position: {e}")
@@ -817,11 +1280,11 @@ class ScheduleTrackerTk:
             screen_width = self.root.winfo_screenwidth()
             screen_height = self.root.winfo_screenheight()
             window_width = 325
-            window_height = 225
+            window_height = self.window_height()
 
             # Get saved position
-            x = self.settings.get('window_x')
-            y = self.settings.get('window_y')
+            x = self.settings.get('window_position_x')
+            y = self.settings.get('window_position_y')
             
             # If we have valid saved coordinates
             if x is not None and y is not None:
@@ -854,7 +1317,9 @@ class ScheduleTrackerTk:
         if self.is_visible:
             self.root.withdraw()  # Hide window
             self.is_visible = False
+            self.set_low_power(True)
         else:
+            self.set_low_power(False)
             self.root.deiconify()  # Show window
             self.root.lift()       # Bring to front
             self.is_visible = True
@@ -889,18 +1354,16 @@ class ScheduleEditorDialog:
         self.dialog.wait_window()
 
     def load_schedules_from_json(self):
-        """Load schedules from schedules.json file"""
+        """Load schedules from schedules.json (or the SH_SCHED_DB database)"""
         try:
-            with open('schedules.json', 'r') as f:
-                schedules_data = json.load(f)
-                if 'southampton_high_school' in schedules_data:
-                    school_data = schedules_data['southampton_high_school']
-                    # Update settings with schedule data
-                    self.settings.update({
-                        'regular': school_data.get('regular_schedule', {}).get('periods', []),
-                        'two_hour_delay': school_data.get('two_hour_delay', {}).get('periods', []),
-                        'homeroom_schedule': school_data.get('homeroom_schedule', {}).get('periods', [])
-                    })
+            school_data = schedules_to_dict(load_schedules())
+            if school_data:
+                # Update settings with schedule data
+                self.settings.update({
+                    'regular': school_data.get('regular_schedule', {}).get('periods', []),
+                    'two_hour_delay': school_data.get('two_hour_delay', {}).get('periods', []),
+                    'homeroom_schedule': school_data.get('homeroom_schedule', {}).get('periods', [])
+                })
         except FileNotFoundError:
             messagebox.showwarning("Warning", "schedules.json not found. Creating new file.")
             self.save_schedules_to_json()
@@ -914,34 +1377,26 @@ class ScheduleEditorDialog:
             self.save_schedules_to_json()
 
     def save_schedules_to_json(self):
-        """Save schedules to schedules.json file"""
+        """Save schedules to schedules.json file (or the SH_SCHED_DB database)"""
         try:
-            # Load existing schedules data or create new structure
+            school_data = {}
             try:
-                with open('schedules.json', 'r') as f:
-                    schedules_data = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                schedules_data = {'southampton_high_school': {}}
+                current = schedules_to_dict(load_schedules())
+            except (FileNotFoundError, ValueError):
+                current = {}
 
-            # Update schedules data
-            if 'southampton_high_school' not in schedules_data:
-                schedules_data['southampton_high_school'] = {}
-
-            school_data = schedules_data['southampton_high_school']
-            
             # Only update the schedules that were modified
             if hasattr(self, 'modified_schedules'):
                 for schedule_type in self.modified_schedules:
                     if schedule_type == 'regular':
-                        school_data['regular_schedule'] = {'periods': self.settings.get('regular', [])}
+                        school_data['regular_schedule'] = dict(current.get('regular_schedule', {}), periods=self.settings.get('regular', []))
                     elif schedule_type == 'two_hour_delay':
-                        school_data['two_hour_delay'] = {'periods': self.settings.get('two_hour_delay', [])}
+                        school_data['two_hour_delay'] = dict(current.get('two_hour_delay', {}), periods=self.settings.get('two_hour_delay', []))
                     elif schedule_type == 'homeroom_schedule':
-                        school_data['homeroom_schedule'] = {'periods': self.settings.get('homeroom_schedule', [])}
+                        school_data['homeroom_schedule'] = dict(current.get('homeroom_schedule', {}), periods=self.settings.get('homeroom_schedule', []))
 
-            # Save updated schedules
-            with open('schedules.json', 'w') as f:
-                json.dump(schedules_data, f, indent=4)
+            # Other schedules and schools are kept as they are
+            save_schedules(school_data)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save schedules: {str(e)}")
 
@@ -1198,16 +1653,16 @@ class SettingsDialog:
         # Window Colors
         ttk.Label(self.dialog, text="Window Colors:").grid(row=1, column=0, padx=5, pady=5)
         ttk.Button(self.dialog, text="Background", 
-                  command=lambda: self.choose_color('window_color')).grid(row=1, column=1, padx=5, pady=5)
+                  command=lambda: self.choose_color('window_bg_color')).grid(row=1, column=1, padx=5, pady=5)
         ttk.Button(self.dialog, text="Text", 
-                  command=lambda: self.choose_color('text_color')).grid(row=1, column=2, padx=5, pady=5)
+                  command=lambda: self.choose_color('window_text_color')).grid(row=1, column=2, padx=5, pady=5)
 
         # Message Frame Colors
         ttk.Label(self.dialog, text="Message Colors:").grid(row=2, column=0, padx=5, pady=5)
         ttk.Button(self.dialog, text="Background", 
-                  command=lambda: self.choose_color('label_bg_color')).grid(row=2, column=1, padx=5, pady=5)
+                  command=lambda: self.choose_color('message_bg_color')).grid(row=2, column=1, padx=5, pady=5)
         ttk.Button(self.dialog, text="Text", 
-                  command=lambda: self.choose_color('label_text_color')).grid(row=2, column=2, padx=5, pady=5)
+                  command=lambda: self.choose_color('message_text_color')).grid(row=2, column=2, padx=5, pady=5)
 
         # Schedule Label Colors
         ttk.Label(self.dialog, text="Schedule Labels:").grid(row=3, column=0, padx=5, pady=5)
@@ -1245,14 +1700,14 @@ class SettingsDialog:
 
         # Window preview
         window_preview = tk.Label(self.preview_frame, text="Window Colors",
-                                bg=self.settings.get('window_color', '#FFFFFF'),
-                                fg=self.settings.get('text_color', '#000000'))
+                                bg=self.settings.get('window_bg_color', '#FFFFFF'),
+                                fg=self.settings.get('window_text_color', '#000000'))
         window_preview.pack(fill='x', padx=5, pady=2)
 
         # Message preview
         message_preview = tk.Label(self.preview_frame, text="Message Colors",
-                                 bg=self.settings.get('label_bg_color', '#E0E0E0'),
-                                 fg=self.settings.get('label_text_color', '#000000'))
+                                 bg=self.settings.get('message_bg_color', '#E0E0E0'),
+                                 fg=self.settings.get('message_text_color', '#000000'))
         message_preview.pack(fill='x', padx=5, pady=2)
 
         # Schedule label preview
@@ -1270,10 +1725,10 @@ class SettingsDialog:
     def set_default_colors(self):
         """Set all colors to default black and white"""
         self.settings.update({
-            'window_color': '#000000',      # Black background
-            'text_color': '#FFFFFF',        # White text
-            'label_bg_color': '#000000',    # Black background
-            'label_text_color': '#FFFFFF',  # White text
+            'window_bg_color': '#000000',      # Black background
+            'window_text_color': '#FFFFFF',        # White text
+            'message_bg_color': '#000000',    # Black background
+            'message_text_color': '#FFFFFF',  # White text
             'frame_bg_color': '#000000',    # Black background
             'frame_text_color': '#FFFFFF'   # White text
         })
@@ -1286,6 +1741,71 @@ class SettingsDialog:
     def cancel(self):
         self.dialog.destroy()
 
+class StudentSearchDialog:
+    """Find a student or staff member by typing part of a name or id"""
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.matches = []
+        self.search_job = None
+        self.dialog = tk.Toplevel(tracker.root)
+        self.dialog.title("Find Student")
+        self.dialog.transient(tracker.root)
+        self.dialog.configure(bg='#000080')
+        # Closing only hides the window, so the last search is still there next time
+        self.dialog.protocol("WM_DELETE_WINDOW", self.dialog.withdraw)
+        self.dialog.bind('<Escape>', lambda e: self.dialog.withdraw())
+        self.create_widgets()
+
+    def create_widgets(self):
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.schedule_search())
+        self.entry = ttk.Entry(self.dialog, textvariable=self.search_var, width=40)
+        self.entry.pack(fill='x', padx=10, pady=(10, 5))
+        
+        self.results_list = tk.Listbox(self.dialog, height=10, bg='#000080', fg='white',
+                                       selectbackground='#0000cc', activestyle='none')
+        self.results_list.pack(fill='both', expand=True, padx=10, pady=5)
+        self.results_list.bind('<<ListboxSelect>>', lambda e: self.show_location())
+        
+        self.location_label = tk.Label(self.dialog, text="", justify='left', anchor='w',
+                                       bg='#000080', fg='white', wraplength=300)
+        self.location_label.pack(fill='x', padx=10, pady=(5, 10))
+
+    def schedule_search(self):
+        # Search once typing pauses; a keystroke only restarts this timer
+        if self.search_job is not None:
+            self.dialog.after_cancel(self.search_job)
+        self.search_job = self.dialog.after(DEBOUNCE_MS, self.run_search)
+
+    def run_search(self):
+        self.search_job = None
+        self.results_list.delete(0, 'end')
+        self.location_label.config(text="")
+        index = self.tracker.name_index
+        if index is None:
+            if self.tracker.index_job is not None:
+                self.location_label.config(text="Loading roster...")
+            else:
+                self.location_label.config(text="No roster loaded. Use Tools > Import Roster.")
+            return
+        self.matches = index.search(self.search_var.get())
+        for match in self.matches:
+            self.results_list.insert('end', str(match))
+        if self.matches:
+            self.results_list.selection_set(0)
+            self.show_location()
+
+    def show_location(self):
+        selection = self.results_list.curselection()
+        if not selection:
+            return
+        match = self.matches[selection[0]]
+        current_time = self.tracker.test_time if self.tracker.test_mode else self.tracker.clock.now().time()
+        lines = [f"{title}: {describe_match(self.tracker.roster, match, self.tracker.get_current_segment(current_time, key))}"
+                 for key, title in UPCOMING_TITLES.items()]
+        self.location_label.config(text="\n".join(lines))
+
+
 class PasswordDialog:
     def __init__(self, parent, default_password=''):
         self.dialog = tk.Toplevel(parent)
@@ -1395,5 +1915,10 @@ class DelayInputDialog:
         self.dialog.destroy()
 
 if __name__ == "__main__":
+    instance, commands = claim()
+    # Local Prometheus endpoint, only when SH_SCHED_METRICS_PORT is set
+    serve_metrics()
     app = ScheduleTrackerTk(enable_test_mode=True)
+    app.listen(instance)
+    app.run_commands(commands)
     app.run()